@@ -1,5 +1,6 @@
 import streamlit as st
 import base64
+import model_store
 
 # ==================== 页面配置 ====================
 st.set_page_config(
@@ -500,7 +501,7 @@ st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
 # ==================== 快速开始 ====================
 st.header("🚀 快速开始")
 
-col1, col2, col3 = st.columns(3)
+col1, col2, col3, col4 = st.columns(4)
 
 with col1:
     st.markdown("""
@@ -529,7 +530,19 @@ with col2:
 with col3:
     st.markdown("""
     <div class="feature-card" style="text-align: center;">
-        <h3>3️⃣ 知识分享</h3>
+        <h3>3️⃣ 响应面分析</h3>
+        <p>查看各指标在 R2_NO2 × R5_DO 平面上的热力图与等值线</p>
+        <br>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if st.button("🗺️ 前往响应面分析页面", use_container_width=True, key="goto_response"):
+        st.switch_page("pages/page3.py")
+
+with col4:
+    st.markdown("""
+    <div class="feature-card" style="text-align: center;">
+        <h3>4️⃣ 知识分享</h3>
         <p>访问ENVDAMA知识分享站，获取更多环境数据分析资源</p>
         <br>
     </div>
@@ -543,6 +556,13 @@ with col3:
         st.success("✅ 正在打开 ENVDAMA 知识分享站...")
         st.info("💡 如未自动跳转，请点击: [https://envdama.top/](https://envdama.top/)")
 
+state = model_store.readiness()
+if state['ready']:
+    st.caption(f"✅ 模型已在服务启动时预热（{state['finished_at']:%Y-%m-%d %H:%M:%S}，耗时 {state['elapsed_ms']:.0f} ms），"
+               "首次预测无需等待加载")
+elif state['booted']:
+    st.caption("⚠️ 启动预热未完成，页面首次打开时会重新加载模型: " + "; ".join(state['errors'].values()))
+
 st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
 
 # ==================== 联系方式 ====================
@@ -0,0 +1,52 @@
+"""模型文件与清单：内容摘要、清单路径与读写
+
+训练（training.py）、压缩（compression.py）与共享模型仓库（model_store.py）都用到这些函数。
+单独成模块，只依赖标准库和 joblib，页面进程加载 model_store 时不会导入整个训练流程。
+"""
+import hashlib
+import json
+import os
+
+import joblib
+
+
+def manifest_path(artifact_path):
+    return os.path.splitext(artifact_path)[0] + '.manifest.json'
+
+
+def file_digest(path, block=1 << 20):
+    """文件内容的 SHA-256，用于在清单中标识训练数据和模型文件"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(block), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_artifact(models, path, manifest, compress=0):
+    """写入模型文件和清单；先写临时文件再替换，避免页面读到写了一半的文件
+
+    compress 为 joblib 的压缩级别，读取时 joblib.load 自动识别。
+    """
+    tmp = path + '.tmp'
+    joblib.dump(models, tmp, compress=compress)
+    os.replace(tmp, path)
+    manifest = dict(manifest, artifact=os.path.basename(path), artifact_sha256=file_digest(path))
+    write_manifest(path, manifest)
+    return manifest
+
+
+def write_manifest(artifact_path, manifest):
+    tmp = manifest_path(artifact_path) + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=2)
+    os.replace(tmp, manifest_path(artifact_path))
+
+
+def read_manifest(artifact_path):
+    """模型文件旁的清单；不存在时返回 None"""
+    path = manifest_path(artifact_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
@@ -0,0 +1,264 @@
+"""模型压缩：在精度预算内减少每个目标模型的树数
+
+优化时每次评估都要遍历全部树，而提升后期的树对预测的贡献往往很小。对每个目标模型
+在时间顺序留出的验证集上尝试两种剪枝方式：
+- 截断：只保留前 n 轮的树（与 iteration_range=(0, n) 的预测相同）；
+- 按增益剪枝：按每棵树全部分裂的增益之和排序，只保留增益最大的 k 棵（保持原顺序）。
+树的输出可以相加，所以先求出每棵树在验证集上的叶子值，任意树子集的预测就是基准值加上
+对应列之和，所有 n、k 的验证误差一次算完。取验证 RMSE 不超过原模型 (1 + tolerance) 倍的
+最少树数方案；可选再把叶子值和分裂阈值舍入到较少的尾数位（量化），量化后仍在预算内才采用。
+
+命令行用法：
+    python compression.py history.csv --model energy_quality_models.pkl --tolerance 0.01 --quantize
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+
+import joblib
+import numpy as np
+import xgboost as xgb
+
+from artifacts import file_digest, read_manifest, write_artifact, write_manifest
+from predictor import FEATURES, is_multi_output
+from training import benchmark_inference, load_training_data, regression_metrics, split_holdout, truncate
+
+METHODS = {
+    'none': '不剪枝',
+    'truncate': '截断',
+    'gain': '按增益剪枝',
+}
+# 量化后保留的尾数位数（float32 为 23 位，10 位即 float16 的精度，但不受其取值范围限制）
+QUANTIZE_BITS = 10
+COMPRESS_LEVEL = 3
+# 小批量的单次耗时只有几毫秒，多测几次取中位数
+BENCH_REPEAT = 20
+
+
+# ==================== 树结构 ====================
+def _model_json(model):
+    return json.loads(model.get_booster().save_raw('json'))
+
+
+def _trees(model_json):
+    return model_json['learner']['gradient_booster']['model']['trees']
+
+
+def _from_json(model_json):
+    out = xgb.XGBRegressor()
+    out.load_model(bytearray(json.dumps(model_json), 'utf-8'))
+    return out
+
+
+def tree_gains(model):
+    """每棵树全部分裂的增益（loss_changes）之和"""
+    return np.array([
+        sum(g for g, left in zip(t['loss_changes'], t['left_children']) if left != -1)
+        for t in _trees(_model_json(model))
+    ])
+
+
+def tree_outputs(model, X):
+    """每棵树对每行的输出 P (n, 树数) 与基准值 base (n,)，模型预测值 = base + P.sum(1)"""
+    booster = model.get_booster()
+    dmatrix = xgb.DMatrix(np.asarray(X, dtype=float), feature_names=FEATURES)
+    leaves = booster.predict(dmatrix, pred_leaf=True).astype(np.int64)
+    trees = _trees(_model_json(model))
+    P = np.empty(leaves.shape)
+    for i, tree in enumerate(trees):
+        P[:, i] = np.asarray(tree['split_conditions'])[leaves[:, i]]
+    base = booster.predict(dmatrix, output_margin=True).astype(float) - P.sum(axis=1)
+    return base, P
+
+
+def subset_model(model, keep):
+    """只保留下标在 keep 中的树（保持原顺序），返回新的 XGBRegressor"""
+    keep = sorted(int(i) for i in keep)
+    j = _model_json(model)
+    gbm = j['learner']['gradient_booster']['model']
+    trees = [gbm['trees'][i] for i in keep]
+    for new_id, tree in enumerate(trees):
+        tree['id'] = new_id
+    gbm['trees'] = trees
+    gbm['tree_info'] = [0] * len(trees)
+    gbm['iteration_indptr'] = list(range(len(trees) + 1))
+    gbm['gbtree_model_param']['num_trees'] = str(len(trees))
+    # 早停记录的最优轮数对新的树集合不再成立，去掉后 predict 使用全部保留的树
+    for name in ('best_iteration', 'best_score'):
+        j['learner'].get('attributes', {}).pop(name, None)
+    return _from_json(j)
+
+
+def _round_mantissa(values, bits):
+    """把 float32 数值舍入到只保留 bits 位尾数"""
+    a = np.asarray(values, dtype=np.float32).view(np.uint32)
+    drop = 23 - int(bits)
+    a = (a + np.uint32(1 << (drop - 1))) & np.uint32(~((1 << drop) - 1) & 0xFFFFFFFF)
+    return a.view(np.float32).astype(float).tolist()
+
+
+def quantize_model(model, bits=QUANTIZE_BITS):
+    """叶子值与分裂阈值舍入到 bits 位尾数；取值的种类变少，压缩保存时文件更小"""
+    j = _model_json(model)
+    for tree in _trees(j):
+        tree['split_conditions'] = _round_mantissa(tree['split_conditions'], bits)
+        tree['base_weights'] = _round_mantissa(tree['base_weights'], bits)
+    return _from_json(j)
+
+
+# ==================== 单个目标的压缩 ====================
+def _rmse_prefix(y, base, P):
+    """依次累加 P 的各列：保留前 k 列（k = 1..n）时的 RMSE"""
+    pred = base[:, None] + np.cumsum(P, axis=1)
+    return np.sqrt(((pred - np.asarray(y, dtype=float)[:, None]) ** 2).mean(axis=0))
+
+
+def compress_target(model, X_val, y_val, tolerance=0.01, quantize=False, bits=QUANTIZE_BITS):
+    """在验证集上为一个目标模型选出树数最少且 RMSE 不超过原模型 (1 + tolerance) 倍的方案
+
+    返回 (压缩后的模型, 记录)。带早停信息的模型先截取到最优轮数（与 predict 和 predictor 使用的树相同）。
+    """
+    X_val = np.asarray(X_val, dtype=float)
+    try:
+        model = truncate(model, model.best_iteration + 1)
+    except AttributeError:
+        pass
+    n_trees = model.get_booster().num_boosted_rounds()
+    before = regression_metrics(y_val, model.predict(X_val))
+    budget = before['rmse'] * (1 + tolerance)
+
+    base, P = tree_outputs(model, X_val)
+    gains = tree_gains(model)
+    by_gain = np.argsort(-gains, kind='stable')
+    curves = {
+        'truncate': (_rmse_prefix(y_val, base, P), np.arange(n_trees)),
+        'gain': (_rmse_prefix(y_val, base, P[:, by_gain]), by_gain),
+    }
+    method, keep = 'none', np.arange(n_trees)
+    for name, (rmse, order) in curves.items():
+        ok = np.flatnonzero(rmse <= budget)
+        if len(ok) and ok[0] + 1 < len(keep):
+            method, keep = name, order[:ok[0] + 1]
+
+    compressed = model if method == 'none' else subset_model(model, keep)
+    after = regression_metrics(y_val, compressed.predict(X_val))
+    quantized = False
+    if quantize:
+        candidate = quantize_model(compressed, bits)
+        metrics = regression_metrics(y_val, candidate.predict(X_val))
+        if metrics['rmse'] <= budget:
+            compressed, after, quantized = candidate, metrics, True
+
+    record = {
+        'method': method,
+        'quantized': quantized,
+        'n_trees_before': int(n_trees),
+        'n_trees': int(len(keep)),
+        'validation_before': before,
+        'validation': after,
+        'rmse_budget': float(budget),
+        'gain_kept': float(gains[keep].sum() / gains.sum()) if gains.sum() > 0 else 1.0,
+    }
+    return compressed, record
+
+
+def compress_models(models, X_val, Y_val, tolerance=0.01, quantize=False, bits=QUANTIZE_BITS, progress=None):
+    """逐个目标压缩，返回 ({目标: 模型}, {目标: 记录})"""
+    if is_multi_output(models):
+        raise ValueError('多输出模型暂不支持压缩，请使用逐目标模型文件')
+    compressed, records = {}, {}
+    for done, target in enumerate(models, start=1):
+        compressed[target], records[target] = compress_target(
+            models[target], X_val, Y_val[target], tolerance, quantize, bits)
+        if progress is not None:
+            progress(done / len(models))
+    return compressed, records
+
+
+# ==================== 输出压缩后的模型文件与报告 ====================
+def compressed_path(artifact_path):
+    stem, ext = os.path.splitext(artifact_path)
+    return f'{stem}.compressed{ext}'
+
+
+def compress(artifact_path, data_path, output_path=None, tolerance=0.01, quantize=False, bits=QUANTIZE_BITS,
+             val_frac=0.2, batch_sizes=(1, 200, 10000), progress=None):
+    """读取模型文件 -> 在数据的时间顺序验证集上逐目标压缩 -> 写出模型文件与清单，返回清单
+
+    清单的 compression 中记录压缩前后的文件大小和各批大小下的推理速度。
+    """
+    output_path = output_path or compressed_path(artifact_path)
+    models = joblib.load(artifact_path)
+    parent = read_manifest(artifact_path) or {}
+    X, Y = load_training_data(data_path, models.keys())
+    _, _, X_val, Y_val = split_holdout(X, Y, val_frac)
+    compressed, records = compress_models(models, X_val.to_numpy(), Y_val, tolerance, quantize, bits, progress)
+
+    manifest = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'kind': 'per_target',
+        'parent': {
+            'version': parent.get('version', 0),
+            'artifact': os.path.basename(artifact_path),
+            'artifact_sha256': file_digest(artifact_path),
+        },
+        'features': FEATURES,
+        'targets': list(compressed.keys()),
+        'params': parent.get('params'),
+        'val_frac': val_frac,
+        'xgboost_version': xgb.__version__,
+        'data': {'path': os.path.abspath(data_path), 'n_rows': len(X), 'n_validation': len(X_val)},
+        'compression': {
+            'tolerance': tolerance,
+            'quantize_bits': bits if quantize else None,
+            'size_before': os.path.getsize(artifact_path),
+            'inference_before': benchmark_inference(models, X_val.to_numpy(), batch_sizes, repeat=BENCH_REPEAT),
+            'inference': benchmark_inference(compressed, X_val.to_numpy(), batch_sizes, repeat=BENCH_REPEAT),
+        },
+        'targets_info': records,
+    }
+    manifest = write_artifact(compressed, output_path, manifest, compress=COMPRESS_LEVEL)
+    manifest['compression']['size'] = os.path.getsize(output_path)
+    write_manifest(output_path, manifest)
+    return manifest
+
+
+def format_compression_report(manifest):
+    """压缩结果的文本摘要（命令行输出）"""
+    comp = manifest['compression']
+    lines = [f"{'目标':<14}{'方式':>12}{'树数':>14}{'原RMSE':>12}{'压缩后RMSE':>14}{'保留增益':>10}"]
+    for target, rec in manifest['targets_info'].items():
+        method = METHODS[rec['method']] + ('+量化' if rec['quantized'] else '')
+        lines.append(f"{target:<14}{method:>12}{rec['n_trees_before']:>7}->{rec['n_trees']:<6}"
+                     f"{rec['validation_before']['rmse']:>12.4f}{rec['validation']['rmse']:>14.4f}"
+                     f"{rec['gain_kept'] * 100:>9.1f}%")
+    lines.append(f"文件大小 {comp['size_before'] / 1024:.0f} KB -> {comp['size'] / 1024:.0f} KB"
+                 f"（RMSE 容差 {comp['tolerance'] * 100:g}%）")
+    lines.append('推理速度（中位耗时 ms，压缩前 -> 压缩后）')
+    for size, before in comp['inference_before'].items():
+        after = comp['inference'][size]
+        lines.append(f"批量 {size:<9}{before['latency_ms']:>10.2f} -> {after['latency_ms']:<10.2f}"
+                     f"加速 {before['latency_ms'] / after['latency_ms']:.2f}×")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在精度预算内剪枝、截断和量化预测模型')
+    parser.add_argument('data', help='带目标列的运行数据 CSV / Parquet，末尾 val-frac 比例的行用于检验精度')
+    parser.add_argument('--model', default='energy_quality_models.pkl', help='要压缩的模型文件')
+    parser.add_argument('-o', '--output', default=None, help='输出的模型文件（缺省为 <模型>.compressed.pkl）')
+    parser.add_argument('--tolerance', type=float, default=0.01, help='验证 RMSE 允许相对原模型增加的比例')
+    parser.add_argument('--quantize', action='store_true', help='同时量化叶子值与分裂阈值')
+    parser.add_argument('--bits', type=int, default=QUANTIZE_BITS, help='量化后保留的尾数位数')
+    parser.add_argument('--val-frac', type=float, default=0.2, help='按时间顺序留作验证集的比例')
+    args = parser.parse_args()
+
+    result = compress(args.model, args.data, args.output, tolerance=args.tolerance, quantize=args.quantize,
+                      bits=args.bits, val_frac=args.val_frac)
+    print(format_compression_report(result))
+    print(f"压缩后的模型已写入 {result['artifact']}")
+
+
+if __name__ == '__main__':
+    main()
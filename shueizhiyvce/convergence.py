@@ -0,0 +1,240 @@
+"""逐代进化历史：紧凑记录每代种群，增量计算超体积
+
+pymoo 的 save_history=True 每代深拷贝整个算法对象（种群、算子、存档……），
+种群 200 × 500 代时占用很大。GenerationHistory 作为 minimize 的回调，按代数和种群大小
+预分配 float32 数组，每代只写入目标值、决策变量、约束违反量、非支配等级和拥挤度。
+
+超体积基于所有代可行解的非支配存档：新一代中被存档支配的点直接跳过，存档没有变化时
+沿用上一代的值；两目标时按排序扫描精确计算，多目标时调用 pymoo 的 HV。
+参考点缺省取第一次出现可行解那一代的最差值外扩 10%，此后固定，各代的值可以直接比较。
+"""
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from pymoo.core.callback import Callback
+from pymoo.indicators.hv import HV
+from pymoo.operators.survival.rank_and_crowding.metrics import calc_crowding_distance
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
+
+REF_MARGIN = 0.1
+# 动画最多的帧数，代数更多时均匀抽取
+MAX_FRAMES = 60
+
+
+# ==================== 增量超体积 ====================
+def hypervolume_2d(F, ref_point):
+    """两目标非支配点集相对参考点的超体积（按第一个目标排序后逐段累加矩形面积）"""
+    F = F[np.argsort(F[:, 0], kind='stable')]
+    right = np.append(F[1:, 0], ref_point[0])
+    return float(((right - F[:, 0]) * (ref_point[1] - F[:, 1])).sum())
+
+
+class IncrementalHypervolume:
+    """所有已加入点的非支配存档及其超体积"""
+
+    def __init__(self, ref_point=None, margin=REF_MARGIN):
+        self.ref_point = None if ref_point is None else np.asarray(ref_point, dtype=float)
+        self.margin = margin
+        self.archive = None
+        self.value = 0.0
+
+    def _init_ref_point(self, F):
+        ideal, nadir = F.min(axis=0), F.max(axis=0)
+        span = np.where(nadir > ideal, nadir - ideal, np.maximum(np.abs(nadir), 1.0))
+        self.ref_point = nadir + self.margin * span
+
+    def update(self, F):
+        """加入一代的可行目标值，返回当前超体积"""
+        F = np.asarray(F, dtype=float)
+        if len(F) == 0:
+            return self.value
+        if self.ref_point is None:
+            self._init_ref_point(F)
+        F = F[(F < self.ref_point).all(axis=1)]
+        if self.archive is not None and len(F):
+            # 被存档中某个点弱支配的新点不会改变超体积
+            dominated = (self.archive[None, :, :] <= F[:, None, :]).all(axis=2).any(axis=1)
+            F = F[~dominated]
+        if len(F) == 0:
+            return self.value
+
+        merged = np.unique(F if self.archive is None else np.vstack([self.archive, F]), axis=0)
+        self.archive = merged[NonDominatedSorting().do(merged, only_non_dominated_front=True)]
+        if self.archive.shape[1] == 2:
+            self.value = hypervolume_2d(self.archive, self.ref_point)
+        else:
+            self.value = float(HV(ref_point=self.ref_point)(self.archive))
+        return self.value
+
+
+# ==================== 逐代记录 ====================
+def _rank_and_crowding(F, rank=None):
+    """pymoo 未设置时（如 NSGA-III 不计算拥挤度）自行计算非支配等级与各前沿内的拥挤度"""
+    if rank is None:
+        rank = np.empty(len(F), dtype=int)
+        for k, front in enumerate(NonDominatedSorting().do(F)):
+            rank[front] = k
+    crowding = np.empty(len(F))
+    for k in np.unique(rank):
+        members = np.flatnonzero(rank == k)
+        crowding[members] = calc_crowding_distance(F[members])
+    return rank, crowding
+
+
+def _numeric(values):
+    # 种群未设置该属性时 Population.get 返回 None 组成的 object 数组
+    return None if values.dtype == object else values
+
+
+class GenerationHistory(Callback):
+    """minimize 的回调：每代把种群写入预分配的 float32 数组，并更新超体积
+
+    result() 返回裁剪到实际代数的数组字典，可以直接放进会话存储。
+    """
+
+    def __init__(self, n_gen, pop_size, n_obj, n_var, ref_point=None):
+        super().__init__()
+        n_gen, pop_size = int(n_gen), int(pop_size)
+        self.F = np.full((n_gen, pop_size, n_obj), np.nan, dtype=np.float32)
+        self.X = np.full((n_gen, pop_size, n_var), np.nan, dtype=np.float32)
+        self.cv = np.full((n_gen, pop_size), np.nan, dtype=np.float32)
+        self.crowding = np.full((n_gen, pop_size), np.nan, dtype=np.float32)
+        self.rank = np.full((n_gen, pop_size), -1, dtype=np.int16)
+        self.n_pop = np.zeros(n_gen, dtype=np.int32)
+        self.n_evals = np.zeros(n_gen, dtype=np.int64)
+        self.hv = np.zeros(n_gen, dtype=np.float64)
+        self.n_recorded = 0
+        self._hv = IncrementalHypervolume(ref_point)
+
+    def _reserve(self, n_gen, pop_size):
+        # 终止条件不是固定代数或种群比预期大时扩容（正常运行不会触发）
+        shape = self.F.shape
+        if n_gen <= shape[0] and pop_size <= shape[1]:
+            return
+        n_gen, pop_size = max(n_gen, 2 * shape[0]), max(pop_size, shape[1])
+        for name, fill in (('F', np.nan), ('X', np.nan), ('cv', np.nan), ('crowding', np.nan), ('rank', -1)):
+            old = getattr(self, name)
+            new = np.full((n_gen, pop_size) + old.shape[2:], fill, dtype=old.dtype)
+            new[:shape[0], :shape[1]] = old
+            setattr(self, name, new)
+        for name in ('n_pop', 'n_evals', 'hv'):
+            old = getattr(self, name)
+            setattr(self, name, np.concatenate([old, np.zeros(n_gen - len(old), dtype=old.dtype)]))
+
+    def notify(self, algorithm):
+        pop = algorithm.pop
+        g, n = self.n_recorded, len(pop)
+        self._reserve(g + 1, n)
+        # Population.get 逐个体取值，一次取齐所有属性只遍历一遍种群
+        F, X, cv, rank, crowding = pop.get("F", "X", "CV", "rank", "crowding")
+        cv = cv.ravel() if cv.dtype != object else np.zeros(n)
+        rank, crowding = _numeric(rank), _numeric(crowding)
+        if rank is None or crowding is None:
+            rank, crowding = _rank_and_crowding(F, rank)
+
+        self.F[g, :n], self.X[g, :n], self.cv[g, :n] = F, X, cv
+        self.rank[g, :n], self.crowding[g, :n] = rank, crowding
+        self.n_pop[g] = n
+        self.n_evals[g] = algorithm.evaluator.n_eval
+        self.hv[g] = self._hv.update(F[cv <= 0])
+        self.n_recorded = g + 1
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes
+                   for name in ('F', 'X', 'cv', 'crowding', 'rank', 'n_pop', 'n_evals', 'hv'))
+
+    def result(self):
+        g = self.n_recorded
+        return {
+            'F': self.F[:g], 'X': self.X[:g], 'cv': self.cv[:g],
+            'rank': self.rank[:g], 'crowding': self.crowding[:g],
+            'n_pop': self.n_pop[:g], 'n_evals': self.n_evals[:g], 'hv': self.hv[:g],
+            'ref_point': self._hv.ref_point,
+            'nbytes': self.nbytes,
+        }
+
+
+# ==================== 收敛曲线与进化动画 ====================
+def convergence_figure(history, height=420):
+    """超体积（相对最终值）与第一前沿大小随代数的变化"""
+    hv = np.asarray(history['hv'], dtype=float)
+    gens = np.arange(1, len(hv) + 1)
+    rel = hv / hv[-1] * 100 if len(hv) and hv[-1] > 0 else np.zeros_like(hv)
+    n_front = (np.asarray(history['rank']) == 0).sum(axis=1)
+
+    fig = make_subplots(specs=[[{'secondary_y': True}]])
+    fig.add_trace(go.Scatter(
+        x=gens, y=rel, mode='lines', name='超体积（相对最终值）', line=dict(color='#667eea', width=3),
+        customdata=np.column_stack([hv, history['n_evals']]),
+        hovertemplate='第 %{x} 代<br>超体积: %{customdata[0]:.4g} (%{y:.1f}%)<br>'
+                      '累计评估: %{customdata[1]:.0f}<extra></extra>'
+    ), secondary_y=False)
+    fig.add_trace(go.Scatter(
+        x=gens, y=n_front, mode='lines', name='第一前沿个体数', line=dict(color='#FF9800', width=1.5, dash='dot')
+    ), secondary_y=True)
+    fig.update_layout(
+        title='收敛过程：所有代可行非支配解的超体积',
+        xaxis_title='代数',
+        hovermode='x unified',
+        height=height,
+        template='plotly_white'
+    )
+    fig.update_yaxes(title_text='超体积 (%)', secondary_y=False)
+    fig.update_yaxes(title_text='第一前沿个体数', secondary_y=True)
+    return fig
+
+
+def frame_generations(n_gen, max_frames=MAX_FRAMES):
+    """动画要显示的代（下标），均匀抽取且包含首末代"""
+    return np.unique(np.linspace(0, n_gen - 1, min(int(n_gen), int(max_frames))).round().astype(int))
+
+
+def animation_figure(history, ix, iy, labels, height=520, max_frames=MAX_FRAMES):
+    """种群在两个目标上的逐代分布动画：第一前沿与其余个体分开着色"""
+    F, rank, n_pop = history['F'], history['rank'], history['n_pop']
+    gens = frame_generations(len(F), max_frames)
+
+    def traces(g):
+        n = int(n_pop[g])
+        front = rank[g, :n] == 0
+        pts = F[g, :n]
+        return [
+            go.Scatter(x=pts[~front, ix], y=pts[~front, iy], mode='markers', name='其余个体',
+                       marker=dict(size=6, color='#BDBDBD')),
+            go.Scatter(x=pts[front, ix], y=pts[front, iy], mode='markers', name='第一前沿',
+                       marker=dict(size=8, color='#667eea', line=dict(width=1, color='white'))),
+        ]
+
+    # 坐标范围按全部记录固定，播放时不跳动
+    finite = np.isfinite(F[..., ix]) & np.isfinite(F[..., iy])
+    x_all, y_all = F[..., ix][finite], F[..., iy][finite]
+    pad_x, pad_y = 0.05 * (x_all.max() - x_all.min() or 1.0), 0.05 * (y_all.max() - y_all.min() or 1.0)
+
+    fig = go.Figure(
+        data=traces(gens[0]),
+        frames=[go.Frame(data=traces(g), name=str(g + 1)) for g in gens]
+    )
+    fig.update_layout(
+        title=f'种群进化动画（{len(F)} 代中抽取 {len(gens)} 帧）',
+        xaxis=dict(title=labels[ix], range=[x_all.min() - pad_x, x_all.max() + pad_x]),
+        yaxis=dict(title=labels[iy], range=[y_all.min() - pad_y, y_all.max() + pad_y]),
+        height=height,
+        template='plotly_white',
+        updatemenus=[dict(
+            type='buttons', showactive=False, x=0, y=-0.12, xanchor='left',
+            buttons=[
+                dict(label='▶ 播放', method='animate',
+                     args=[None, dict(frame=dict(duration=150, redraw=False), fromcurrent=True)]),
+                dict(label='⏸ 暂停', method='animate',
+                     args=[[None], dict(frame=dict(duration=0, redraw=False), mode='immediate')]),
+            ]
+        )],
+        sliders=[dict(
+            x=0.15, y=-0.08, len=0.85, currentvalue=dict(prefix='第 ', suffix=' 代'),
+            steps=[dict(label=str(g + 1), method='animate',
+                        args=[[str(g + 1)], dict(frame=dict(duration=0, redraw=False), mode='immediate')])
+                   for g in gens]
+        )]
+    )
+    return fig
@@ -0,0 +1,246 @@
+"""多准则决策引擎（向量化版）
+
+对同一个 Pareto 解集，一次广播计算整组权重向量下的 TOPSIS / VIKOR /
+加权和得分，并提供与权重无关的膝点选择。单个权重向量时，计算步骤与
+pymcdm 的 TOPSIS()、VIKOR()、WSM() 及 weights.entropy_weights 逐项一致，
+结果完全相同。
+
+约定：
+- matrix: (m, n)，行是备选解，列是准则
+- weights: (n,) 或 (k, n)；二维时每一行是一组权重
+- types: (n,)，1 表示效益型（越大越好），-1 表示成本型（越小越好）
+"""
+import numpy as np
+
+# 单次广播允许占用的内存上限（字节），超出时按权重分块计算
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# ==================== 决策方法登记 ====================
+# higher_better: 得分越大越优（VIKOR 的 Q 值越小越优）
+# uses_weights: 膝点选择与权重无关
+METHODS = {
+    'topsis': {'name': 'TOPSIS', 'score_name': 'TOPSIS分数', 'higher_better': True, 'uses_weights': True},
+    'vikor': {'name': 'VIKOR', 'score_name': 'VIKOR Q值', 'higher_better': False, 'uses_weights': True},
+    'wsm': {'name': '加权和', 'score_name': '加权和得分', 'higher_better': True, 'uses_weights': True},
+    'knee': {'name': '膝点', 'score_name': '膝点距离', 'higher_better': True, 'uses_weights': False},
+}
+
+
+# ==================== 归一化（与 pymcdm 逐列一致） ====================
+def _minmax_normalize(matrix, types):
+    nmatrix = np.empty(matrix.shape, dtype=float)
+    for j in range(matrix.shape[1]):
+        x = matrix[:, j]
+        if np.min(x) == np.max(x):
+            nmatrix[:, j] = np.ones(x.shape)
+        elif types[j] == -1:
+            nmatrix[:, j] = (np.max(x) - x) / (np.max(x) - np.min(x))
+        else:
+            nmatrix[:, j] = (x - np.min(x)) / (np.max(x) - np.min(x))
+    return nmatrix
+
+
+def _sum_normalize(matrix, types):
+    if np.any(matrix <= 0):
+        raise ValueError('sum_normalization requires all positive values.')
+    nmatrix = np.empty(matrix.shape, dtype=float)
+    for j in range(matrix.shape[1]):
+        x = matrix[:, j]
+        if types is not None and types[j] == -1:
+            nmatrix[:, j] = (1 / x) / np.sum(1 / x)
+        else:
+            nmatrix[:, j] = x / np.sum(x)
+    return nmatrix
+
+
+def _vikor_normalize(matrix, types):
+    nmatrix = np.empty(matrix.shape, dtype=float)
+    for j in range(matrix.shape[1]):
+        x = matrix[:, j]
+        nmatrix[:, j] = np.max(x) - x if types[j] == -1 else x
+    return nmatrix
+
+
+def _prepare(matrix, weights, types):
+    matrix = np.asarray(matrix, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    types = np.asarray(types)
+    if matrix.ndim != 2:
+        raise ValueError(f'matrix 必须是二维数组，当前维度: {matrix.ndim}')
+    if weights.shape[-1] != matrix.shape[1] or types.shape != (matrix.shape[1],):
+        raise ValueError(
+            f'权重/类型的长度必须等于准则数 {matrix.shape[1]}，'
+            f'当前 weights={weights.shape}, types={types.shape}'
+        )
+    single = weights.ndim == 1
+    return matrix, np.atleast_2d(weights), types, single
+
+
+def _chunks(n_weights, m, n):
+    step = max(1, CHUNK_BYTES // max(1, m * n * 8))
+    for start in range(0, n_weights, step):
+        yield slice(start, min(start + step, n_weights))
+
+
+# ==================== 客观赋权 ====================
+def entropy_weights(matrix):
+    """熵权法，与 pymcdm.weights.entropy_weights 相同"""
+    matrix = np.asarray(matrix, dtype=float)
+    m, n = matrix.shape
+    nmatrix = _sum_normalize(matrix, None)
+    entropies = np.empty(n)
+    for i, col in enumerate(nmatrix.T):
+        if np.any(col == 0):
+            entropies[i] = 0
+        else:
+            entropies[i] = -np.sum(col * np.log(col))
+    entropies = entropies / np.log(m)
+
+    E = 1 - entropies
+    return E / np.sum(E)
+
+
+# ==================== 决策方法 ====================
+def topsis(matrix, weights, types):
+    """TOPSIS 贴近度，越大越优；weights 为 (k, n) 时返回 (k, m)
+
+    正负理想解距离之和为 0 时得分为 0.5（pymcdm 此时给出 nan）。
+    """
+    matrix, W, types, single = _prepare(matrix, weights, types)
+    nmatrix = _minmax_normalize(matrix, types)
+
+    # 转成 (n, m) 布局，使每组权重沿解方向的归约都落在连续内存上
+    nT = np.ascontiguousarray(nmatrix.T)
+
+    scores = np.empty((W.shape[0], matrix.shape[0]))
+    for sl in _chunks(W.shape[0], *matrix.shape):
+        weighted = W[sl, :, None] * nT[None, :, :]
+        pis = np.max(weighted, axis=2, keepdims=True)
+        nis = np.min(weighted, axis=2, keepdims=True)
+        diff = weighted - pis
+        diff *= diff
+        Dp = np.sqrt(np.sum(diff, axis=1))
+        np.subtract(weighted, nis, out=diff)
+        diff *= diff
+        Dm = np.sqrt(np.sum(diff, axis=1))
+        # 所有准则在各解上取值相同（如只有一个解）时正负理想解重合，记为等距的 0.5
+        total = Dm + Dp
+        scores[sl] = np.divide(Dm, total, out=np.full_like(Dm, 0.5), where=total > 0)
+    return scores[0] if single else scores
+
+
+def vikor(matrix, weights, types, v=0.5):
+    """VIKOR 折衷值 Q，越小越优；weights 为 (k, n) 时返回 (k, m)"""
+    matrix, W, types, single = _prepare(matrix, weights, types)
+    nmatrix = _vikor_normalize(matrix, types)
+
+    fstar = np.max(nmatrix, axis=0)
+    fminus = np.min(nmatrix, axis=0)
+    if np.any(fstar == fminus):
+        eq = np.arange(fstar.shape[0])[fstar == fminus]
+        raise ValueError(f'准则 {eq} 在所有解上取值相同，无法使用 VIKOR')
+    gapT = np.ascontiguousarray(((fstar - nmatrix) / (fstar - fminus)).T)
+
+    Q = np.empty((W.shape[0], matrix.shape[0]))
+    for sl in _chunks(W.shape[0], *matrix.shape):
+        weighted_ff = W[sl, :, None] * gapT[None, :, :]
+        S = np.sum(weighted_ff, axis=1)
+        R = np.max(weighted_ff, axis=1)
+
+        Sstar = np.min(S, axis=1, keepdims=True)
+        Sminus = np.max(S, axis=1, keepdims=True)
+        Rstar = np.min(R, axis=1, keepdims=True)
+        Rminus = np.max(R, axis=1, keepdims=True)
+
+        Q[sl] = v * (S - Sstar) / (Sminus - Sstar) \
+            + (1 - v) * (R - Rstar) / (Rminus - Rstar)
+    return Q[0] if single else Q
+
+
+def weighted_sum(matrix, weights, types):
+    """加权和（求和归一化，同 pymcdm WSM），越大越优"""
+    matrix, W, types, single = _prepare(matrix, weights, types)
+    nT = np.ascontiguousarray(_sum_normalize(matrix, types).T)
+
+    scores = np.empty((W.shape[0], matrix.shape[0]))
+    for sl in _chunks(W.shape[0], *matrix.shape):
+        scores[sl] = np.sum(W[sl, :, None] * nT[None, :, :], axis=1)
+    return scores[0] if single else scores
+
+
+def knee_point(matrix, types):
+    """膝点距离：min-max 归一化后到各目标极值所在超平面的距离，越大越靠近膝点"""
+    matrix = np.asarray(matrix, dtype=float)
+    types = np.asarray(types)
+    # 归一化后 0 为最好、1 为最差，超平面 sum(f) = 1 经过各目标的极端解
+    fnorm = 1.0 - _minmax_normalize(matrix, types)
+    return (1.0 - fnorm.sum(axis=1)) / np.sqrt(matrix.shape[1])
+
+
+# ==================== 统一入口 ====================
+def score(matrix, weights, types, method='topsis'):
+    """按 method 计算得分；权重无关的方法在二维权重下按行复制"""
+    if method == 'topsis':
+        return topsis(matrix, weights, types)
+    if method == 'vikor':
+        return vikor(matrix, weights, types)
+    if method == 'wsm':
+        return weighted_sum(matrix, weights, types)
+    if method == 'knee':
+        s = knee_point(matrix, types)
+        weights = np.asarray(weights)
+        return s if weights.ndim == 1 else np.broadcast_to(s, (weights.shape[0], s.shape[0]))
+    raise ValueError(f'未知的决策方法: {method}，可选: {list(METHODS)}')
+
+
+def best_index(scores, method='topsis'):
+    """最优解下标；scores 为 (k, m) 时返回 (k,)"""
+    if METHODS[method]['higher_better']:
+        return np.argmax(scores, axis=-1)
+    return np.argmin(scores, axis=-1)
+
+
+def ranking(scores, method='topsis'):
+    """由优到劣的下标排序（仅一维得分）"""
+    order = np.argsort(scores, kind='stable')
+    return order[::-1] if METHODS[method]['higher_better'] else order
+
+
+def select(matrix, weights, types, method='topsis', fallback='topsis'):
+    """单组权重下的最优解下标，返回 (下标, 实际使用的方法)
+
+    只有一个解时直接取它；method 无法用于该解集（如 VIKOR 遇到取值相同的准则）时改用 fallback。
+    """
+    if len(matrix) == 1:
+        return 0, method
+    try:
+        s = score(matrix, weights, types, method)
+    except ValueError:
+        method = fallback
+        s = score(matrix, weights, types, method)
+    return int(best_index(s, method)), method
+
+
+# ==================== 权重敏感性扫描 ====================
+def weight_sweep(matrix, types, method='topsis', axis=0, step=0.01, base_weights=None):
+    """让第 axis 个准则的权重从 0 扫到 1，一次广播求出每个权重下的最优解
+
+    其余准则按 base_weights 的比例分摊剩余权重（默认均分）。
+    返回 (grid, W, best, switches)：grid 为扫描的权重值，W 为对应权重矩阵，
+    best 为每个权重下的最优解下标，switches 为最优解发生切换的位置。
+    """
+    n = np.asarray(matrix).shape[1]
+    others = np.ones(n) if base_weights is None else np.asarray(base_weights, dtype=float).copy()
+    others[axis] = 0.0
+    if others.sum() <= 0:
+        others = np.ones(n)
+        others[axis] = 0.0
+    others = others / others.sum()
+
+    grid = np.round(np.arange(0.0, 1.0 + step / 2, step), 10)
+    W = (1.0 - grid)[:, None] * others[None, :]
+    W[:, axis] = grid
+
+    best = best_index(score(matrix, W, types, method), method)
+    switches = np.flatnonzero(best[1:] != best[:-1]) + 1
+    return grid, W, best, switches
@@ -0,0 +1,91 @@
+"""预测解释：XGBoost 原生 TreeSHAP 特征贡献
+
+每个目标模型对整批样本只调用一次 booster.predict(pred_contribs=True)，得到每个样本
+在每个特征上的 SHAP 贡献和基准值（最后一列），各列之和等于 predict_batch 的预测值。
+结果按输入矩阵的内容哈希缓存，页面重跑、切换要查看的样本或指标时不再调用模型。
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+import xgboost as xgb
+
+from plotting import result_hash
+from predictor import (FEATURES, FEATURES_INFO, TARGETS, TARGET_NAMES, TARGET_UNITS, is_multi_output,
+                       prediction_booster)
+
+CONTRIB_CACHE_SIZE = 32
+
+_contribs = OrderedDict()
+_lock = threading.Lock()
+
+
+def contributions(models, X, targets=None, model_version=None):
+    """整批 SHAP 贡献，形状 (n, len(targets), len(FEATURES) + 1)，最后一列为基准值
+
+    缓存键包含 model_version（缺省时用模型对象的 id），模型热更新后不会取到旧版本的结果。
+    返回的数组被缓存复用，只读。多输出模型（向量叶子）XGBoost 尚不支持计算贡献，抛出 ValueError。
+    """
+    if is_multi_output(models):
+        raise ValueError('多输出模型暂不支持 TreeSHAP 特征贡献，请使用逐目标模型文件')
+    targets = TARGETS if targets is None else list(targets)
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    key = result_hash(X, targets, [id(models[t]) for t in targets] if model_version is None else model_version)
+    with _lock:
+        if key in _contribs:
+            _contribs.move_to_end(key)
+            return _contribs[key]
+
+    dmatrix = xgb.DMatrix(X, feature_names=FEATURES)
+    C = np.empty((X.shape[0], len(targets), len(FEATURES) + 1))
+    for j, target in enumerate(targets):
+        # 与 predict_batch 用同一个（按最优轮数截取的）Booster，基准值 + 各贡献 = 显示的预测值
+        booster = prediction_booster(models[target], n_rows=X.shape[0])
+        C[:, j, :] = booster.predict(dmatrix, pred_contribs=True)
+    C.setflags(write=False)
+
+    with _lock:
+        _contribs[key] = C
+        _contribs.move_to_end(key)
+        while len(_contribs) > CONTRIB_CACHE_SIZE:
+            _contribs.popitem(last=False)
+    return C
+
+
+def mean_abs(C):
+    """各特征在整批样本上的平均 |SHAP|，形状 (len(targets), len(FEATURES))"""
+    return np.abs(C[:, :, :-1]).mean(axis=0)
+
+
+def waterfall(contrib, x_row, target, height=420):
+    """单个样本、单个指标的瀑布图：基准值 -> 各特征贡献（按绝对值从大到小） -> 预测值"""
+    contrib = np.asarray(contrib, dtype=float)
+    base, values = contrib[-1], contrib[:-1]
+    order = np.argsort(-np.abs(values), kind='stable')
+    unit = TARGET_UNITS[target]
+
+    labels = ['基准值'] + [
+        f"{FEATURES_INFO[FEATURES[k]]['name']} = {x_row[k]:.2f}" for k in order
+    ] + ['预测值']
+    fig = go.Figure(go.Waterfall(
+        orientation='h',
+        measure=['absolute'] + ['relative'] * len(order) + ['total'],
+        y=labels,
+        x=[base] + values[order].tolist() + [0],
+        text=[f'{base:.2f}'] + [f'{v:+.2f}' for v in values[order]] + [f'{contrib.sum():.2f}'],
+        textposition='outside',
+        increasing=dict(marker=dict(color='#F44336')),
+        decreasing=dict(marker=dict(color='#4CAF50')),
+        totals=dict(marker=dict(color='#2196F3')),
+        connector=dict(line=dict(color='#BDBDBD'))
+    ))
+    fig.update_layout(
+        title=f'{TARGET_NAMES[target]} 预测值的特征贡献 ({unit})',
+        yaxis=dict(autorange='reversed'),
+        xaxis_title=f'{TARGET_NAMES[target]} ({unit})',
+        height=height,
+        template='plotly_white',
+        showlegend=False
+    )
+    return fig
@@ -0,0 +1,207 @@
+"""历史数据流式批量评分
+
+按固定行数分块读取 CSV、Parquet 或 Arrow IPC 文件，把列名映射到模型特征（FEATURES_INFO），
+每块整批预测 7 项指标后立即追加写入 Parquet / Arrow 文件。任意时刻只持有
+一个数据块，峰值内存只与 chunksize 有关，与输入文件大小无关。
+
+页面上读写的数据文件（批量评分、历史回放）都限定在数据目录 DATA_DIR 内，
+可用环境变量 SHUEIZHIYVCE_DATA_DIR 配置。
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from predictor import FEATURES, FEATURES_INFO, TARGETS, predict_batch
+from results_io import schema_metadata
+
+DEFAULT_CHUNKSIZE = 200_000
+DATA_DIR = os.path.abspath(os.environ.get(
+    'SHUEIZHIYVCE_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')))
+INPUT_SUFFIXES = ('.csv', '.parquet', '.pq', '.arrow', '.feather')
+
+
+# ==================== 数据目录 ====================
+def data_path(name, suffixes, data_dir=None):
+    """页面输入的文件名 -> 数据目录下的绝对路径
+
+    只接受数据目录下的文件名（解析符号链接后仍在该目录内，不含子目录）且扩展名在 suffixes 中，
+    否则抛出 ValueError。
+    """
+    root = os.path.realpath(data_dir or DATA_DIR)
+    name = str(name).strip()
+    path = os.path.realpath(os.path.join(root, name))
+    if not name or os.path.dirname(path) != root:
+        raise ValueError(f'只能使用数据目录 {root} 下的文件名: {name!r}')
+    if not path.lower().endswith(tuple(suffixes)):
+        raise ValueError(f'文件扩展名须为 {" / ".join(suffixes)}: {name!r}')
+    return path
+
+
+def list_data_files(suffixes=INPUT_SUFFIXES, data_dir=None):
+    """数据目录下扩展名在 suffixes 中的文件名（按名称排序），目录不存在时为空"""
+    root = data_dir or DATA_DIR
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root)
+                  if name.lower().endswith(tuple(suffixes)) and os.path.isfile(os.path.join(root, name)))
+
+
+# ==================== 分块读取 ====================
+def is_parquet(path):
+    return str(path).lower().endswith(('.parquet', '.pq'))
+
+
+def is_arrow(path):
+    return str(path).lower().endswith(('.arrow', '.feather'))
+
+
+def count_rows(path):
+    """记录条数：Parquet / Arrow 读元数据，CSV 用与 iter_chunks 相同的解析器逐块只读第一列
+
+    CSV 不能直接数换行符：带引号的字段可以跨行，空行也不算记录。
+    """
+    if is_parquet(path):
+        return pq.ParquetFile(path).metadata.num_rows
+    if is_arrow(path):
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    try:
+        return sum(len(chunk) for chunk in pd.read_csv(path, chunksize=DEFAULT_CHUNKSIZE, usecols=[0]))
+    except pd.errors.EmptyDataError:
+        return 0
+
+
+def read_columns(path):
+    """只读表头"""
+    if is_parquet(path):
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    if is_arrow(path):
+        with pa.memory_map(str(path)) as source:
+            return list(pa.ipc.open_file(source).schema.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """逐块产出 DataFrame；columns 只读取指定列
+
+    Arrow 文件内存映射，每个记录批次再切成不超过 chunksize 行的零拷贝切片。
+    """
+    if is_parquet(path):
+        # 按页缓冲读取，行组很大时也不必整组载入
+        pf = pq.ParquetFile(path, buffer_size=1 << 20, pre_buffer=False)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif is_arrow(path):
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns:
+                    batch = batch.select(columns)
+                for offset in range(0, batch.num_rows, chunksize):
+                    yield batch.slice(offset, chunksize).to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns)
+
+
+# ==================== 列映射 ====================
+def _normalize(name):
+    return str(name).strip().lower().replace(' ', '').replace('-', '_')
+
+
+def auto_column_mapping(columns):
+    """按特征名（忽略大小写、空格）或 FEATURES_INFO 中文名匹配源列，返回 {特征: 源列}"""
+    lookup = {}
+    for col in columns:
+        lookup.setdefault(_normalize(col), col)
+    mapping = {}
+    for feature in FEATURES:
+        for alias in (feature, FEATURES_INFO[feature]['name']):
+            if _normalize(alias) in lookup:
+                mapping[feature] = lookup[_normalize(alias)]
+                break
+    return mapping
+
+
+def _writer(output_path, schema):
+    if is_parquet(output_path):
+        return pq.ParquetWriter(output_path, schema, compression='zstd')
+    # .arrow / .feather：Arrow IPC 文件格式
+    return pa.ipc.new_file(output_path, schema)
+
+
+# ==================== 流式评分 ====================
+def score_file(models, input_path, output_path, mapping=None, keep_columns=None,
+               chunksize=DEFAULT_CHUNKSIZE, progress=None, meta=None):
+    """分块读取 input_path，整块预测后追加写入 output_path（.parquet 或 .arrow）
+
+    mapping 为 {特征: 源列}，缺省时自动匹配；keep_columns 为原样保留的源列（如时间戳）。
+    含缺失特征的行输出 NaN；超出 FEATURES_INFO 取值范围的值照常预测，只计数。
+    progress(rows_done, total_rows, rows_per_sec) 在每块写出后回调；meta 追加写入文件元数据（如模型版本）。
+    返回行数、耗时、吞吐量、缺失行数和各特征的越界计数。
+    """
+    t0 = time.perf_counter()
+    columns = read_columns(input_path)
+    mapping = dict(mapping or auto_column_mapping(columns))
+    missing = [f for f in FEATURES if f not in mapping]
+    if missing:
+        raise ValueError(f'无法匹配的模型特征: {missing}，请在列映射中指定源列')
+    keep_columns = [c for c in (keep_columns or []) if c in columns]
+    source_cols = list(dict.fromkeys(keep_columns + [mapping[f] for f in FEATURES]))
+
+    total = count_rows(input_path)
+    n_rows = n_incomplete = n_chunks = 0
+    out_of_range = dict.fromkeys(FEATURES, 0)
+    lo = np.array([FEATURES_INFO[f]['range'][0] for f in FEATURES], dtype=float)
+    hi = np.array([FEATURES_INFO[f]['range'][1] for f in FEATURES], dtype=float)
+
+    schema = pa.schema(
+        [pa.field(c, pa.string()) for c in keep_columns]
+        + [pa.field(f, pa.float64()) for f in FEATURES]
+        + [pa.field(t, pa.float64()) for t in TARGETS],
+        metadata=schema_metadata(dict(meta or {}, kind='batch_scores', source=str(input_path), mapping=mapping))
+    )
+    writer = _writer(output_path, schema)
+    try:
+        for chunk in iter_chunks(input_path, chunksize, source_cols):
+            X = np.column_stack([pd.to_numeric(chunk[mapping[f]], errors='coerce').to_numpy(dtype=float)
+                                 for f in FEATURES])
+            valid = np.isfinite(X).all(axis=1)
+            Y = np.full((len(X), len(TARGETS)), np.nan)
+            if valid.any():
+                Y[valid] = predict_batch(models, X[valid], profile='throughput')
+
+            with np.errstate(invalid='ignore'):
+                beyond = (X < lo) | (X > hi)
+            for f, count in zip(FEATURES, beyond.sum(axis=0)):
+                out_of_range[f] += int(count)
+            n_incomplete += int((~valid).sum())
+
+            arrays = [pa.array(chunk[c].astype(str).to_numpy(), pa.string()) for c in keep_columns]
+            arrays += [pa.array(X[:, j]) for j in range(X.shape[1])]
+            arrays += [pa.array(Y[:, j]) for j in range(Y.shape[1])]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+            n_rows += len(chunk)
+            n_chunks += 1
+            if progress is not None:
+                elapsed = time.perf_counter() - t0
+                progress(n_rows, total, n_rows / elapsed if elapsed > 0 else 0.0)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - t0
+    return {
+        'n_rows': n_rows,
+        'n_chunks': n_chunks,
+        'elapsed': elapsed,
+        'rows_per_sec': n_rows / elapsed if elapsed > 0 else 0.0,
+        'n_incomplete': n_incomplete,
+        'out_of_range': out_of_range,
+        'mapping': mapping,
+    }
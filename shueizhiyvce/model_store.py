@@ -0,0 +1,218 @@
+"""共享模型仓库：监视模型文件，后台加载新版本，预热后原子替换
+
+每个模型文件路径在进程内只有一个 ModelStore，所有页面、所有会话共享。后台线程每隔
+poll_interval 秒检查模型文件及其清单的修改时间和大小；发生变化时在后台加载新文件，
+用一行默认进水做一次试预测（预热并检查输出），通过后才替换当前版本。
+
+替换只是把 current() 返回的快照换成新对象：已经取得旧快照的预测和优化继续使用旧模型
+直到结束，之后新发起的调用拿到新版本。页面应在一次运行开始时取一次快照，并把
+快照的 tag 记录到结果中。加载或预热失败时保留当前版本，错误记录在 status() 中。
+
+服务启动时（serve.py）调用 boot() 预先加载并预热模型，第一个会话的预测与之后的耗时相同；
+readiness() 给出是否就绪及预热耗时。
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from predictor import FEATURES, FEATURES_INFO, predict_batch
+from artifacts import file_digest, manifest_path, read_manifest
+
+POLL_INTERVAL = 5.0
+# 预热批量的行数：大于 predictor.LATENCY_MAX_ROWS，走多线程预测的路径
+WARMUP_ROWS = 1024
+
+
+class LoadedModels:
+    """某一时刻加载的模型及其版本信息（只读快照）"""
+
+    __slots__ = ('models', 'path', 'version', 'tag', 'sha256', 'manifest', 'loaded_at', 'warmup_ms')
+
+    def __init__(self, models, path, version, tag, sha256, manifest, loaded_at, warmup_ms):
+        self.models = models
+        self.path = path
+        self.version = version
+        self.tag = tag
+        self.sha256 = sha256
+        self.manifest = manifest
+        self.loaded_at = loaded_at
+        self.warmup_ms = warmup_ms
+
+
+def warm_up(models, n_rows=WARMUP_ROWS):
+    """各目标依次做一次单行预测和一次批量预测（两种推理配置各走一遍）
+
+    单行取各特征的默认值，批量在各特征的取值范围内均匀取值。输出形状不对或含非有限值时
+    抛出 ValueError，返回耗时 (ms)。
+    """
+    x = np.array([[FEATURES_INFO[f]['default'] for f in FEATURES]], dtype=float)
+    low, high = (np.array([FEATURES_INFO[f]['range'][k] for f in FEATURES], dtype=float) for k in (0, 1))
+    X = low + np.random.default_rng(0).random((int(n_rows), len(FEATURES))) * (high - low)
+    t0 = time.perf_counter()
+    y = predict_batch(models, x, profile='latency')
+    Y = predict_batch(models, X, profile='throughput')
+    elapsed = (time.perf_counter() - t0) * 1000
+    if y.shape[0] != 1 or not np.all(np.isfinite(y)) or not np.all(np.isfinite(Y)):
+        raise ValueError(f'模型试预测结果异常: {y}')
+    return elapsed
+
+
+def version_tag(manifest, sha256):
+    """结果中记录的模型版本标签：清单中有版本号时为 vNNNN，否则为文件哈希前 8 位"""
+    if manifest is not None and 'version' in manifest and manifest.get('artifact_sha256') == sha256:
+        return f"v{int(manifest.get('version', 0)):04d}"
+    return f'sha-{sha256[:8]}'
+
+
+def load_snapshot(path):
+    """加载并预热模型文件，返回 LoadedModels
+
+    清单中的哈希与模型文件不一致（例如清单尚未随模型文件一起替换）时不使用清单，
+    版本标签退回为文件哈希。
+    """
+    sha256 = file_digest(path)
+    models = joblib.load(path)
+    warmup_ms = warm_up(models)
+    manifest = read_manifest(path)
+    if manifest is not None and manifest.get('artifact_sha256') != sha256:
+        manifest = None
+    return LoadedModels(
+        models=models, path=path,
+        version=None if manifest is None else int(manifest.get('version', 0)),
+        tag=version_tag(manifest, sha256), sha256=sha256, manifest=manifest,
+        loaded_at=datetime.now(), warmup_ms=warmup_ms
+    )
+
+
+class ModelStore:
+    def __init__(self, path, poll_interval=POLL_INTERVAL):
+        self.path = os.path.abspath(path)
+        self.poll_interval = poll_interval
+        self._current = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.n_swaps = 0
+        self.last_check = None
+        self.last_error = None
+
+    def _file_signature(self):
+        sig = []
+        for p in (self.path, manifest_path(self.path)):
+            try:
+                st = os.stat(p)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+
+    def current(self):
+        """当前版本的快照；首次调用时同步加载，加载失败时抛出异常"""
+        snapshot = self._current
+        if snapshot is None:
+            self.check()
+            snapshot = self._current
+            if snapshot is None:
+                raise RuntimeError(f'模型加载失败: {self.last_error}')
+        return snapshot
+
+    def check(self):
+        """检查模型文件是否变化，变化时加载、预热并替换；返回是否换了新版本"""
+        with self._load_lock:
+            self.last_check = datetime.now()
+            signature = self._file_signature()
+            if signature == self._signature and self._current is not None:
+                return False
+            try:
+                snapshot = load_snapshot(self.path)
+            except Exception as e:
+                # 保留当前版本，下次检查时重试
+                self.last_error = f'{type(e).__name__}: {e}'
+                return False
+            # 加载期间文件可能再次被替换：只记录加载前的签名，下一轮检查会再加载一次
+            self._signature = signature
+            self.last_error = None
+            with self._lock:
+                swapped = self._current is not None and self._current.sha256 != snapshot.sha256
+                if self._current is None or swapped:
+                    self._current = snapshot
+                    self.n_swaps += int(swapped)
+            return swapped
+
+    def start(self):
+        """启动后台监视线程（守护线程，重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name='model-store-watch', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    def status(self):
+        snapshot = self._current
+        return {
+            'path': self.path,
+            'tag': None if snapshot is None else snapshot.tag,
+            'loaded_at': None if snapshot is None else snapshot.loaded_at,
+            'warmup_ms': None if snapshot is None else snapshot.warmup_ms,
+            'n_swaps': self.n_swaps,
+            'last_check': self.last_check,
+            'last_error': self.last_error,
+        }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path, poll_interval=POLL_INTERVAL):
+    """进程内共享的 ModelStore（按绝对路径），首次取用时启动后台监视"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ModelStore(key, poll_interval)
+    store.start()
+    return store
+
+
+# ==================== 启动预热 ====================
+_readiness = {'ready': False, 'booted': False, 'started_at': None, 'finished_at': None,
+              'elapsed_ms': None, 'models': {}, 'errors': {}}
+
+
+def boot(paths):
+    """服务启动时加载并预热各模型文件，返回 readiness()
+
+    全部加载成功才算就绪；失败的文件记录在 errors 中，页面首次取用时会再尝试加载。
+    """
+    t0 = time.perf_counter()
+    _readiness.update(booted=True, ready=False, started_at=datetime.now(), models={}, errors={})
+    for path in paths:
+        try:
+            snapshot = get_store(path).current()
+        except Exception as e:
+            _readiness['errors'][os.path.abspath(path)] = f'{type(e).__name__}: {e}'
+            continue
+        _readiness['models'][snapshot.path] = {'tag': snapshot.tag, 'warmup_ms': snapshot.warmup_ms}
+    _readiness.update(ready=not _readiness['errors'], finished_at=datetime.now(),
+                      elapsed_ms=(time.perf_counter() - t0) * 1000)
+    return readiness()
+
+
+def readiness():
+    """启动预热的状态：booted 表示是否执行过 boot()，ready 表示全部模型已加载并预热"""
+    return dict(_readiness, models=dict(_readiness['models']), errors=dict(_readiness['errors']))
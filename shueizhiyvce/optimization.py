@@ -0,0 +1,507 @@
+"""多目标优化问题与算法配置
+
+决策变量固定为 (R2_NO2, R5_DO)，目标可以是 7 个模型输出中的任意子集，
+出水指标还可以按排放限值设为不等式约束 (预测值 - 限值 <= 0)。
+每一代把整个种群组装成一个特征矩阵，目标和约束涉及的指标一次批量预测，
+不再逐个体、逐目标调用模型。
+
+鲁棒模式下每个候选设定值在 M 个进水扰动情景上评估，目标和约束取期望值或
+CVaR。所有候选共用同一组情景（公共随机数），整代 pop×M 行仍是一次批量预测。
+
+日前调度模式以 24 小时的 (R2_NO2, R5_DO) 为 48 个决策变量，按分时电价最小化
+全天电费与累计水质指数；每个个体的 24 个小时行与整代一起批量预测，
+爬坡限制通过修复算子保证相邻小时的设定值变化不超过上限。
+
+岛屿模型把多个种群放到独立进程中并行进化，每隔若干代沿环形拓扑迁移精英个体，
+最后合并为一个非支配解集。
+
+交叉和变异在边界附近常产生相同或几乎相同的设定值，而树模型是分段常数的：
+两个控制变量落在同一组分裂阈值格子里的设定值预测完全相同。评估缓存以格子编号为键，
+同一次运行中已经评估过的格子（包括同一代内的重复）不再预测，结果与不缓存时一致。
+"""
+import multiprocessing as mp
+import sys
+import time
+import types
+from contextlib import contextmanager
+
+import numpy as np
+from scipy.special import comb
+from pymoo.algorithms.moo.nsga2 import NSGA2, RankAndCrowding
+from pymoo.algorithms.moo.nsga3 import NSGA3
+from pymoo.core.population import Population
+from pymoo.core.problem import Problem
+from pymoo.core.repair import Repair
+from pymoo.indicators.hv import HV
+from pymoo.operators.crossover.sbx import SBX
+from pymoo.operators.mutation.pm import PM
+from pymoo.operators.sampling.rnd import FloatRandomSampling
+from pymoo.optimize import minimize
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
+from pymoo.util.ref_dirs import get_reference_directions
+
+from convergence import GenerationHistory
+from predictor import (INLET_FEATURES, build_features, build_scenario_features, build_schedule_features,
+                       THREAD_BUDGET, control_thresholds, predict_batch)
+
+DEFAULT_OBJECTIVES = ['total_energy', 'EQ_contrib']
+
+# GB 18918-2002 城镇污水处理厂污染物排放标准 (mg/L)，SNH 对应氨氮
+DISCHARGE_STANDARDS = {
+    '一级A': {'SNH': 5.0, 'TSS': 10.0, 'TotalN': 15.0, 'COD': 50.0, 'BOD5': 10.0},
+    '一级B': {'SNH': 8.0, 'TSS': 20.0, 'TotalN': 20.0, 'COD': 60.0, 'BOD5': 20.0},
+}
+
+ALGORITHMS = {
+    'nsga2': 'NSGA-II',
+    'nsga3': 'NSGA-III（参考方向）',
+}
+
+
+RISK_MEASURES = {
+    'mean': '期望值',
+    'cvar': 'CVaR（最差尾部均值）',
+}
+
+# NSGA-III 参考方向划分数的上限：种群很大时参考方向数不随之无限增长
+MAX_REF_PARTITIONS = 1000
+
+# 单次运行评估缓存的最大条目数（每条为一行目标与约束指标）
+EVAL_CACHE_SIZE = 100000
+
+
+# ==================== 进水不确定性 ====================
+def sample_inlet_scenarios(inlet_data, rel_std=0.1, n_samples=200, seed=0):
+    """以实测进水为均值、相对标准差 rel_std 的正态扰动，返回 (n_samples, 5) 情景矩阵
+
+    rel_std 可以是标量，也可以是 {特征名: 相对标准差} 的字典；负值截断为 0。
+    固定 seed 使同一次优化中所有候选、所有代使用同一组情景。
+    """
+    base = np.array([inlet_data[name] for name in INLET_FEATURES], dtype=float)
+    if isinstance(rel_std, dict):
+        sigma = np.array([rel_std.get(name, 0.0) for name in INLET_FEATURES], dtype=float)
+    else:
+        sigma = np.full(len(INLET_FEATURES), float(rel_std))
+    z = np.random.default_rng(seed).standard_normal((int(n_samples), len(INLET_FEATURES)))
+    return np.maximum(base * (1.0 + sigma * z), 0.0)
+
+
+def risk_aggregate(Y, risk='mean', alpha=0.9):
+    """沿情景轴 (axis=1) 聚合 (n, M, k) 预测：期望值，或最差 (1-alpha) 比例情景的均值 (CVaR)"""
+    if risk == 'mean':
+        return Y.mean(axis=1)
+    if risk == 'cvar':
+        m = Y.shape[1]
+        tail = max(1, int(np.ceil((1.0 - alpha) * m)))
+        # 所有目标都是越小越好，尾部取最大的 tail 个值
+        return np.partition(Y, m - tail, axis=1)[:, m - tail:].mean(axis=1)
+    raise ValueError(f'未知的风险度量: {risk}，可选: {list(RISK_MEASURES)}')
+
+
+def predict_robust(models, scenarios, controls, targets, risk='mean', alpha=0.9):
+    """一批控制参数在全部情景上的风险聚合预测，返回 (n, len(targets))"""
+    controls = np.atleast_2d(np.asarray(controls, dtype=float))
+    Y = predict_batch(models, build_scenario_features(scenarios, controls), targets)
+    return risk_aggregate(Y.reshape(controls.shape[0], len(scenarios), len(targets)), risk, alpha)
+
+
+# ==================== 优化问题 ====================
+class WastewaterOptimization(Problem):
+    def __init__(self, inlet_data, models, r2_range, r5_range, objectives=DEFAULT_OBJECTIVES, limits=None,
+                 uncertainty=None, surrogate=None, eval_cache=True):
+        self.inlet_data = inlet_data
+        self.models = models
+        self.objectives = list(objectives)
+        self.limits = dict(limits or {})
+        # 鲁棒模式：uncertainty = {'rel_std', 'n_samples', 'risk', 'alpha', 'seed'}
+        self.uncertainty = dict(uncertainty or {})
+        # 代理模式：用拟合好的代理模型（见 surrogate.py）代替真实模型评估
+        self.surrogate = surrogate
+        self.scenarios = None
+        if self.uncertainty:
+            self.scenarios = sample_inlet_scenarios(
+                inlet_data,
+                self.uncertainty.get('rel_std', 0.1),
+                self.uncertainty.get('n_samples', 200),
+                self.uncertainty.get('seed', 0)
+            )
+        # 目标和约束用到的指标合并后只预测一次
+        self.targets = self.objectives + [t for t in self.limits if t not in self.objectives]
+        self.limit_cols = [self.targets.index(t) for t in self.limits]
+        self.limit_values = np.array(list(self.limits.values()), dtype=float)
+        # 评估计数，用于统计落在超标区域的评估次数
+        self.n_evaluated = 0
+        self.n_infeasible = 0
+        # 评估缓存：树模型按控制变量的分裂阈值格子取键；代理模型是连续的，只复用完全相同的设定值
+        self.eval_cache = bool(eval_cache)
+        self.n_cache_hits = 0
+        self._cache = {}
+        self._thresholds = None
+        if self.eval_cache and surrogate is None:
+            self._thresholds = control_thresholds(models, self.targets)
+        super().__init__(
+            n_var=2, n_obj=len(self.objectives), n_ieq_constr=len(self.limits),
+            xl=np.array([r2_range[0], r5_range[0]]),
+            xu=np.array([r2_range[1], r5_range[1]])
+        )
+
+    def predict(self, x):
+        """一批控制参数 (n, 2) 的目标与约束指标，列顺序同 self.targets
+
+        依次按代理模型、鲁棒情景聚合或名义进水计算。
+        """
+        if self.surrogate is not None:
+            return self.surrogate.predict(x)[:, [self.surrogate.targets.index(t) for t in self.targets]]
+        if self.scenarios is None:
+            return predict_batch(self.models, build_features(self.inlet_data, x), self.targets)
+        return predict_robust(
+            self.models, self.scenarios, x, self.targets,
+            self.uncertainty.get('risk', 'mean'), self.uncertainty.get('alpha', 0.9)
+        )
+
+    def cache_keys(self, x):
+        """一批设定值的评估缓存键：所在阈值格子的编号，或代理模式下设定值本身"""
+        if self._thresholds is None:
+            return [row.tobytes() for row in np.ascontiguousarray(x, dtype=float)]
+        x32 = np.asarray(x, dtype=np.float32)
+        t2, t5 = self._thresholds
+        i = np.searchsorted(t2, x32[:, 0], side='right')
+        j = np.searchsorted(t5, x32[:, 1], side='right')
+        return (i * (len(t5) + 1) + j).tolist()
+
+    def predict_cached(self, x):
+        """与 predict 相同，但只预测本次运行尚未评估过的格子（同一批内的重复只预测一次）"""
+        Y = np.empty((x.shape[0], len(self.targets)))
+        missing = {}
+        for row, key in enumerate(self.cache_keys(x)):
+            cached = self._cache.get(key)
+            if cached is None:
+                missing.setdefault(key, []).append(row)
+            else:
+                Y[row] = cached
+        if missing:
+            Y_new = self.predict(x[[rows[0] for rows in missing.values()]])
+            for (key, rows), y in zip(missing.items(), Y_new):
+                Y[rows] = y
+                if len(self._cache) < EVAL_CACHE_SIZE:
+                    self._cache[key] = y
+        self.n_cache_hits += x.shape[0] - len(missing)
+        return Y
+
+    def _evaluate(self, x, out, *args, **kwargs):
+        Y = self.predict_cached(x) if self.eval_cache else self.predict(x)
+        out["F"] = Y[:, :self.n_obj]
+        self.n_evaluated += x.shape[0]
+        if self.limits:
+            G = Y[:, self.limit_cols] - self.limit_values
+            out["G"] = G
+            self.n_infeasible += int(np.count_nonzero((G > 0).any(axis=1)))
+
+
+# ==================== 日前 24 小时调度 ====================
+# 典型工商业分时电价 (元/kWh)：谷 0-8 时，峰 8-11、18-22 时，其余为平段
+DEFAULT_TARIFF = [0.35] * 8 + [1.05] * 3 + [0.68] * 7 + [1.05] * 4 + [0.68] * 2
+
+SCHEDULE_OBJECTIVES = ['energy_cost', 'EQ_total']
+SCHEDULE_OBJECTIVE_NAMES = {'energy_cost': '全天电费 (元)', 'EQ_total': '累计水质指数 (点)'}
+
+
+class RampRepair(Repair):
+    """爬坡限制：从第 0 小时起逐小时把设定值裁剪到上一小时 ± max_step 之内"""
+
+    def __init__(self, max_step):
+        super().__init__()
+        self.max_step = np.asarray(max_step, dtype=float)
+
+    def _do(self, problem, X, **kwargs):
+        S = X.reshape(len(X), -1, 2).copy()
+        for h in range(1, S.shape[1]):
+            S[:, h] = np.clip(S[:, h], S[:, h - 1] - self.max_step, S[:, h - 1] + self.max_step)
+        return S.reshape(len(X), -1)
+
+
+class ScheduleOptimization(Problem):
+    """决策变量按小时交错排列 [R2_0, R5_0, R2_1, R5_1, ...]，reshape(n, H, 2) 即为逐时计划"""
+
+    def __init__(self, forecast, tariff, models, r2_range, r5_range, limits=None):
+        self.forecast = np.asarray(forecast, dtype=float)
+        self.tariff = np.asarray(tariff, dtype=float)
+        self.n_hours = self.forecast.shape[0]
+        if self.tariff.shape != (self.n_hours,):
+            raise ValueError(f'电价表长度 {self.tariff.shape} 与进水预测小时数 {self.n_hours} 不一致')
+        self.models = models
+        self.limits = dict(limits or {})
+        self.targets = ['total_energy', 'EQ_contrib'] + [t for t in self.limits]
+        self.limit_values = np.array(list(self.limits.values()), dtype=float)
+        self.n_evaluated = 0
+        self.n_infeasible = 0
+        super().__init__(
+            n_var=2 * self.n_hours, n_obj=2, n_ieq_constr=len(self.limits),
+            xl=np.tile([r2_range[0], r5_range[0]], self.n_hours),
+            xu=np.tile([r2_range[1], r5_range[1]], self.n_hours)
+        )
+
+    def hourly(self, x):
+        """一批计划的逐时预测，返回 (n, H, len(targets))"""
+        x = np.atleast_2d(x)
+        Y = predict_batch(self.models, build_schedule_features(self.forecast, x), self.targets)
+        return Y.reshape(x.shape[0], self.n_hours, len(self.targets))
+
+    def _evaluate(self, x, out, *args, **kwargs):
+        Y = self.hourly(x)
+        out["F"] = np.column_stack([Y[:, :, 0] @ self.tariff, Y[:, :, 1].sum(axis=1)])
+        self.n_evaluated += x.shape[0]
+        if self.limits:
+            # 每个受限指标取全天最大超标量，任一小时超标即不可行
+            G = (Y[:, :, 2:] - self.limit_values).max(axis=1)
+            out["G"] = G
+            self.n_infeasible += int(np.count_nonzero((G > 0).any(axis=1)))
+
+
+# ==================== 算法配置 ====================
+def reference_directions(n_obj, pop_size):
+    """Das-Dennis 参考方向：取方向数不超过种群大小的最大划分数（不超过 MAX_REF_PARTITIONS）"""
+    if n_obj < 2:
+        raise ValueError(f'参考方向至少需要 2 个目标，当前: {n_obj}')
+    n_partitions = 1
+    while (n_partitions < MAX_REF_PARTITIONS
+           and comb(n_obj + n_partitions, n_partitions + 1, exact=True) <= pop_size):
+        n_partitions += 1
+    return get_reference_directions("das-dennis", n_obj, n_partitions=n_partitions)
+
+
+def build_algorithm(name, n_obj, pop_size, sampling=None, repair=None):
+    operators = dict(
+        sampling=FloatRandomSampling() if sampling is None else sampling,
+        crossover=SBX(prob=0.9, eta=15),
+        mutation=PM(eta=20)
+    )
+    if repair is not None:
+        operators['repair'] = repair
+    if name == 'nsga2':
+        return NSGA2(pop_size=int(pop_size), **operators)
+    if name == 'nsga3':
+        return NSGA3(ref_dirs=reference_directions(n_obj, pop_size), pop_size=int(pop_size), **operators)
+    raise ValueError(f'未知的优化算法: {name}，可选: {list(ALGORITHMS)}')
+
+
+# ==================== 单种群优化 ====================
+def _constraint_violation(G):
+    """与 pymoo 一致：各约束超出量之和"""
+    if G is None or G.shape[1] == 0:
+        return np.zeros(0 if G is None else G.shape[0])
+    return np.maximum(G, 0).sum(axis=1)
+
+
+def run_single(models, problem_kwargs, algorithm_name, pop_size, n_gen, seed=None, sampling=None,
+               record_history=False):
+    """单种群优化；返回字典 X/F（无可行解时为 None）、评估计数（含评估缓存命中数）和耗时
+
+    sampling 可传入初始种群的决策变量矩阵 (pop_size, 2)，用于热启动。
+    record_history=True 时逐代记录种群与超体积（见 convergence.py），结果放在 'history' 中。
+    """
+    t0 = time.perf_counter()
+    problem = WastewaterOptimization(models=models, **problem_kwargs)
+    algorithm = build_algorithm(algorithm_name, problem.n_obj, pop_size, sampling=sampling)
+    recorder = GenerationHistory(n_gen, pop_size, problem.n_obj, problem.n_var) if record_history else None
+    options = {} if recorder is None else {'callback': recorder}
+    res = minimize(problem, algorithm, ('n_gen', int(n_gen)), seed=seed, verbose=False, **options)
+    cv = res.pop.get("CV").ravel()
+    return {
+        'X': res.X,
+        'F': res.F,
+        'n_evaluated': problem.n_evaluated,
+        'n_infeasible': problem.n_infeasible,
+        'n_cache_hits': problem.n_cache_hits,
+        'min_cv': float(cv.min()) if len(cv) else 0.0,
+        'history': None if recorder is None else recorder.result(),
+        'elapsed': time.perf_counter() - t0,
+    }
+
+
+def run_schedule(models, forecast, tariff, r2_range, r5_range, limits=None, ramp=None,
+                 algorithm_name='nsga2', pop_size=100, n_gen=200, seed=None):
+    """日前 24 小时调度优化
+
+    ramp 为 (R2_NO2, R5_DO) 相邻小时的最大变化量，None 表示不限制。
+    返回字典 X 为 (n, H, 2) 的逐时计划、F 为 [电费, 累计水质指数]，
+    Y 为逐时预测 (n, H, 2+约束数)，无可行计划时 X/F/Y 为 None。
+    """
+    t0 = time.perf_counter()
+    problem = ScheduleOptimization(forecast, tariff, models, r2_range, r5_range, limits)
+    repair = RampRepair(ramp) if ramp is not None else None
+    algorithm = build_algorithm(algorithm_name, problem.n_obj, pop_size, repair=repair)
+    res = minimize(problem, algorithm, ('n_gen', int(n_gen)), seed=seed, verbose=False)
+    cv = res.pop.get("CV").ravel()
+    result = {
+        'X': None, 'F': None, 'Y': None,
+        'n_evaluated': problem.n_evaluated,
+        'n_infeasible': problem.n_infeasible,
+        'min_cv': float(cv.min()) if len(cv) else 0.0,
+    }
+    if res.X is not None:
+        X = np.atleast_2d(res.X)
+        result['X'] = X.reshape(len(X), problem.n_hours, 2)
+        result['F'] = np.atleast_2d(res.F)
+        result['Y'] = problem.hourly(X)
+    result['elapsed'] = time.perf_counter() - t0
+    return result
+
+
+# ==================== 岛屿模型并行优化 ====================
+# 工作进程内常驻的问题对象，由 _init_island_worker 在进程启动时创建一次
+_island = {}
+
+
+@contextmanager
+def _detached_main():
+    """spawn 启动的子进程会重新导入 __main__，而在 Streamlit 中 __main__ 就是页面脚本。
+    创建进程池期间临时换成空模块，子进程只导入本模块。"""
+    main = sys.modules.get('__main__')
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+def _init_island_worker(models, problem_kwargs, algorithm_name, pop_size, n_threads):
+    # 工作进程的线程预算为主进程租给它的线程数，避免多进程时线程超额订阅
+    THREAD_BUDGET.configure(n_threads)
+    _island['problem'] = WastewaterOptimization(models=models, **problem_kwargs)
+    _island['algorithm'] = (algorithm_name, pop_size)
+
+
+def _evolve_island(state, n_gen, seed):
+    """把一个岛屿推进 n_gen 代；state 为 None 时随机初始化
+
+    返回按非支配等级和拥挤度从优到劣排序的种群，以及本段的评估计数。
+    """
+    problem = _island['problem']
+    algorithm_name, pop_size = _island['algorithm']
+    n_evaluated, n_infeasible, n_cache_hits = problem.n_evaluated, problem.n_infeasible, problem.n_cache_hits
+
+    sampling = None
+    if state is not None:
+        # 已评估过的个体直接作为初始种群，不再重复预测
+        sampling = Population.new("X", state['X'], "F", state['F'], "G", state['G'], "H", state['H'])
+        for ind in sampling:
+            ind.evaluated = {"F", "G", "H"}
+        n_gen += 1  # 第一代只是载入种群
+
+    algorithm = build_algorithm(algorithm_name, problem.n_obj, pop_size, sampling=sampling)
+    res = minimize(problem, algorithm, ('n_gen', int(n_gen)), seed=seed, verbose=False)
+
+    pop = res.pop
+    order = RankAndCrowding().do(problem, pop, n_survive=len(pop), return_indices=True)
+    X, F, G, H = pop[order].get("X", "F", "G", "H")
+    return {
+        'X': X, 'F': F, 'G': G, 'H': H,
+        'n_evaluated': problem.n_evaluated - n_evaluated,
+        'n_infeasible': problem.n_infeasible - n_infeasible,
+        'n_cache_hits': problem.n_cache_hits - n_cache_hits,
+    }
+
+
+def run_islands(models, problem_kwargs, algorithm_name, pop_size, n_gen, n_islands,
+                migration_interval=10, n_migrants=None, seed=None, progress=None):
+    """岛屿模型：n_islands 个种群在独立进程中并行进化
+
+    每 migration_interval 代，每个岛屿最优的 n_migrants 个个体迁移到下一个岛屿
+    （环形拓扑），替换其最差个体。结束后合并所有岛屿的可行个体，
+    取非支配前沿。返回值与 run_single 相同，另含各岛屿的种群大小。
+    """
+    t0 = time.perf_counter()
+    n_islands = int(n_islands)
+    n_migrants = max(1, int(pop_size) // 10) if n_migrants is None else int(n_migrants)
+    rng = np.random.default_rng(seed)
+
+    states = [None] * n_islands
+    n_evaluated = n_infeasible = n_cache_hits = 0
+    done = 0
+    # spawn 启动方式不继承 Streamlit 服务进程的线程和 OpenMP 状态，更安全；
+    # Pool 在构造时一次性启动全部工作进程
+    with THREAD_BUDGET.lease(n_islands) as n_threads:
+        with _detached_main():
+            pool = mp.get_context('spawn').Pool(
+                processes=n_islands,
+                initializer=_init_island_worker,
+                initargs=(models, problem_kwargs, algorithm_name, int(pop_size), n_threads)
+            )
+        with pool:
+            while done < n_gen:
+                step = min(int(migration_interval), int(n_gen) - done)
+                seeds = rng.integers(0, 2 ** 31 - 1, size=n_islands)
+                states = pool.starmap(_evolve_island, [(states[i], step, int(seeds[i])) for i in range(n_islands)])
+                for st_ in states:
+                    n_evaluated += st_.pop('n_evaluated')
+                    n_infeasible += st_.pop('n_infeasible')
+                    n_cache_hits += st_.pop('n_cache_hits')
+                done += step
+
+                # 环形迁移：岛屿 i 的精英替换岛屿 i+1 的最差个体
+                if done < n_gen and n_islands > 1:
+                    k = min(n_migrants, len(states[0]['X']) - 1)
+                    emigrants = [{key: v[:k].copy() for key, v in st_.items()} for st_ in states]
+                    for i, st_ in enumerate(states):
+                        src = emigrants[(i - 1) % n_islands]
+                        for key in st_:
+                            st_[key][-k:] = src[key]
+
+                if progress is not None:
+                    progress(done / n_gen)
+
+    X = np.vstack([st_['X'] for st_ in states])
+    F = np.vstack([st_['F'] for st_ in states])
+    cv = _constraint_violation(np.vstack([st_['G'] for st_ in states]))
+    result = {
+        'X': None,
+        'F': None,
+        'n_evaluated': n_evaluated,
+        'n_infeasible': n_infeasible,
+        'n_cache_hits': n_cache_hits,
+        'min_cv': float(cv.min()) if len(cv) else 0.0,
+        'island_sizes': [len(st_['X']) for st_ in states],
+    }
+
+    feasible = cv <= 0 if len(cv) else np.ones(len(X), dtype=bool)
+    if feasible.any():
+        X, F = X[feasible], F[feasible]
+        front = NonDominatedSorting().do(F, only_non_dominated_front=True)
+        # 迁移会让同一个体出现在多个岛屿中，合并时去重
+        _, unique = np.unique(X[front], axis=0, return_index=True)
+        keep = np.sort(front[unique])
+        result['X'], result['F'] = X[keep], F[keep]
+
+    result['elapsed'] = time.perf_counter() - t0
+    return result
+
+
+def hypervolumes(fronts):
+    """在共同的归一化尺度下计算多个前沿的超体积（参考点 1.1），用于质量对比"""
+    valid = [F for F in fronts if F is not None and len(F)]
+    if not valid:
+        return [0.0 for _ in fronts]
+    union = np.vstack(valid)
+    ideal, nadir = union.min(axis=0), union.max(axis=0)
+    span = np.where(nadir > ideal, nadir - ideal, 1.0)
+    indicator = HV(ref_point=np.full(union.shape[1], 1.1))
+    return [float(indicator((F - ideal) / span)) if F is not None and len(F) else 0.0 for F in fronts]
+
+
+def benchmark_islands(models, problem_kwargs, algorithm_name, pop_size, n_gen, n_islands,
+                      migration_interval=10, seed=1):
+    """岛屿模型与单种群的速度/质量对比
+
+    两者评估预算相同：单种群的种群大小 = 岛屿数 × 每岛种群大小，代数相同。
+    """
+    single = run_single(models, problem_kwargs, algorithm_name, int(pop_size) * int(n_islands), n_gen, seed=seed)
+    islands = run_islands(models, problem_kwargs, algorithm_name, pop_size, n_gen, n_islands,
+                          migration_interval=migration_interval, seed=seed)
+    hv_single, hv_islands = hypervolumes([single['F'], islands['F']])
+    return {
+        'single': dict(single, hv=hv_single),
+        'islands': dict(islands, hv=hv_islands),
+        'speedup': single['elapsed'] / islands['elapsed'] if islands['elapsed'] > 0 else float('nan'),
+        'hv_ratio': hv_islands / hv_single if hv_single > 0 else float('nan'),
+    }
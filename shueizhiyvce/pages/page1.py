@@ -1,13 +1,22 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
+import sys
 # 获取当前文件所在目录
 current_dir = os.path.dirname(os.path.abspath(__file__))
 model_path = os.path.join(current_dir, 'energy_quality_models.pkl')
+# 共享模块位于上级目录（单独运行本页面时也能导入）
+if os.path.dirname(current_dir) not in sys.path:
+    sys.path.insert(0, os.path.dirname(current_dir))
+import explain
+import ingest
+import model_store
+import plotting
+import predictor
+import results_io
 # ==================== 页面配置 ====================
 st.set_page_config(
     page_title="污水处理厂预测系统", 
@@ -135,16 +144,16 @@ st.markdown('<h1 class="main-title">🌊 污水处理厂智能预测系统</h1>'
 st.markdown('<p class="sub-title">基于机器学习的出水水质与能耗预测平台</p>', unsafe_allow_html=True)
 
 # ==================== 加载模型 ====================
-@st.cache_resource
-def load_models():
-    try:
-        return joblib.load( model_path,'./energy_quality_models.pkl')
-    except Exception as e:
-        st.error(f"❌ 模型加载失败: {e}")
-        st.stop()
+# 共享模型仓库在后台监视模型文件，新版本预热后原子替换；本次运行全程使用同一个快照
+try:
+    loaded = model_store.get_store(model_path).current()
+except Exception as e:
+    st.error(f"❌ 模型加载失败: {e}")
+    st.stop()
 
-models = load_models()
-st.markdown('<div class="success-box">✅ 模型加载成功！共包含 {} 个预测模型</div>'.format(len(models)), unsafe_allow_html=True)
+models = loaded.models
+st.markdown(f'<div class="success-box">✅ 模型加载成功！版本 {loaded.tag}，共包含 {len(models)} 个预测模型</div>',
+            unsafe_allow_html=True)
 
 # ==================== 系统说明 ====================
 with st.expander("📖 系统使用说明", expanded=False):
@@ -178,15 +187,7 @@ with st.expander("📖 系统使用说明", expanded=False):
 st.markdown("---")
 
 # ==================== 定义特征和标签信息 ====================
-features_info = {
-    'SNH_in': {'name': '入水SNH浓度', 'unit': 'mg/L', 'range': (0, 100), 'default': 30, 'icon': '🔵'},
-    'TSS_in': {'name': '入水TSS浓度', 'unit': 'mg/L', 'range': (0, 500), 'default': 150, 'icon': '🟤'},
-    'TotalN_in': {'name': '入水总氮', 'unit': 'mg/L', 'range': (0, 100), 'default': 50, 'icon': '🟢'},
-    'COD_in': {'name': '入水COD浓度', 'unit': 'mg/L', 'range': (0, 1000), 'default': 300, 'icon': '🔴'},
-    'BOD5_in': {'name': '入水BOD5浓度', 'unit': 'mg/L', 'range': (0, 500), 'default': 150, 'icon': '🟡'},
-    'R2_NO2': {'name': '第2反应池硝态氮', 'unit': 'mg/L', 'range': (0, 50), 'default': 10, 'icon': '⚙️'},
-    'R5_DO': {'name': '第5反应池溶解氧', 'unit': 'mg/L', 'range': (0, 10), 'default': 3, 'icon': '⚙️'}
-}
+features_info = predictor.FEATURES_INFO
 
 targets_info = {
     'SNH': {'name': '出水SNH', 'unit': 'mg/L', 'lower_better': True, 'color': '#2196F3'},
@@ -262,15 +263,11 @@ predict_button = st.button("🚀 开始预测", use_container_width=True, type="
 
 if predict_button:
     with st.spinner("🔄 正在预测中..."):
-        # 进行预测
-        predictions = {}
-        input_df_pred = pd.DataFrame([input_features])
-        
-        for target in models.keys():
-            pred_value = models[target].predict(input_df_pred)[0]
-            predictions[target] = pred_value
+        # 进行预测（逐目标模型字典与多输出模型都通过 predict_batch 一次给出全部指标）
+        x_input = np.array([[input_features[f] for f in predictor.FEATURES]])
+        predictions = dict(zip(predictor.TARGETS, predictor.predict_batch(models, x_input, profile='latency')[0].tolist()))
     
-    st.success("✅ 预测完成！")
+    st.success(f"✅ 预测完成！（模型版本 {loaded.tag}）")
     
     st.markdown("---")
     
@@ -367,7 +364,7 @@ if predict_button:
     # ==================== 可视化分析 ====================
     st.header("📈 可视化分析")
     
-    tab1, tab2, tab3 = st.tabs(["📊 进出水对比", "🎯 去除效率", "📉 预测结果总览"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📊 进出水对比", "🎯 去除效率", "📉 预测结果总览", "🔍 预测解释"])
     
     with tab1:
         st.subheader("进出水水质对比")
@@ -543,6 +540,26 @@ if predict_button:
                 delta=None
             )
     
+    with tab4:
+        st.subheader("各指标预测值的特征贡献（TreeSHAP）")
+        st.markdown("""
+        <div class="info-box">
+        基准值为模型在训练数据上的平均预测，红色条表示该特征使预测值升高，绿色条表示使其降低，
+        基准值加上全部贡献即为本次预测值。
+        </div>
+        """, unsafe_allow_html=True)
+        
+        if predictor.is_multi_output(models):
+            st.info("ℹ️ 当前加载的是多输出模型，XGBoost 暂不支持对其计算特征贡献，请使用逐目标模型文件")
+        else:
+            # 7个指标模型各调用一次，得到本次输入在全部特征上的贡献
+            contribs = explain.contributions(models, x_input, model_version=loaded.tag)[0]
+            
+            target_tabs = st.tabs([targets_info[t]['name'] for t in predictor.TARGETS])
+            for j, (target_tab, target) in enumerate(zip(target_tabs, predictor.TARGETS)):
+                with target_tab:
+                    st.plotly_chart(explain.waterfall(contribs[j], x_input[0], target), use_container_width=True)
+    
     st.markdown("---")
     
     # ==================== 导出结果 ====================
@@ -600,6 +617,22 @@ if predict_button:
             mime="text/plain",
             use_container_width=True
         )
+    
+    # 列式导出：保留全精度数值，可在下方“载入已导出的预测结果”中重新载入
+    prediction_arrow = results_io.prediction_table(
+        input_features, {t: float(predictions[t]) for t in predictor.TARGETS},
+        meta={'model_file': os.path.basename(model_path), 'model_version': loaded.tag}
+    )
+    export_cols = st.columns(len(results_io.FORMATS))
+    for col, (fmt, (fmt_name, ext, mime)) in zip(export_cols, results_io.FORMATS.items()):
+        with col:
+            st.download_button(
+                label=f"🗂️ 下载预测结果 ({fmt_name})",
+                data=results_io.to_bytes(prediction_arrow, fmt),
+                file_name=f"prediction_results{ext}",
+                mime=mime,
+                use_container_width=True
+            )
 
 else:
     # 未预测时的提示
@@ -618,6 +651,193 @@ else:
     </div>
     """, unsafe_allow_html=True)
 
+# ==================== 历史数据批量评分 ====================
+st.markdown("---")
+st.header("📦 历史数据批量评分")
+
+with st.expander("按固定大小分块读取历史数据（CSV / Parquet），批量预测并流式写出 Parquet / Arrow", expanded=False):
+    st.markdown(f"""
+    <div class="info-box">
+    📦 适用于数据平台导出的长时间序列（例如多年的15分钟数据）。每次只读取一个数据块，
+    整块一次预测7项指标后立即追加写入输出文件，内存占用只取决于块大小。
+    输出扩展名为 .parquet 时写 Parquet，为 .arrow / .feather 时写 Arrow IPC 文件。
+    输入与输出文件都位于数据目录 <code>{ingest.DATA_DIR}</code> 中。
+    </div>
+    """, unsafe_allow_html=True)
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        batch_inputs = ingest.list_data_files()
+        batch_input_name = st.selectbox(
+            "输入文件 (.csv / .parquet)", batch_inputs,
+            index=batch_inputs.index("history.csv") if "history.csv" in batch_inputs else 0,
+            placeholder="数据目录中没有数据文件"
+        )
+    with col2:
+        batch_output_name = st.text_input("输出文件 (.parquet / .arrow)", value="scored_history.parquet",
+                                          help="数据目录下的文件名")
+    with col3:
+        batch_chunksize = st.number_input("每块行数", value=ingest.DEFAULT_CHUNKSIZE, min_value=1000,
+                                          step=50000, help="块越大吞吐越高，内存占用也越大")
+
+    batch_output, batch_error = None, None
+    try:
+        batch_output = ingest.data_path(batch_output_name, ('.parquet', '.pq', '.arrow', '.feather'))
+    except ValueError as e:
+        batch_error = str(e)
+    if batch_input_name is None:
+        st.markdown(f'<div class="warning-box">⚠️ 数据目录 {ingest.DATA_DIR} 中没有数据文件</div>',
+                    unsafe_allow_html=True)
+    else:
+        batch_input = ingest.data_path(batch_input_name, ingest.INPUT_SUFFIXES)
+        if batch_output == batch_input:
+            batch_error = "输出文件不能与输入文件相同"
+        if batch_error:
+            st.markdown(f'<div class="warning-box">❌ {batch_error}</div>', unsafe_allow_html=True)
+        source_columns = ingest.read_columns(batch_input)
+        auto_mapping = ingest.auto_column_mapping(source_columns)
+        st.markdown("**🔗 列映射（源列 → 模型特征）**")
+        mapping_cols = st.columns(len(predictor.FEATURES))
+        batch_mapping = {}
+        for col, feature in zip(mapping_cols, predictor.FEATURES):
+            with col:
+                options = ["（未映射）"] + source_columns
+                choice = st.selectbox(
+                    f"{features_info[feature]['icon']} {feature}",
+                    options,
+                    index=options.index(auto_mapping[feature]) if feature in auto_mapping else 0,
+                    key=f"map_{feature}"
+                )
+                if choice != "（未映射）":
+                    batch_mapping[feature] = choice
+        mapped = set(batch_mapping.values())
+        keep_columns = st.multiselect(
+            "原样保留到输出的列（如时间戳、设备编号）",
+            [c for c in source_columns if c not in mapped],
+            default=[c for c in source_columns if c not in mapped][:1]
+        )
+
+        unmapped = [f for f in predictor.FEATURES if f not in batch_mapping]
+        if unmapped:
+            st.markdown(f'<div class="warning-box">⚠️ 以下特征尚未映射: {", ".join(unmapped)}</div>',
+                        unsafe_allow_html=True)
+
+        if st.button("▶️ 开始批量评分", use_container_width=True, disabled=bool(unmapped or batch_error)):
+            batch_bar = st.progress(0)
+            batch_status = st.empty()
+
+            def _batch_progress(done, total, rate):
+                batch_bar.progress(min(done / max(total, 1), 1.0))
+                batch_status.text(f"⏳ 已处理 {done:,} / {total:,} 行，{rate:,.0f} 行/秒")
+
+            try:
+                report = ingest.score_file(models, batch_input, batch_output, mapping=batch_mapping,
+                                           keep_columns=keep_columns, chunksize=int(batch_chunksize),
+                                           progress=_batch_progress, meta={'model_version': loaded.tag})
+            except (ValueError, OSError) as e:
+                st.markdown(f'<div class="warning-box">❌ 批量评分失败: {e}</div>', unsafe_allow_html=True)
+            else:
+                batch_status.text(f"✅ 已写出 {batch_output_name}")
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("总行数", f"{report['n_rows']:,}")
+                with col2:
+                    st.metric("吞吐量", f"{report['rows_per_sec']:,.0f} 行/秒")
+                with col3:
+                    st.metric("耗时", f"{report['elapsed']:.1f} 秒")
+                with col4:
+                    st.metric("缺失特征行（输出为空）", f"{report['n_incomplete']:,}")
+
+                beyond = {f: n for f, n in report['out_of_range'].items() if n}
+                if beyond:
+                    st.markdown("**⚠️ 超出常规取值范围的记录（已照常预测）：**")
+                    st.dataframe(pd.DataFrame({
+                        '特征': [features_info[f]['name'] for f in beyond],
+                        '常规范围': [f"{features_info[f]['range'][0]} - {features_info[f]['range'][1]}" for f in beyond],
+                        '越界行数': list(beyond.values())
+                    }), use_container_width=True, hide_index=True)
+
+                # 长时间序列在服务端分块 LTTB 降采样后再绘制
+                x_col = keep_columns[0] if keep_columns else None
+                out_stat = os.stat(batch_output)
+
+                def build_batch_figure():
+                    sampled = plotting.lttb_chunks(
+                        ingest.iter_chunks(batch_output, int(batch_chunksize),
+                                           columns=([x_col] if x_col else []) + ['total_energy', 'EQ_contrib']),
+                        'total_energy'
+                    )
+                    xs = sampled[x_col] if x_col else sampled.index
+                    fig_batch = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                                              subplot_titles=("总能耗 (kWh)", "出水水质指数"))
+                    fig_batch.add_trace(plotting.scatter(xs, sampled['total_energy'], name='总能耗',
+                                                         line=dict(color='#9C27B0')), row=1, col=1)
+                    fig_batch.add_trace(plotting.scatter(xs, sampled['EQ_contrib'], name='出水水质指数',
+                                                         line=dict(color='#00BCD4')), row=2, col=1)
+                    fig_batch.update_layout(
+                        height=550, hovermode='x unified',
+                        title=f"预测结果时间序列（{report['n_rows']:,} 行降采样至 {len(sampled):,} 点）"
+                    )
+                    return fig_batch
+
+                st.plotly_chart(
+                    plotting.cached_figure(('batch', os.path.abspath(batch_output), out_stat.st_mtime_ns,
+                                            out_stat.st_size, x_col), build_batch_figure),
+                    use_container_width=True
+                )
+
+                st.markdown("**👀 输出预览（前100行）：**")
+                st.dataframe(next(ingest.iter_chunks(batch_output, 100)).head(100), use_container_width=True)
+
+# ==================== 载入已导出的预测结果 ====================
+with st.expander("📂 载入已导出的预测结果（Parquet / Arrow）进行对比", expanded=False):
+    uploaded_predictions = st.file_uploader(
+        "选择本页导出的预测结果或批量评分输出（可多选）",
+        type=['parquet', 'arrow', 'feather'],
+        accept_multiple_files=True
+    )
+    single_results = {}
+    for up in uploaded_predictions or []:
+        try:
+            df_loaded, meta_loaded = results_io.read_table(up.getvalue())
+        except (ValueError, OSError) as e:
+            st.markdown(f'<div class="warning-box">❌ {up.name} 无法载入: {e}</div>', unsafe_allow_html=True)
+            continue
+        kind = meta_loaded.get('kind')
+        if kind == 'batch_scores':
+            # 批量评分结果：直接汇总已保存的预测列
+            st.markdown(f"**📦 {up.name}**（{len(df_loaded):,} 行，来源: {meta_loaded.get('source', '')}）")
+            stats = df_loaded[predictor.TARGETS].describe().T[['mean', 'std', 'min', 'max']]
+            stats.index = [f"{targets_info[t]['name']} ({targets_info[t]['unit']})" for t in stats.index]
+            st.dataframe(stats.rename(columns={'mean': '均值', 'std': '标准差', 'min': '最小值', 'max': '最大值'}),
+                         use_container_width=True)
+        elif kind == 'prediction':
+            missing = [c for c in predictor.FEATURES + predictor.TARGETS if c not in df_loaded.columns]
+            if missing:
+                st.markdown(f'<div class="warning-box">❌ {up.name} 缺少列 {missing}，无法参与对比</div>',
+                            unsafe_allow_html=True)
+                continue
+            for i, row in df_loaded.iterrows():
+                label = up.name if len(df_loaded) == 1 else f"{up.name} #{i + 1}"
+                single_results[label] = row
+        else:
+            # 其他页面导出的文件（如 Pareto 解集）：不参与对比，只汇总其中的数值列
+            st.markdown(f'<div class="warning-box">⚠️ {up.name} 不是本页导出的预测结果（类型: {kind or "未知"}），'
+                        '不参与对比，以下仅汇总文件中的数值列</div>', unsafe_allow_html=True)
+            numeric = df_loaded.select_dtypes('number')
+            if len(numeric.columns):
+                stats = numeric.describe().T[['mean', 'std', 'min', 'max']]
+                st.dataframe(stats.rename(columns={'mean': '均值', 'std': '标准差', 'min': '最小值', 'max': '最大值'}),
+                             use_container_width=True)
+    if single_results:
+        rows = predictor.FEATURES + predictor.TARGETS
+        compare_df = pd.DataFrame(
+            {label: [row[c] for c in rows] for label, row in single_results.items()},
+            index=[f"{features_info[c]['name']} ({features_info[c]['unit']})" if c in features_info
+                   else f"{targets_info[c]['name']} ({targets_info[c]['unit']})" for c in rows]
+        )
+        st.markdown("**🔍 预测结果对比（取自文件，未重新计算）**")
+        st.dataframe(compare_df, use_container_width=True)
+
 # ==================== 页脚 ====================
 st.markdown("---")
 st.markdown("""
@@ -1,22 +1,30 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
-from pymoo.algorithms.moo.nsga2 import NSGA2
-from pymoo.core.problem import Problem
-from pymoo.optimize import minimize
-from pymoo.operators.crossover.sbx import SBX
-from pymoo.operators.mutation.pm import PM
-from pymoo.operators.sampling.rnd import FloatRandomSampling
-from pymcdm.methods import TOPSIS
-from pymcdm import weights
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
+import sys
+import time
 # 获取当前文件所在目录
 current_dir = os.path.dirname(os.path.abspath(__file__))
 model_path = os.path.join(current_dir, 'energy_quality_models.pkl')
+# 共享模块位于上级目录（单独运行本页面时也能导入）
+if os.path.dirname(current_dir) not in sys.path:
+    sys.path.insert(0, os.path.dirname(current_dir))
+import convergence
+import decision
+import explain
+import ingest
+import model_store
+import optimization
+import plotting
+import predictor
+import replay
+import results_io
+import session_store
+import surrogate
 # ==================== 中文字体配置 ====================
 plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial Unicode MS', 'Microsoft YaHei']
 plt.rcParams['axes.unicode_minus'] = False
@@ -133,6 +141,11 @@ with st.expander("📘 系统说明与参数解释", expanded=False):
         **🎯 优化目标**
         - 🔋 最小化总能耗
         - 💧 最小化出水水质指数
+        - 🧪 可选：SNH、总氮、COD等任意模型输出（NSGA-III）
+        
+        **🚰 约束条件**
+        - 出水SNH、总氮、COD等不超过排放限值
+        - 可选：进水扰动情景下按期望值/CVaR鲁棒优化
         
         **🎛️ 优化变量**
         - R2_NO2: 缺氧区硝态氮 (0.5-10.0 mg/L)
@@ -168,21 +181,27 @@ with col1:
 with col2:
     load_btn = st.button("🔄 加载模型", use_container_width=True)
 
-if load_btn or 'models' not in st.session_state:
-    try:
-        models = joblib.load(model_path,'./energy_quality_models.pkl')
-        st.session_state.models = models
-        st.markdown('<div class="success-box">✅ 模型加载成功！包含模型: ' + 
-                   ', '.join(list(models.keys())) + '</div>', unsafe_allow_html=True)
-    except Exception as e:
-        st.markdown(f'<div class="warning-box">❌ 模型加载失败: {e}</div>', unsafe_allow_html=True)
-        st.stop()
-
-if 'models' not in st.session_state:
-    st.markdown('<div class="info-box">ℹ️ 请先加载模型文件</div>', unsafe_allow_html=True)
+# 共享模型仓库在后台监视模型文件，新版本预热后原子替换；本次运行自始至终使用同一个快照，
+# 运行中的优化不受替换影响，结果记录产生它的模型版本
+store = model_store.get_store(model_path)
+if load_btn:
+    store.check()
+try:
+    loaded = store.current()
+except Exception as e:
+    st.markdown(f'<div class="warning-box">❌ 模型加载失败: {e}</div>', unsafe_allow_html=True)
     st.stop()
 
-models = st.session_state.models
+models = loaded.models
+st.markdown(f'<div class="success-box">✅ 模型已加载（版本 {loaded.tag}，{loaded.loaded_at:%Y-%m-%d %H:%M:%S} 载入）'
+            '包含模型: ' + ', '.join(list(models.keys())) + '</div>', unsafe_allow_html=True)
+store_status = store.status()
+if store_status['last_error']:
+    st.markdown(f'<div class="warning-box">⚠️ 新模型文件加载失败，继续使用版本 {loaded.tag}: '
+                f'{store_status["last_error"]}</div>', unsafe_allow_html=True)
+
+# 本会话的运行结果（逐代历史以 float32 紧凑存储，超出内存预算或长时间未访问的旧结果会被清理）
+results = session_store.get_session_store(st.session_state)
 
 st.markdown("---")
 
@@ -230,15 +249,82 @@ with col_left:
         r2_max = st.number_input("R2_NO2 最大值 (mg/L)", value=10.0, min_value=0.0, max_value=10.0)
         r5_max = st.number_input("R5_DO 最大值 (mg/L)", value=4.0, min_value=0.0, max_value=10.0)
     
-    st.subheader("🧬 NSGA-II 算法参数")
+    st.subheader("🎯 优化目标")
+    # 载入导出的解集时同步其优化目标（需在控件创建前写入）
+    if 'pending_objectives' in st.session_state:
+        st.session_state.objectives = st.session_state.pop('pending_objectives')
+    elif 'objectives' not in st.session_state:
+        st.session_state.objectives = list(optimization.DEFAULT_OBJECTIVES)
+    objectives = st.multiselect(
+        "选择需要同时最小化的模型输出（至少2个）:",
+        predictor.TARGETS,
+        format_func=lambda t: f"{predictor.TARGET_NAMES[t]} ({t})",
+        help="默认权衡总能耗与水质指数；也可直接按排放许可中的SNH、总氮、COD等单项指标优化",
+        key="objectives"
+    )
+    # 保持与模型输出一致的顺序
+    objectives = [t for t in predictor.TARGETS if t in objectives]
+    
+    st.subheader("🧬 进化算法参数")
+    algorithm_name = st.selectbox(
+        "优化算法",
+        list(optimization.ALGORITHMS.keys()),
+        index=0 if len(objectives) <= 2 else 1,
+        format_func=lambda k: optimization.ALGORITHMS[k],
+        help="3个及以上目标时推荐使用NSGA-III，按参考方向保持解集在高维目标空间中的分布"
+    )
     col2_1, col2_2 = st.columns(2)
     with col2_1:
-        pop_size = st.number_input("种群大小", value=50, step=10, min_value=10, max_value=200)
+        pop_size = st.number_input("种群大小", value=50, step=10, min_value=10, max_value=1000)
     with col2_2:
         n_gen = st.number_input("迭代代数", value=100, step=10, min_value=10, max_value=500)
+    col3_1, col3_2 = st.columns(2)
+    with col3_1:
+        n_islands = st.number_input(
+            "岛屿数（并行进程）", value=1, step=1, min_value=1, max_value=max(1, os.cpu_count() or 1),
+            help="大于1时启用岛屿模型：每个岛屿是一个独立进程中的种群，种群大小为上面的设置"
+        )
+    with col3_2:
+        migration_interval = st.number_input(
+            "迁移间隔（代）", value=10, step=5, min_value=1, max_value=100,
+            disabled=n_islands <= 1,
+            help="每隔多少代把各岛屿的精英个体迁移到相邻岛屿"
+        )
+    use_surrogate = st.checkbox(
+        "⚡ 代理模型加速",
+        value=False,
+        help="先在决策变量网格上批量评估并拟合廉价代理模型，进化算法在代理模型上运行，"
+             "再用真实模型复核前沿并精修少量代数。鲁棒模式下加速最明显；启用时不使用岛屿模型"
+    )
+    if use_surrogate:
+        col4_1, col4_2, col4_3 = st.columns(3)
+        with col4_1:
+            surrogate_kind = st.selectbox(
+                "代理模型", list(surrogate.SURROGATE_KINDS.keys()),
+                format_func=lambda k: surrogate.SURROGATE_KINDS[k]
+            )
+        with col4_2:
+            surrogate_samples = st.number_input(
+                "拟合采样点数", value=1600, step=100, min_value=100, max_value=10000,
+                help="按规则网格取样，实际点数取不小于该值的平方数"
+            )
+        with col4_3:
+            refine_gen = st.number_input(
+                "真实模型精修代数", value=max(5, int(n_gen) // 5), step=5, min_value=0, max_value=int(n_gen),
+                help="以代理前沿为初始种群、用真实模型继续进化的代数；0 表示只复核不精修"
+            )
 
 with col_right:
-    st.subheader("⚖️ TOPSIS权重配置")
+    st.subheader("⚖️ 决策方法与权重配置")
+    
+    # 决策方法选择
+    decision_method = st.selectbox(
+        "决策方法:",
+        list(decision.METHODS.keys()),
+        format_func=lambda k: decision.METHODS[k]['name'],
+        help="TOPSIS/VIKOR/加权和按权重排序；膝点法选取Pareto前沿拐点，与权重无关"
+    )
+    score_name = decision.METHODS[decision_method]['score_name']
     
     # 权重模式选择
     weight_mode = st.radio(
@@ -250,43 +336,59 @@ with col_right:
     if weight_mode == "✋ 手动模式（自定义）":
         st.markdown("**手动设置目标权重（权重和 = 1.0）:**")
         
-        # 预设方案
-        preset = st.selectbox(
-            "快速选择预设方案:",
-            ["自定义", "节能优先 (0.7, 0.3)", "水质优先 (0.3, 0.7)", "均衡模式 (0.5, 0.5)"]
-        )
-        
-        if preset == "节能优先 (0.7, 0.3)":
-            default_w1, default_w2 = 0.7, 0.3
-        elif preset == "水质优先 (0.3, 0.7)":
-            default_w1, default_w2 = 0.3, 0.7
-        elif preset == "均衡模式 (0.5, 0.5)":
-            default_w1, default_w2 = 0.5, 0.5
-        else:
-            default_w1, default_w2 = 0.5, 0.5
-        
-        col_w1, col_w2 = st.columns(2)
-        with col_w1:
-            w_energy = st.number_input(
-                "🔋 能耗权重", 
-                min_value=0.0, 
-                max_value=1.0, 
-                value=default_w1, 
-                step=0.05,
-                help="能耗目标的重要性，范围0-1"
-            )
-        with col_w2:
-            w_quality = st.number_input(
-                "💧 水质权重", 
-                min_value=0.0, 
-                max_value=1.0, 
-                value=default_w2, 
-                step=0.05,
-                help="水质目标的重要性，范围0-1"
+        if objectives == optimization.DEFAULT_OBJECTIVES:
+            # 预设方案
+            preset = st.selectbox(
+                "快速选择预设方案:",
+                ["自定义", "节能优先 (0.7, 0.3)", "水质优先 (0.3, 0.7)", "均衡模式 (0.5, 0.5)"]
             )
+            
+            if preset == "节能优先 (0.7, 0.3)":
+                default_w1, default_w2 = 0.7, 0.3
+            elif preset == "水质优先 (0.3, 0.7)":
+                default_w1, default_w2 = 0.3, 0.7
+            elif preset == "均衡模式 (0.5, 0.5)":
+                default_w1, default_w2 = 0.5, 0.5
+            else:
+                default_w1, default_w2 = 0.5, 0.5
+            
+            col_w1, col_w2 = st.columns(2)
+            with col_w1:
+                w_energy = st.number_input(
+                    "🔋 能耗权重", 
+                    min_value=0.0, 
+                    max_value=1.0, 
+                    value=default_w1, 
+                    step=0.05,
+                    help="能耗目标的重要性，范围0-1"
+                )
+            with col_w2:
+                w_quality = st.number_input(
+                    "💧 水质权重", 
+                    min_value=0.0, 
+                    max_value=1.0, 
+                    value=default_w2, 
+                    step=0.05,
+                    help="水质目标的重要性，范围0-1"
+                )
+            input_weights = [w_energy, w_quality]
+        else:
+            # 多目标模式：每个所选目标一个权重，默认均分
+            weight_cols = st.columns(max(1, min(len(objectives), 4)))
+            input_weights = []
+            for i, t in enumerate(objectives):
+                with weight_cols[i % len(weight_cols)]:
+                    input_weights.append(st.number_input(
+                        f"{predictor.TARGET_NAMES[t]}权重",
+                        min_value=0.0,
+                        max_value=1.0,
+                        value=1.0 / len(objectives),
+                        step=0.05,
+                        key=f"weight_{t}"
+                    ))
         
         # 权重和验证
-        weight_sum = w_energy + w_quality
+        weight_sum = sum(input_weights)
         if abs(weight_sum - 1.0) > 0.001:
             st.markdown(f"""
             <div class="warning-box">
@@ -296,15 +398,18 @@ with col_right:
             """, unsafe_allow_html=True)
             manual_weights = None
         else:
+            weight_lines = "".join(
+                f"• {predictor.TARGET_NAMES[t]}权重: {wt:.2f} ({wt*100:.0f}%)<br>"
+                for t, wt in zip(objectives, input_weights)
+            )
             st.markdown(f"""
             <div class="weight-box">
             ✅ <strong>权重配置正确</strong><br>
-            • 能耗权重: {w_energy:.2f} ({w_energy*100:.0f}%)<br>
-            • 水质权重: {w_quality:.2f} ({w_quality*100:.0f}%)<br>
+            {weight_lines}
             权重和 = {weight_sum:.3f}
             </div>
             """, unsafe_allow_html=True)
-            manual_weights = np.array([w_energy, w_quality])
+            manual_weights = np.array(input_weights)
     else:
         st.markdown("""
         <div class="info-box">
@@ -325,41 +430,106 @@ with col_right:
     </div>
     """, unsafe_allow_html=True)
 
-st.markdown("---")
+# ==================== 排放限值约束 ====================
+st.subheader("🚰 出水排放限值约束")
+use_limits = st.checkbox(
+    "启用排放限值约束（预测出水超标的设定值在进化过程中被淘汰）",
+    value=True,
+    help="限值作为不等式约束与目标在同一次批量预测中计算，采用约束支配排序，可行解总是优于超标解"
+)
+limits = {}
+if use_limits:
+    col_std, col_targets = st.columns([1, 2])
+    with col_std:
+        standard = st.selectbox(
+            "排放标准 (GB 18918-2002)",
+            list(optimization.DISCHARGE_STANDARDS.keys()) + ["自定义"],
+            index=1
+        )
+    with col_targets:
+        limit_targets = st.multiselect(
+            "受约束的出水指标",
+            predictor.OUTLET_TARGETS,
+            default=['SNH', 'TotalN', 'COD'],
+            format_func=lambda t: f"{predictor.TARGET_NAMES[t]} ({t})"
+        )
+    base_limits = optimization.DISCHARGE_STANDARDS.get(standard, optimization.DISCHARGE_STANDARDS['一级B'])
+    if limit_targets:
+        limit_cols = st.columns(len(limit_targets))
+        for col, t in zip(limit_cols, limit_targets):
+            with col:
+                limits[t] = st.number_input(
+                    f"{t} 上限 (mg/L)",
+                    min_value=0.0,
+                    value=float(base_limits[t]),
+                    step=0.5,
+                    disabled=standard != "自定义",
+                    key=f"limit_{t}_{standard}"
+                )
 
-# ==================== 定义优化问题类 ====================
-class WastewaterOptimization(Problem):
-    def __init__(self, inlet_data, models, r2_range, r5_range):
-        self.inlet_data = inlet_data
-        self.models = models
-        super().__init__(
-            n_var=2, n_obj=2, n_ieq_constr=0,
-            xl=np.array([r2_range[0], r5_range[0]]),
-            xu=np.array([r2_range[1], r5_range[1]])
+# ==================== 进水不确定性（鲁棒优化） ====================
+st.subheader("🎲 进水不确定性（鲁棒优化）")
+use_robust = st.checkbox(
+    "启用鲁棒优化（在进水扰动情景上评估每个设定值）",
+    value=False,
+    help="进水在线仪表存在测量误差。启用后每个候选设定值在M个进水扰动情景上批量预测，"
+         "目标和排放约束按所选风险度量聚合，推荐的设定值对进水波动不敏感"
+)
+uncertainty = None
+if use_robust:
+    col_u1, col_u2, col_u3, col_u4 = st.columns(4)
+    with col_u1:
+        rel_std_pct = st.number_input("进水相对标准差 (%)", value=10.0, min_value=0.5, max_value=50.0, step=1.0)
+    with col_u2:
+        n_scenarios = st.number_input(
+            "情景数 M", value=200, min_value=10, max_value=1000, step=10,
+            help="每代评估行数 = 种群大小 × M，一次批量预测完成"
+        )
+    with col_u3:
+        risk = st.selectbox(
+            "风险度量",
+            list(optimization.RISK_MEASURES.keys()),
+            index=1,
+            format_func=lambda k: optimization.RISK_MEASURES[k]
         )
+    with col_u4:
+        alpha = st.slider(
+            "CVaR 置信水平 α", min_value=0.5, max_value=0.99, value=0.9, step=0.01,
+            disabled=risk != 'cvar',
+            help="取最差 (1-α) 比例情景的平均值"
+        )
+    uncertainty = dict(rel_std=rel_std_pct / 100.0, n_samples=int(n_scenarios), risk=risk, alpha=alpha, seed=0)
+    st.markdown(f"""
+    <div class="info-box">
+    🎲 所有候选设定值共用同一组 {int(n_scenarios)} 个进水情景（公共随机数），比较只反映设定值本身的差异；
+    每代批量预测 {int(pop_size) * int(n_scenarios):,} 行。
+    </div>
+    """, unsafe_allow_html=True)
 
-    def _evaluate(self, x, out, *args, **kwargs):
-        objs = []
-        for i in range(x.shape[0]):
-            features = self.inlet_data.copy()
-            features['R2_NO2'] = float(x[i, 0])
-            features['R5_DO'] = float(x[i, 1])
-            df = pd.DataFrame([features])
-            energy = float(self.models['total_energy'].predict(df)[0])
-            eq = float(self.models['EQ_contrib'].predict(df)[0])
-            objs.append([energy, eq])
-        out["F"] = np.array(objs)
+st.markdown("---")
 
 # ==================== 运行优化 ====================
 st.header("4️⃣ 开始优化")
 
 # 检查手动模式下权重是否有效
 can_optimize = True
-if weight_mode == "✋ 手动模式（自定义）" and manual_weights is None:
+if len(objectives) < 2:
+    can_optimize = False
+    st.warning("⚠️ 请至少选择2个优化目标")
+elif weight_mode == "✋ 手动模式（自定义）" and manual_weights is None:
     can_optimize = False
     st.warning("⚠️ 请先正确设置权重（权重和必须等于1.0）")
 
-if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, disabled=not can_optimize):
+problem_kwargs = dict(
+    inlet_data=inlet_data,
+    r2_range=(r2_min, r2_max),
+    r5_range=(r5_min, r5_max),
+    objectives=objectives,
+    limits=limits,
+    uncertainty=uncertainty
+)
+
+if st.button("🚀 运行多目标优化", use_container_width=True, disabled=not can_optimize):
     
     # 进度条
     progress_bar = st.progress(0)
@@ -369,63 +539,289 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
         status_text.text("⚙️ 初始化优化问题...")
         progress_bar.progress(10)
         
-        problem = WastewaterOptimization(inlet_data, models, (r2_min, r2_max), (r5_min, r5_max))
-        
-        status_text.text(f"🧬 配置NSGA-II算法 (种群={pop_size}, 代数={n_gen})...")
+        status_text.text(f"🧬 配置{optimization.ALGORITHMS[algorithm_name]}算法 (种群={pop_size}, 代数={n_gen}, 目标数={len(objectives)})...")
         progress_bar.progress(20)
         
-        algorithm = NSGA2(
-            pop_size=int(pop_size),
-            sampling=FloatRandomSampling(),
-            crossover=SBX(prob=0.9, eta=15),
-            mutation=PM(eta=20)
-        )
+        if use_surrogate:
+            status_text.text(f"⚡ 拟合{surrogate.SURROGATE_KINDS[surrogate_kind]}代理模型并在其上优化...")
+            progress_bar.progress(30)
+            run = surrogate.run_surrogate(
+                models, problem_kwargs, algorithm_name, pop_size, n_gen,
+                kind=surrogate_kind, n_samples=surrogate_samples, refine_gen=refine_gen
+            )
+        elif n_islands > 1:
+            status_text.text(f"🏝️ 岛屿模型并行优化 ({n_islands} 个岛屿, 每 {migration_interval} 代迁移)...")
+            progress_bar.progress(30)
+            run = optimization.run_islands(
+                models, problem_kwargs, algorithm_name, pop_size, n_gen, n_islands,
+                migration_interval=migration_interval,
+                progress=lambda p: progress_bar.progress(30 + int(50 * p))
+            )
+        else:
+            status_text.text("🚀 执行多目标优化...")
+            progress_bar.progress(30)
+            run = optimization.run_single(models, problem_kwargs, algorithm_name, pop_size, n_gen,
+                                          record_history=True)
+        progress_bar.progress(80)
         
-        status_text.text("🚀 执行多目标优化...")
-        progress_bar.progress(30)
+        if run['X'] is not None:
+            # 整个Pareto解集的7项指标一次批量预测，之后浏览、排序、下载都不再调用模型
+            status_text.text("🔮 批量预测Pareto解集的出水指标...")
+            front_pred = predictor.predict_batch(models, predictor.build_features(inlet_data, run['X']))
+            front_robust = None
+            if uncertainty:
+                status_text.text("🎲 在进水情景上评估Pareto解集...")
+                scenarios = optimization.sample_inlet_scenarios(
+                    inlet_data, uncertainty['rel_std'], uncertainty['n_samples'], uncertainty['seed']
+                )
+                front_robust = optimization.predict_robust(
+                    models, scenarios, run['X'], predictor.TARGETS, uncertainty['risk'], uncertainty['alpha']
+                )
+            progress_bar.progress(90)
+
+    if run['X'] is None:
+        # 所有评估都超标，pymoo 不返回解集
+        st.session_state.pop('current_run', None)
+        progress_bar.progress(100)
+        status_text.text("❌ 未找到满足排放限值的设定值")
+        st.markdown(f"""
+        <div class="warning-box">
+        ❌ <strong>在当前决策变量范围内没有满足排放限值的设定值</strong><br>
+        最小超标量: {run['min_cv']:.2f} mg/L，共评估 {run['n_evaluated']} 次全部超标。<br>
+        请放宽排放限值、扩大 R2_NO2 / R5_DO 范围或检查进水参数。
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        # 保存Pareto解集，之后调整权重、浏览图表都直接复用，无需重新优化
+        # 键中带本会话的运行序号，同一秒内完成的两次运行不会互相覆盖
+        st.session_state.run_seq = st.session_state.get('run_seq', 0) + 1
+        run_key = (f"opt-#{st.session_state.run_seq} {time.strftime('%H:%M:%S')} "
+                   f"{optimization.ALGORITHMS[algorithm_name]} · {len(run['X'])} 个解")
+        results.put(run_key, {
+            'x': run['X'],  # 决策变量
+            'f': run['F'],  # 目标值
+            'y': front_pred,  # 全部7项预测指标，列顺序同 predictor.TARGETS
+            'hash': plotting.result_hash(run['X'], run['F'], front_pred),  # 结果内容哈希，作为图表缓存键
+            'y_robust': front_robust,  # 鲁棒模式下情景聚合后的7项指标
+            'surrogate': run.get('surrogate'),  # 代理模型加速时的精度与耗时报告
+            'history': run.get('history'),  # 单种群运行的逐代种群与超体积记录
+            'uncertainty': uncertainty,
+            # 运行参数，随列式导出写入文件元数据
+            'run_meta': {
+                'algorithm': algorithm_name,
+                'pop_size': int(pop_size),
+                'n_gen': int(n_gen),
+                'n_islands': 1 if use_surrogate else int(n_islands),
+                'surrogate': surrogate_kind if use_surrogate else None,
+                'model_version': loaded.tag,
+                'r2_range': [r2_min, r2_max],
+                'r5_range': [r5_min, r5_max],
+                'elapsed': run['elapsed']
+            },
+            'objectives': list(objectives),
+            'limits': dict(limits),
+            'n_evaluated': run['n_evaluated'],
+            'n_infeasible': run['n_infeasible'],
+            'n_cache_hits': run.get('n_cache_hits', 0),
+            'inlet_data': inlet_data.copy(),
+            'model_version': loaded.tag
+        })
+        st.session_state.current_run = run_key
         
-        res = minimize(problem, algorithm, ('n_gen', int(n_gen)), verbose=False)
-        progress_bar.progress(70)
+        progress_bar.progress(100)
+        status_text.text(f"✅ 优化完成！耗时 {run['elapsed']:.1f} 秒")
+        if run.get('n_cache_hits'):
+            st.caption(f"♻️ 评估缓存命中 {run['n_cache_hits']:,} / {run['n_evaluated']:,} 次"
+                       f"（{run['n_cache_hits'] / run['n_evaluated'] * 100:.1f}%）：落在已评估过的分裂阈值格子里的设定值"
+                       "直接复用预测，结果与逐个预测相同")
+        
+        st.balloons()
 
-    f = res.F  # 目标值
-    x = res.X  # 决策变量
-    
-    status_text.text("🎯 应用TOPSIS决策...")
-    progress_bar.progress(80)
+# ==================== 岛屿模型基准对比 ====================
+if n_islands > 1:
+    with st.expander("🏝️ 岛屿模型 vs 单种群 基准对比", expanded=False):
+        st.markdown(f"""
+        在相同评估预算下对比：单种群大小 = {n_islands} × {pop_size} = {n_islands * pop_size}，
+        岛屿模型 {n_islands} 个岛屿 × {pop_size}，两者均运行 {n_gen} 代。
+        质量以两者前沿在同一归一化尺度下的超体积衡量。
+        """)
+        if st.button("⏱️ 运行基准对比", disabled=not can_optimize):
+            with st.spinner("🔄 正在依次运行单种群与岛屿模型..."):
+                bench = optimization.benchmark_islands(
+                    models, problem_kwargs, algorithm_name, pop_size, n_gen, n_islands,
+                    migration_interval=migration_interval
+                )
+            bench_df = pd.DataFrame({
+                '方案': [f'单种群 (种群 {n_islands * pop_size})', f'岛屿模型 ({n_islands} × {pop_size})'],
+                '耗时 (秒)': [bench['single']['elapsed'], bench['islands']['elapsed']],
+                '评估次数': [bench['single']['n_evaluated'], bench['islands']['n_evaluated']],
+                '非支配解数量': [0 if r['X'] is None else len(r['X']) for r in (bench['single'], bench['islands'])],
+                '超体积': [bench['single']['hv'], bench['islands']['hv']]
+            })
+            st.dataframe(bench_df, use_container_width=True, hide_index=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("加速比", f"{bench['speedup']:.2f}×")
+            with col2:
+                st.metric("超体积比 (岛屿/单种群)", f"{bench['hv_ratio']:.3f}")
+
+# ==================== 代理模型加速基准对比 ====================
+if use_surrogate:
+    with st.expander("⚡ 代理模型加速 vs 直接优化 基准对比", expanded=False):
+        st.markdown(f"""
+        相同种群 ({pop_size}) 与代数 ({n_gen}) 下对比直接用真实模型优化与代理模型加速（含复核与
+        {refine_gen} 代精修）的耗时，质量以两者前沿在同一归一化尺度下的超体积衡量。
+        """)
+        if st.button("⏱️ 运行代理模型基准对比", disabled=not can_optimize):
+            with st.spinner("🔄 正在依次运行直接优化与代理模型加速..."):
+                bench = surrogate.benchmark_surrogate(
+                    models, problem_kwargs, algorithm_name, pop_size, n_gen,
+                    kind=surrogate_kind, n_samples=surrogate_samples, refine_gen=refine_gen
+                )
+            bench_df = pd.DataFrame({
+                '方案': ['直接优化', f'代理模型加速 ({surrogate.SURROGATE_KINDS[surrogate_kind]})'],
+                '耗时 (秒)': [bench['direct']['elapsed'], bench['surrogate']['elapsed']],
+                '真实模型评估次数': [bench['direct']['n_evaluated'], bench['surrogate']['n_evaluated']],
+                '非支配解数量': [0 if r['X'] is None else len(r['X']) for r in (bench['direct'], bench['surrogate'])],
+                '超体积': [bench['direct']['hv'], bench['surrogate']['hv']]
+            })
+            st.dataframe(bench_df, use_container_width=True, hide_index=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("加速比", f"{bench['speedup']:.2f}×")
+            with col2:
+                st.metric("超体积比 (代理/直接)", f"{bench['hv_ratio']:.3f}")
 
-    # ==================== TOPSIS决策 ====================
-    types = np.array([-1, -1])  # 两个目标都是越小越好
+# ==================== 载入已导出的解集 ====================
+with st.expander("📂 载入已导出的Pareto解集（Parquet / Arrow）进行对比", expanded=False):
+    uploaded_fronts = st.file_uploader(
+        "选择由本页导出的 .parquet / .arrow 文件（可多选）",
+        type=['parquet', 'arrow', 'feather'],
+        accept_multiple_files=True,
+        key="front_uploads"
+    )
+    loaded_fronts = {}
+    for up in uploaded_fronts or []:
+        try:
+            df_loaded, meta_loaded = results_io.read_table(up.getvalue())
+            loaded_fronts[up.name] = (df_loaded, meta_loaded, results_io.front_from_frame(df_loaded, meta_loaded))
+        except (ValueError, KeyError, OSError) as e:
+            st.markdown(f'<div class="warning-box">❌ {up.name} 无法载入: {e}</div>', unsafe_allow_html=True)
+
+    if loaded_fronts:
+        summary_rows = []
+        for name, (df_loaded, meta_loaded, front_loaded) in loaded_fronts.items():
+            best_row = df_loaded.sort_values('rank').iloc[0] if 'rank' in df_loaded.columns else df_loaded.iloc[0]
+            summary_rows.append({
+                '文件': name,
+                '导出时间': meta_loaded.get('created_at', ''),
+                '优化目标': ", ".join(predictor.TARGET_NAMES[t] for t in front_loaded['objectives']),
+                '决策方法': meta_loaded.get('decision_method', ''),
+                '解数量': len(df_loaded),
+                '最优 R2_NO2': best_row['R2_NO2'],
+                '最优 R5_DO': best_row['R5_DO'],
+                '最优总能耗 (kWh)': best_row['total_energy'],
+                '最优水质指数': best_row['EQ_contrib'],
+            })
+        st.dataframe(pd.DataFrame(summary_rows), use_container_width=True, hide_index=True)
+        st.caption("已载入的解集会叠加显示在下方的Pareto前沿图中（需包含当前坐标轴对应的目标）")
+
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            restore_name = st.selectbox("设为当前结果的文件", list(loaded_fronts.keys()))
+        with col2:
+            st.markdown("<br>", unsafe_allow_html=True)
+            restore_btn = st.button("📌 设为当前结果", use_container_width=True)
+        if restore_btn:
+            df_loaded, meta_loaded, front_loaded = loaded_fronts[restore_name]
+            st.session_state.run_seq = st.session_state.get('run_seq', 0) + 1
+            run_key = f"opt-#{st.session_state.run_seq} {time.strftime('%H:%M:%S')} 载入 {restore_name}"
+            results.put(run_key, {
+                **front_loaded,
+                'hash': plotting.result_hash(front_loaded['x'], front_loaded['f'], front_loaded['y']),
+                'limits': meta_loaded.get('limits') or {},
+                'n_evaluated': meta_loaded.get('n_evaluated', 0),
+                'n_infeasible': meta_loaded.get('n_infeasible', 0),
+                'inlet_data': meta_loaded.get('inlet_data') or inlet_data.copy(),
+                'uncertainty': meta_loaded.get('uncertainty'),
+                'run_meta': meta_loaded.get('run') or {},
+                'model_version': (meta_loaded.get('run') or {}).get('model_version'),
+            })
+            st.session_state.current_run = run_key
+            st.session_state.pending_objectives = front_loaded['objectives']
+            st.rerun()
+
+# ==================== 本会话保存的运行结果 ====================
+run_keys = results.keys('opt-')[::-1]
+if len(run_keys) > 1:
+    current_run = st.session_state.get('current_run')
+    chosen_run = st.selectbox(
+        "🗂️ 本会话保存的运行结果（较早的结果会按内存预算和保存期限自动清理）",
+        run_keys,
+        index=run_keys.index(current_run) if current_run in run_keys else 0,
+        format_func=lambda k: k[len('opt-'):]
+    )
+    if chosen_run != current_run:
+        st.session_state.current_run = chosen_run
+        st.session_state.pending_objectives = results.get(chosen_run)['objectives']
+        st.rerun()
+
+opt_result = results.get(st.session_state.get('current_run'))
+if opt_result is None and 'current_run' in st.session_state:
+    st.session_state.pop('current_run')
+    st.info("ℹ️ 上次的优化结果已超过保存期限或因会话内存预算被清理，请重新运行优化")
+results_ready = opt_result is not None and can_optimize
+if results_ready and opt_result['objectives'] != objectives:
+    st.info("ℹ️ 优化目标已修改，请重新运行优化以查看新目标下的结果")
+    results_ready = False
+
+if results_ready:
+    result_version = opt_result.get('model_version')
+    if result_version and result_version != loaded.tag:
+        st.markdown(f'<div class="warning-box">⚠️ 当前结果由模型版本 {result_version} 计算，模型已更新为 {loaded.tag}，'
+                    '预测解释等重新计算的内容使用新版本；如需一致的结果请重新运行优化</div>', unsafe_allow_html=True)
+    f = opt_result['f']
+    x = opt_result['x']
+    y = opt_result['y']
+    inlet_data = opt_result['inlet_data']
+    # 结果内容哈希（保存结果时算好），作为图表缓存键；存储中的结果只读，不在这里补写
+    result_key = opt_result.get('hash') or plotting.result_hash(x, f, y)
+    obj_names = [predictor.TARGET_NAMES[t] for t in objectives]
+    obj_labels = [f"{predictor.TARGET_NAMES[t]} ({predictor.TARGET_UNITS[t]})" for t in objectives]
+
+    # ==================== 多准则决策 ====================
+    types = -np.ones(len(objectives))  # 所有目标都是越小越好
     
     # 根据模式选择权重
     if weight_mode == "🤖 自动模式（熵权法）":
-        w = weights.entropy_weights(f)
+        # 只有一个解时熵权无定义，各目标等权
+        w = decision.entropy_weights(f) if len(f) > 1 else np.full(len(objectives), 1.0 / len(objectives))
         weight_method = "熵权法（自动）"
     else:
         w = manual_weights
-        weight_method = f"手动设置（能耗={w[0]:.2f}, 水质={w[1]:.2f}）"
+        weight_method = "手动设置（" + ", ".join(f"{n}={wt:.2f}" for n, wt in zip(obj_names, w)) + "）"
+    if not decision.METHODS[decision_method]['uses_weights']:
+        weight_method = f"{decision.METHODS[decision_method]['name']}（不使用权重）"
     
-    topsis = TOPSIS()
-    scores = topsis(f, w, types)
-    best_idx = np.argmax(scores)
+    # 某个目标在所有解上取值相同（单个解、限值卡住某一目标）时 VIKOR 无法计算，
+    # 加权和遇到非正目标值也会失败；此时改用 TOPSIS 排序，不影响下方其余结果
+    score_method = decision_method
+    try:
+        scores = decision.score(f, w, types, score_method)
+    except ValueError as e:
+        score_method = 'topsis'
+        scores = decision.score(f, w, types, score_method)
+        if len(f) > 1:
+            st.markdown(f'<div class="warning-box">⚠️ {decision.METHODS[decision_method]["name"]}无法用于当前解集（{e}），'
+                        f'已改用 {decision.METHODS[score_method]["name"]} 排序</div>', unsafe_allow_html=True)
+    score_name = decision.METHODS[score_method]['score_name']
+    best_idx = 0 if len(f) == 1 else int(decision.best_index(scores, score_method))
+    ranked_indices = decision.ranking(scores, score_method)
     best_x = x[best_idx]
     best_f = f[best_idx]
-    
-    progress_bar.progress(90)
 
-    # ==================== 预测最优解下的指标 ====================
-    best_features = inlet_data.copy()
-    best_features['R2_NO2'] = best_x[0]
-    best_features['R5_DO'] = best_x[1]
-    df_best = pd.DataFrame([best_features])
-
-    predictions = {}
-    for target in models.keys():
-        predictions[target] = float(models[target].predict(df_best)[0])
-    
-    progress_bar.progress(100)
-    status_text.text("✅ 优化完成！")
-    
-    st.balloons()
+    # ==================== 最优解下的指标（取自批量预测结果） ====================
+    predictions = dict(zip(predictor.TARGETS, y[best_idx].tolist()))
     
     st.markdown("---")
 
@@ -433,14 +829,88 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
     st.header("📊 优化结果")
     
     # 显示权重信息
+    weight_lines = "<br>".join(
+        f"• {n}权重: <strong>{wt:.4f}</strong> ({wt*100:.1f}%)" for n, wt in zip(obj_names, w)
+    )
     st.markdown(f"""
     <div class="weight-box">
     <strong>⚖️ 使用的权重方法: {weight_method}</strong><br>
-    • 能耗权重: <strong>{w[0]:.4f}</strong> ({w[0]*100:.1f}%)<br>
-    • 水质权重: <strong>{w[1]:.4f}</strong> ({w[1]*100:.1f}%)
+    {weight_lines}
     </div>
     """, unsafe_allow_html=True)
     
+    # 排放限值约束统计
+    if opt_result['limits']:
+        n_evaluated = opt_result['n_evaluated']
+        n_infeasible = opt_result['n_infeasible']
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("排放限值", ", ".join(f"{t}≤{v:g}" for t, v in opt_result['limits'].items()))
+        with col2:
+            st.metric("总评估次数", f"{n_evaluated}")
+        with col3:
+            st.metric("超标区域评估次数", f"{n_infeasible}")
+        with col4:
+            st.metric("超标评估占比", f"{n_infeasible / max(n_evaluated, 1) * 100:.1f}%")
+    
+    # 代理模型加速：验证精度、前沿复核与各阶段耗时
+    if opt_result.get('surrogate'):
+        sur_rep = opt_result['surrogate']
+        if sur_rep['fallback']:
+            st.markdown("""
+            <div class="warning-box">
+            ⚠️ <strong>代理模型上未找到可行解</strong>，已改用真实模型直接优化。
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            st.markdown(f"""
+            <div class="info-box">
+            ⚡ <strong>代理模型加速</strong>：{surrogate.SURROGATE_KINDS[sur_rep['kind']]}，{sur_rep['n_samples']} 个采样点；
+            代理前沿 {sur_rep['n_front']} 个解经真实模型复核，{sur_rep['n_rejected']} 个超标被剔除，
+            再以真实模型精修 {sur_rep['refine_gen']} 代。最终前沿全部来自真实模型评估。
+            </div>
+            """, unsafe_allow_html=True)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("拟合耗时", f"{sur_rep['fit_time']:.2f} 秒")
+        with col2:
+            st.metric("代理优化耗时", f"{sur_rep['surrogate_time']:.2f} 秒")
+        with col3:
+            st.metric("复核与精修耗时", f"{sur_rep['refine_time']:.2f} 秒")
+        with col4:
+            st.metric("代理模型评估次数", f"{sur_rep['n_surrogate_evaluated']}")
+        err_targets = list(sur_rep['validation'])
+        err_df = pd.DataFrame({
+            '指标': [f"{predictor.TARGET_NAMES[t]} ({t})" for t in err_targets],
+            '验证 R²': [sur_rep['validation'][t]['r2'] for t in err_targets],
+            '验证 MAPE (%)': [sur_rep['validation'][t]['mape'] for t in err_targets],
+            '验证最大误差': [sur_rep['validation'][t]['max_abs'] for t in err_targets],
+            '前沿 MAPE (%)': [sur_rep['front_error'].get(t, {}).get('mape', np.nan) for t in err_targets]
+        })
+        st.dataframe(err_df.round(4), use_container_width=True, hide_index=True)
+    
+    # 鲁棒模式：最优解在名义进水与扰动情景下的指标对比
+    if opt_result.get('uncertainty'):
+        unc = opt_result['uncertainty']
+        risk_label = optimization.RISK_MEASURES[unc['risk']]
+        if unc['risk'] == 'cvar':
+            risk_label += f" α={unc['alpha']:.2f}"
+        st.markdown(f"""
+        <div class="info-box">
+        🎲 <strong>鲁棒优化</strong>：进水相对标准差 {unc['rel_std']*100:.1f}%，{unc['n_samples']} 个情景，
+        目标与约束按 {risk_label} 聚合。下方对比最优解在名义进水与扰动情景下的指标。
+        </div>
+        """, unsafe_allow_html=True)
+        shown = objectives + [t for t in opt_result['limits'] if t not in objectives]
+        robust_best = dict(zip(predictor.TARGETS, opt_result['y_robust'][best_idx].tolist()))
+        robust_df = pd.DataFrame({
+            '指标': [f"{predictor.TARGET_NAMES[t]} ({predictor.TARGET_UNITS[t]})" for t in shown],
+            '名义进水预测': [predictions[t] for t in shown],
+            f'情景{risk_label}': [robust_best[t] for t in shown],
+            '排放限值': [opt_result['limits'].get(t, np.nan) for t in shown]
+        })
+        st.dataframe(robust_df.round(3), use_container_width=True, hide_index=True)
+    
     # 关键指标卡片
     col1, col2, col3, col4 = st.columns(4)
     
@@ -504,105 +974,155 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
     st.markdown("---")
     
     # ==================== 可视化标签页 ====================
-    tab1, tab2, tab3, tab4 = st.tabs(["📈 Pareto前沿", "🏆 Top 10 最优解", "📊 水质对比", "🎯 综合分析"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(
+        ["📈 Pareto前沿", "🏆 全部解排名", "📊 水质对比", "🎯 综合分析", "⚖️ 权重敏感性", "🔍 预测解释", "📉 收敛过程"]
+    )
     
     with tab1:
         st.subheader("Pareto前沿分布")
         
-        fig = go.Figure()
-        
-        # Pareto解集
-        fig.add_trace(go.Scatter(
-            x=f[:, 0],
-            y=f[:, 1],
-            mode='markers',
-            name='Pareto解集',
-            marker=dict(
-                size=8,
-                color=scores,
-                colorscale='Viridis',
-                showscale=True,
-                colorbar=dict(title="TOPSIS<br>分数"),
-                line=dict(width=1, color='white')
-            ),
-            text=[f'Score: {s:.4f}' for s in scores],
-            hovertemplate='<b>能耗:</b> %{x:.2f} kWh<br>' +
-                         '<b>水质指数:</b> %{y:.2f}<br>' +
-                         '%{text}<extra></extra>'
-        ))
-        
-        # 最优解
-        fig.add_trace(go.Scatter(
-            x=[best_f[0]],
-            y=[best_f[1]],
-            mode='markers',
-            name='TOPSIS最优解',
-            marker=dict(
-                size=20,
-                color='red',
-                symbol='star',
-                line=dict(width=2, color='darkred')
-            ),
-            hovertemplate='<b>最优解</b><br>' +
-                         '<b>能耗:</b> %{x:.2f} kWh<br>' +
-                         '<b>水质指数:</b> %{y:.2f}<br>' +
-                         f'<b>TOPSIS分数:</b> {scores[best_idx]:.4f}<extra></extra>'
-        ))
-        
-        fig.update_layout(
-            title=f'Pareto前沿分布图 (共 {len(f)} 个非支配解)',
-            xaxis_title='总能耗 (kWh) - 越小越好',
-            yaxis_title='出水水质指数 (点) - 越小越好',
-            hovermode='closest',
-            height=500,
-            showlegend=True,
-            template='plotly_white'
-        )
+        # 多于2个目标时选择投影到哪两个目标上
+        ix, iy = 0, 1
+        if len(objectives) > 2:
+            col1, col2 = st.columns(2)
+            with col1:
+                ix = st.selectbox("横轴目标", range(len(objectives)), index=0,
+                                  format_func=lambda i: obj_labels[i], key="pareto_x_obj")
+            with col2:
+                iy = st.selectbox("纵轴目标", range(len(objectives)), index=1,
+                                  format_func=lambda i: obj_labels[i], key="pareto_y_obj")
         
+        def build_pareto_figure():
+            fig = go.Figure()
+            
+            # Pareto解集（点数多时自动使用WebGL渲染）
+            fig.add_trace(plotting.scatter(
+                f[:, ix],
+                f[:, iy],
+                mode='markers',
+                name='Pareto解集',
+                marker=dict(
+                    size=8,
+                    color=scores,
+                    colorscale='Viridis',
+                    showscale=True,
+                    colorbar=dict(title=score_name),
+                    line=dict(width=1, color='white')
+                ),
+                customdata=scores,
+                hovertemplate=f'<b>{obj_names[ix]}:</b> %{{x:.2f}}<br>' +
+                             f'<b>{obj_names[iy]}:</b> %{{y:.2f}}<br>' +
+                             'Score: %{customdata:.4f}<extra></extra>'
+            ))
+            
+            # 最优解
+            fig.add_trace(go.Scatter(
+                x=[best_f[ix]],
+                y=[best_f[iy]],
+                mode='markers',
+                name='决策最优解',
+                marker=dict(
+                    size=20,
+                    color='red',
+                    symbol='star',
+                    line=dict(width=2, color='darkred')
+                ),
+                hovertemplate='<b>最优解</b><br>' +
+                             f'<b>{obj_names[ix]}:</b> %{{x:.2f}}<br>' +
+                             f'<b>{obj_names[iy]}:</b> %{{y:.2f}}<br>' +
+                             f'<b>{score_name}:</b> {scores[best_idx]:.4f}<extra></extra>'
+            ))
+            
+            # 叠加载入的解集
+            overlay_symbols = ['diamond-open', 'square-open', 'triangle-up-open', 'cross-open']
+            for k, (name, (_, _, front_loaded)) in enumerate(loaded_fronts.items()):
+                cols_loaded = front_loaded['objectives']
+                if objectives[ix] in cols_loaded and objectives[iy] in cols_loaded:
+                    fl = front_loaded['f']
+                    fig.add_trace(plotting.scatter(
+                        fl[:, cols_loaded.index(objectives[ix])],
+                        fl[:, cols_loaded.index(objectives[iy])],
+                        mode='markers',
+                        name=f'载入: {name}',
+                        marker=dict(size=9, symbol=overlay_symbols[k % len(overlay_symbols)], color='#555')
+                    ))
+            
+            fig.update_layout(
+                title=f'Pareto前沿分布图 (共 {len(f)} 个非支配解)',
+                xaxis_title=f'{obj_labels[ix]} - 越小越好',
+                yaxis_title=f'{obj_labels[iy]} - 越小越好',
+                hovermode='closest',
+                height=500,
+                showlegend=True,
+                template='plotly_white'
+            )
+            return fig
+        
+        # 同一结果、同一决策设置下重跑页面时直接复用已构建的图表
+        overlay_key = [(name, len(front_loaded['f'])) for name, (_, _, front_loaded) in loaded_fronts.items()]
+        fig = plotting.cached_figure(
+            ('pareto', result_key, score_method, plotting.result_hash(w), ix, iy, tuple(overlay_key)),
+            build_pareto_figure
+        )
         st.plotly_chart(fig, use_container_width=True)
         
+        if len(objectives) > 2:
+            # 平行坐标图同时展示全部目标
+            def build_parcoords_figure():
+                fig_pc = go.Figure(go.Parcoords(
+                    line=dict(color=scores, colorscale='Viridis', showscale=True,
+                              colorbar=dict(title=score_name)),
+                    dimensions=[dict(label=obj_labels[i], values=f[:, i]) for i in range(len(objectives))]
+                ))
+                fig_pc.update_layout(title='全部目标平行坐标图', height=450, template='plotly_white')
+                return fig_pc
+            
+            st.plotly_chart(
+                plotting.cached_figure(('parcoords', result_key, score_method, plotting.result_hash(w)),
+                                       build_parcoords_figure),
+                use_container_width=True
+            )
+        
         # 显示权重信息
-        col1, col2, col3, col4 = st.columns(4)
+        col1, col2, col3 = st.columns(3)
         with col1:
             st.info(f"⚖️ **权重方法**\n\n{weight_method}")
         with col2:
-            st.info(f"🔋 **能耗权重**\n\n{w[0]:.4f}")
+            st.info("⚖️ **目标权重**\n\n" + "\n\n".join(f"{n}: {wt:.4f}" for n, wt in zip(obj_names, w)))
         with col3:
-            st.info(f"💧 **水质权重**\n\n{w[1]:.4f}")
-        with col4:
             st.info(f"⭐ **最优分数**\n\n{scores[best_idx]:.4f}")
     
+    # ==================== 全部非支配解数据表 ====================
+    target_columns = {t: f'{t} ({predictor.TARGET_UNITS[t]})' for t in predictor.OUTLET_TARGETS}
+    target_columns.update({'total_energy': '总能耗 (kWh)', 'EQ_contrib': '水质指数 (点)'})
+    
+    ranks = np.empty(len(f), dtype=int)
+    ranks[ranked_indices] = np.arange(1, len(f) + 1)
+    front_df = pd.DataFrame({
+        '排名': ranks,
+        'R2_NO2 (mg/L)': x[:, 0],
+        'R5_DO (mg/L)': x[:, 1],
+        **{target_columns[t]: y[:, j] for j, t in enumerate(predictor.TARGETS)},
+        score_name: scores
+    }).sort_values('排名', ignore_index=True)
+    top10_df = front_df.head(10)
+    
     with tab2:
-        st.subheader("🏆 TOPSIS分数排名 Top 10")
-        
-        # 获取Top 10索引
-        top10_indices = np.argsort(scores)[::-1][:10]
-        
-        # 构建Top 10数据框
-        top10_data = []
-        for rank, idx in enumerate(top10_indices, 1):
-            row = {
-                '排名': rank,
-                'R2_NO2 (mg/L)': f"{x[idx, 0]:.3f}",
-                'R5_DO (mg/L)': f"{x[idx, 1]:.3f}",
-                '总能耗 (kWh)': f"{f[idx, 0]:.2f}",
-                '水质指数 (点)': f"{f[idx, 1]:.2f}",
-                'TOPSIS分数': f"{scores[idx]:.4f}"
-            }
-            
-            # 添加出水指标
-            temp_features = inlet_data.copy()
-            temp_features['R2_NO2'] = x[idx, 0]
-            temp_features['R5_DO'] = x[idx, 1]
-            df_temp = pd.DataFrame([temp_features])
-            
-            for target in outlet_targets:
-                if target in models:
-                    row[f'{target} (mg/L)'] = f"{models[target].predict(df_temp)[0]:.2f}"
-            
-            top10_data.append(row)
+        st.subheader(f"🏆 全部非支配解（按{score_name}排名，共 {len(front_df)} 个）")
+        
+        col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+        with col1:
+            sort_col = st.selectbox("排序字段", list(front_df.columns), index=0, key="front_sort_col")
+        with col2:
+            sort_asc = st.radio("排序方向", ["升序", "降序"], horizontal=True, key="front_sort_dir") == "升序"
+        with col3:
+            page_size = st.selectbox("每页行数", [10, 25, 50, 100], index=0, key="front_page_size")
+        n_pages = max(1, int(np.ceil(len(front_df) / page_size)))
+        with col4:
+            page_no = st.number_input(f"页码 (共 {n_pages} 页)", min_value=1, max_value=n_pages, value=1, step=1, key="front_page_no")
         
-        top10_df = pd.DataFrame(top10_data)
+        sorted_df = front_df.sort_values(sort_col, ascending=sort_asc, kind='stable')
+        page_df = sorted_df.iloc[(page_no - 1) * page_size: page_no * page_size]
         
         # 高亮显示
         def highlight_first(row):
@@ -613,18 +1133,29 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
             else:
                 return [''] * len(row)
         
-        styled_df = top10_df.style.apply(highlight_first, axis=1)
-        st.dataframe(styled_df, use_container_width=True, height=400)
+        number_formats = {c: '{:.2f}' for c in target_columns.values()}
+        number_formats.update({'R2_NO2 (mg/L)': '{:.3f}', 'R5_DO (mg/L)': '{:.3f}', score_name: '{:.4f}'})
+        styled_df = page_df.style.apply(highlight_first, axis=1).format(number_formats)
+        st.dataframe(styled_df, use_container_width=True, height=min(38 * (len(page_df) + 1), 600), hide_index=True)
         
-        # 下载按钮
-        csv = top10_df.to_csv(index=False, encoding='utf-8-sig')
-        st.download_button(
-            label="📥 下载 Top 10 解 (CSV)",
-            data=csv,
-            file_name="top10_solutions.csv",
-            mime="text/csv",
-            use_container_width=True
-        )
+        # 下载按钮（直接使用已保存的预测结果）
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="📥 下载 Top 10 解 (CSV)",
+                data=top10_df.to_csv(index=False, encoding='utf-8-sig'),
+                file_name="top10_solutions.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+        with col2:
+            st.download_button(
+                label=f"📥 下载全部 {len(front_df)} 个解 (CSV)",
+                data=sorted_df.to_csv(index=False, encoding='utf-8-sig'),
+                file_name="all_solutions.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
     
     with tab3:
         st.subheader("进出水水质对比分析")
@@ -707,9 +1238,11 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
         with col1:
             # 性能雷达图
             categories = ['能耗效率', '水质达标', 'COD去除', 'TN去除', 'NH去除']
+            energy_max = y[:, predictor.TARGETS.index('total_energy')].max()
+            eq_max = y[:, predictor.TARGETS.index('EQ_contrib')].max()
             values = [
-                100 - (predictions['total_energy'] / f[:, 0].max() * 100) if f[:, 0].max() > 0 else 0,
-                100 - (predictions['EQ_contrib'] / f[:, 1].max() * 100) if f[:, 1].max() > 0 else 0,
+                100 - (predictions['total_energy'] / energy_max * 100) if energy_max > 0 else 0,
+                100 - (predictions['EQ_contrib'] / eq_max * 100) if eq_max > 0 else 0,
                 removal_rates[3],
                 removal_rates[2],
                 removal_rates[0]
@@ -740,7 +1273,7 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
             st.plotly_chart(fig3, use_container_width=True)
         
         with col2:
-            # TOPSIS分数分布
+            # 决策得分分布
             fig4 = go.Figure()
             fig4.add_trace(go.Histogram(
                 x=scores,
@@ -748,7 +1281,7 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
                 marker_color='#FFD93D',
                 marker_line_color='black',
                 marker_line_width=1,
-                name='TOPSIS分数分布'
+                name=f'{score_name}分布'
             ))
             
             fig4.add_vline(
@@ -761,8 +1294,8 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
             )
             
             fig4.update_layout(
-                title='TOPSIS分数分布直方图',
-                xaxis_title='TOPSIS分数',
+                title=f'{score_name}分布直方图',
+                xaxis_title=score_name,
                 yaxis_title='频数',
                 height=400,
                 template='plotly_white',
@@ -778,12 +1311,203 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
         with col1:
             st.metric("Pareto解数量", f"{len(f)}")
         with col2:
-            st.metric("平均TOPSIS分数", f"{np.mean(scores):.4f}")
+            st.metric(f"平均{score_name}", f"{np.mean(scores):.4f}")
         with col3:
-            st.metric("最高TOPSIS分数", f"{np.max(scores):.4f}")
+            st.metric(f"最优{score_name}", f"{scores[best_idx]:.4f}")
         with col4:
             st.metric("分数标准差", f"{np.std(scores):.4f}")
     
+    with tab5:
+        st.subheader("⚖️ 权重敏感性扫描")
+        
+        if not decision.METHODS[score_method]['uses_weights']:
+            st.info(f"ℹ️ {decision.METHODS[score_method]['name']}法与权重无关，请切换到 TOPSIS / VIKOR / 加权和 查看权重敏感性")
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                sweep_axis = st.selectbox(
+                    "扫描目标",
+                    range(len(objectives)),
+                    index=objectives.index('total_energy') if 'total_energy' in objectives else 0,
+                    format_func=lambda i: obj_names[i],
+                    help="该目标的权重从0扫到1，其余目标按当前权重比例分摊剩余权重",
+                    key="sweep_axis"
+                )
+            with col2:
+                sweep_step = st.select_slider(
+                    "扫描步长（权重 0 → 1）",
+                    options=[0.05, 0.02, 0.01, 0.005, 0.001],
+                    value=0.01,
+                    key="sweep_step"
+                )
+            sweep_label = f"{obj_names[sweep_axis]}权重"
+            
+            # 在已保存的Pareto解集上一次性计算所有权重下的最优解
+            t0 = time.perf_counter()
+            grid, _, sweep_best, switches = decision.weight_sweep(
+                f, types, score_method, axis=sweep_axis, step=sweep_step, base_weights=w
+            )
+            sweep_ms = (time.perf_counter() - t0) * 1000
+            
+            n_rows = 1 + len(objectives)
+            fig5 = make_subplots(
+                rows=n_rows, cols=1,
+                shared_xaxes=True,
+                vertical_spacing=0.04,
+                subplot_titles=["最优控制参数"] + [f"最优解{n}" for n in obj_names],
+                specs=[[{"secondary_y": True}]] + [[{}] for _ in objectives]
+            )
+            fig5.add_trace(go.Scatter(x=grid, y=x[sweep_best, 0], mode='lines', line_shape='hv',
+                                      name='R2_NO2 (mg/L)', line=dict(color='#667eea', width=2)),
+                           row=1, col=1, secondary_y=False)
+            fig5.add_trace(go.Scatter(x=grid, y=x[sweep_best, 1], mode='lines', line_shape='hv',
+                                      name='R5_DO (mg/L)', line=dict(color='#f5576c', width=2)),
+                           row=1, col=1, secondary_y=True)
+            obj_colors = ['#4facfe', '#43e97b', '#FF9800', '#F44336', '#FFC107', '#9C27B0', '#00BCD4']
+            for i, label in enumerate(obj_labels):
+                fig5.add_trace(go.Scatter(x=grid, y=f[sweep_best, i], mode='lines', line_shape='hv',
+                                          name=label, line=dict(color=obj_colors[i % len(obj_colors)], width=2)),
+                               row=2 + i, col=1)
+                fig5.update_yaxes(title_text=label, row=2 + i, col=1)
+            
+            # 标记最优解发生切换的位置
+            for s_idx in switches:
+                fig5.add_vline(x=grid[s_idx], line_dash="dot", line_color="gray", line_width=1, row="all", col=1)
+            fig5.add_vline(x=w[sweep_axis], line_dash="dash", line_color="red", line_width=2, row="all", col=1,
+                           annotation_text=f"当前权重 {w[sweep_axis]:.2f}", annotation_position="top right")
+            
+            fig5.update_xaxes(title_text=f"{sweep_label}（其余目标分摊 1 - {sweep_label}）", row=n_rows, col=1)
+            fig5.update_yaxes(title_text="R2_NO2 (mg/L)", row=1, col=1, secondary_y=False)
+            fig5.update_yaxes(title_text="R5_DO (mg/L)", row=1, col=1, secondary_y=True)
+            fig5.update_layout(height=300 + 200 * len(objectives), template='plotly_white', hovermode='x unified')
+            
+            st.plotly_chart(fig5, use_container_width=True)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("扫描权重数", f"{len(grid)}")
+            with col2:
+                st.metric("最优解切换次数", f"{len(switches)}")
+            with col3:
+                st.metric("扫描耗时", f"{sweep_ms:.1f} ms")
+            
+            # 各权重区间对应的推荐设定值
+            bounds = np.concatenate([[0], switches, [len(grid)]])
+            seg_best = sweep_best[bounds[:-1]]
+            segment_df = pd.DataFrame({
+                f'{sweep_label}区间': [f"{grid[a]:.3f} ~ {grid[b - 1]:.3f}" for a, b in zip(bounds[:-1], bounds[1:])],
+                'R2_NO2 (mg/L)': x[seg_best, 0],
+                'R5_DO (mg/L)': x[seg_best, 1],
+                **{label: f[seg_best, i] for i, label in enumerate(obj_labels)}
+            })
+            st.markdown("**📋 各权重区间的推荐设定值**")
+            st.dataframe(segment_df, use_container_width=True, hide_index=True)
+    
+    with tab6:
+        st.subheader("🔍 预测解释（TreeSHAP 特征贡献）")
+        st.markdown("""
+        <div class="info-box">
+        每个指标模型对整个Pareto解集只调用一次，得到每个解在7个输入特征上的SHAP贡献：
+        基准值加上各特征贡献即为该解的预测值。结果按解集内容缓存，切换解或指标时不再调用模型。
+        </div>
+        """, unsafe_allow_html=True)
+        if predictor.is_multi_output(models):
+            st.info("ℹ️ 当前加载的是多输出模型，XGBoost 暂不支持对其计算特征贡献，请使用逐目标模型文件")
+        elif st.toggle("计算全部非支配解的特征贡献", value=False, key="explain_front"):
+            front_features = predictor.build_features(inlet_data, x)
+            t0 = time.perf_counter()
+            contribs = explain.contributions(models, front_features, model_version=loaded.tag)
+            explain_ms = (time.perf_counter() - t0) * 1000
+            
+            rank_pos = {int(i): r + 1 for r, i in enumerate(ranked_indices)}
+            col1, col2 = st.columns(2)
+            with col1:
+                explain_idx = st.selectbox(
+                    "选择解",
+                    ranked_indices.tolist(),
+                    format_func=lambda i: f"第 {rank_pos[i]} 名（R2_NO2={x[i, 0]:.2f}, R5_DO={x[i, 1]:.2f}）",
+                    key="explain_idx"
+                )
+            with col2:
+                explain_target = st.selectbox(
+                    "选择指标",
+                    predictor.TARGETS,
+                    index=predictor.TARGETS.index(objectives[0]),
+                    format_func=lambda t: f"{predictor.TARGET_NAMES[t]} ({t})",
+                    key="explain_target"
+                )
+            t_idx = predictor.TARGETS.index(explain_target)
+            
+            col1, col2 = st.columns([3, 2])
+            with col1:
+                st.plotly_chart(
+                    explain.waterfall(contribs[explain_idx, t_idx], front_features[explain_idx], explain_target),
+                    use_container_width=True
+                )
+            with col2:
+                importance = explain.mean_abs(contribs)[t_idx]
+                order = np.argsort(importance)
+                fig6 = go.Figure(go.Bar(
+                    x=importance[order],
+                    y=[predictor.FEATURES_INFO[predictor.FEATURES[k]]['name'] for k in order],
+                    orientation='h',
+                    marker_color='#667eea'
+                ))
+                fig6.update_layout(
+                    title=f'全部解上的平均 |SHAP|（{len(x)} 个解）',
+                    xaxis_title=f"{predictor.TARGET_NAMES[explain_target]} ({predictor.TARGET_UNITS[explain_target]})",
+                    height=420,
+                    template='plotly_white'
+                )
+                st.plotly_chart(fig6, use_container_width=True)
+            st.caption(f"⏱️ {len(x)} 个解 × {len(predictor.TARGETS)} 个指标的贡献计算 / 取缓存耗时 {explain_ms:.0f} ms。"
+                       "同一进水下各解的进水特征相同，贡献差异主要来自 R2_NO2 与 R5_DO。")
+    
+    with tab7:
+        st.subheader("📉 收敛过程")
+        history = opt_result.get('history')
+        if history is None:
+            st.info("ℹ️ 逐代记录仅在单种群直接优化时保存；岛屿模型、代理模型加速和载入的解集没有收敛记录")
+        else:
+            n_recorded = len(history['hv'])
+            st.markdown(f"""
+            <div class="info-box">
+            每代只记录种群的目标值、决策变量、约束违反量、非支配等级和拥挤度（float32），
+            {n_recorded} 代共占用 <strong>{history['nbytes'] / 1024:.0f} KB</strong>。
+            超体积按所有代可行非支配解的存档增量计算，参考点在首次出现可行解时确定后固定。
+            </div>
+            """, unsafe_allow_html=True)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("记录代数", f"{n_recorded}")
+            with col2:
+                st.metric("累计评估次数", f"{int(history['n_evals'][-1]):,}")
+            with col3:
+                # 超体积首次达到最终值 99% 的代数
+                hv = np.asarray(history['hv'], dtype=float)
+                reached = np.flatnonzero(hv >= 0.99 * hv[-1]) if hv[-1] > 0 else []
+                st.metric("达到最终超体积 99% 的代数", f"{int(reached[0]) + 1}" if len(reached) else "—")
+            st.plotly_chart(
+                plotting.cached_figure(('convergence', result_key), lambda: convergence.convergence_figure(history)),
+                use_container_width=True
+            )
+            
+            if len(objectives) > 2:
+                col1, col2 = st.columns(2)
+                with col1:
+                    ax = st.selectbox("动画横轴目标", range(len(objectives)), index=0,
+                                      format_func=lambda i: obj_labels[i], key="anim_x_obj")
+                with col2:
+                    ay = st.selectbox("动画纵轴目标", range(len(objectives)), index=1,
+                                      format_func=lambda i: obj_labels[i], key="anim_y_obj")
+            else:
+                ax, ay = 0, 1
+            st.plotly_chart(
+                plotting.cached_figure(('evolution', result_key, ax, ay),
+                                       lambda: convergence.animation_figure(history, ax, ay, obj_labels)),
+                use_container_width=True
+            )
+    
     st.markdown("---")
     
     # ==================== 导出所有结果 ====================
@@ -792,15 +1516,8 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        # Pareto解集
-        df_pareto = pd.DataFrame({
-            'R2_NO2 (mg/L)': x[:, 0],
-            'R5_DO (mg/L)': x[:, 1],
-            '总能耗 (kWh)': f[:, 0],
-            '水质指数 (点)': f[:, 1],
-            'TOPSIS分数': scores
-        })
-        csv_pareto = df_pareto.to_csv(index=False, encoding='utf-8-sig')
+        # Pareto解集（含全部预测指标）
+        csv_pareto = front_df.to_csv(index=False, encoding='utf-8-sig')
         st.download_button(
             label="📥 下载完整Pareto解集",
             data=csv_pareto,
@@ -812,12 +1529,10 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
     with col2:
         # 最优解详细信息
         best_solution_data = {
-            '参数/指标': ['权重方法', '能耗权重', '水质权重', 'R2_NO2', 'R5_DO', '总能耗', '水质指数', 'TOPSIS分数'] + 
+            '参数/指标': ['权重方法'] + [f'{n}权重' for n in obj_names] +
+                        ['R2_NO2', 'R5_DO', '总能耗', '水质指数', score_name] + 
                         [f'{t}出水' for t in outlet_targets],
-            '数值': [
-                weight_method,
-                f"{w[0]:.4f}",
-                f"{w[1]:.4f}",
+            '数值': [weight_method] + [f"{wt:.4f}" for wt in w] + [
                 f"{best_x[0]:.3f} mg/L",
                 f"{best_x[1]:.3f} mg/L",
                 f"{predictions['total_energy']:.2f} kWh",
@@ -846,6 +1561,36 @@ if st.button("🚀 运行 NSGA-II 多目标优化", use_container_width=True, di
             use_container_width=True
         )
     
+    # 列式导出：直接由结果数组生成，保留全精度和运行参数，可在本页重新载入
+    front_arrow = results_io.front_table(
+        x, y, f=f, objectives=objectives, scores=scores, ranks=ranks, y_robust=opt_result.get('y_robust'),
+        meta={
+            'inlet_data': inlet_data,
+            'limits': opt_result['limits'],
+            'uncertainty': opt_result.get('uncertainty'),
+            'n_evaluated': opt_result['n_evaluated'],
+            'n_infeasible': opt_result['n_infeasible'],
+            'decision_method': score_method,
+            'score_name': score_name,
+            'weights': w,
+            'weight_method': weight_method,
+            'best_index': best_idx,
+            'run': opt_result.get('run_meta') or {},
+        }
+    )
+    st.markdown("**🗂️ 列式导出（全精度，可在上方“载入已导出的Pareto解集”中重新载入）**")
+    export_cols = st.columns(len(results_io.FORMATS))
+    for col, (fmt, (fmt_name, ext, mime)) in zip(export_cols, results_io.FORMATS.items()):
+        with col:
+            st.download_button(
+                label=f"📥 下载完整Pareto解集 ({fmt_name})",
+                data=results_io.to_bytes(front_arrow, fmt),
+                file_name=f"pareto_solutions{ext}",
+                mime=mime,
+                use_container_width=True,
+                key=f"export_front_{fmt}"
+            )
+    
     # 成功提示
     st.markdown("""
     <div class="success-box">
@@ -913,15 +1658,334 @@ else:
         - 均衡模式: (0.5, 0.5)
         """)
 
+# ==================== 历史进水滚动回放 ====================
+st.markdown("---")
+st.header("5️⃣ 历史进水滚动回放")
+
+with st.expander("📼 按历史进水记录逐时刻回放优化（可中断续跑）", expanded=False):
+    st.markdown(f"""
+    <div class="info-box">
+    📼 读取带时间列的进水记录（CSV 或 Parquet，需包含 SNH_in、TSS_in、TotalN_in、COD_in、BOD5_in），
+    按上方的优化目标、排放限值、算法与决策设置逐时刻求解，每步用上一时刻的Pareto前沿热启动。
+    结果逐行追加写入输出文件，再次点击会从最后完成的时刻继续。
+    进水记录与结果文件都位于数据目录 <code>{ingest.DATA_DIR}</code> 中。
+    </div>
+    """, unsafe_allow_html=True)
+    col_r1, col_r2, col_r3 = st.columns([2, 2, 1])
+    with col_r1:
+        replay_inputs = ingest.list_data_files(('.csv', '.parquet', '.pq'))
+        replay_input = st.selectbox(
+            "进水记录文件 (.csv / .parquet)", replay_inputs,
+            index=replay_inputs.index("inflow_history.csv") if "inflow_history.csv" in replay_inputs else 0,
+            placeholder="数据目录中没有进水记录文件"
+        )
+    with col_r2:
+        replay_output_name = st.text_input("回放结果文件 (.csv)", value="replay_results.csv",
+                                           help="数据目录下的文件名")
+    with col_r3:
+        replay_time_col = st.text_input("时间列", value="", help="留空时取第一个非进水参数列")
+    col_r4, col_r5, col_r6, col_r7 = st.columns(4)
+    with col_r4:
+        baseline_r2 = st.number_input("对照 R2_NO2 (mg/L)", value=1.0, min_value=0.0, max_value=10.0,
+                                      help="现行固定设定值，用于计算节能量")
+    with col_r5:
+        baseline_r5 = st.number_input("对照 R5_DO (mg/L)", value=2.0, min_value=0.0, max_value=10.0)
+    with col_r6:
+        replay_gen = st.number_input("每步迭代代数", value=30, step=10, min_value=5, max_value=500,
+                                     help="热启动后每个时刻所需的代数远少于冷启动")
+    with col_r7:
+        replay_max_steps = st.number_input("本次最多回放步数", value=0, step=10, min_value=0,
+                                           help="0 表示回放到文件末尾")
+
+    try:
+        replay_output = ingest.data_path(replay_output_name, ('.csv',))
+    except ValueError as e:
+        replay_output = None
+        st.markdown(f'<div class="warning-box">❌ {e}</div>', unsafe_allow_html=True)
+
+    col_b1, col_b2 = st.columns([3, 1])
+    with col_b1:
+        run_replay = st.button("▶️ 开始 / 继续回放", use_container_width=True,
+                               disabled=not can_optimize or replay_output is None)
+    with col_b2:
+        clear_replay = st.button("🗑️ 清除回放结果", use_container_width=True, disabled=replay_output is None)
+
+    if clear_replay:
+        if replay.clear_output(replay_output):
+            st.success("已清除回放结果，下次将从第一条记录开始")
+        elif os.path.exists(replay_output):
+            st.markdown(f'<div class="warning-box">⚠️ {replay_output_name} 不是回放结果文件，未删除</div>',
+                        unsafe_allow_html=True)
+
+    if run_replay:
+        if replay_input is None:
+            st.markdown(f'<div class="warning-box">❌ 数据目录 {ingest.DATA_DIR} 中没有进水记录文件</div>',
+                        unsafe_allow_html=True)
+        else:
+            replay_bar = st.progress(0)
+            replay_status = st.empty()
+
+            def _replay_progress(done, total):
+                replay_bar.progress(min(done / max(total, 1), 1.0))
+                replay_status.text(f"⏳ 已完成 {done} / {total} 个时刻")
+
+            try:
+                info = replay.replay(
+                    models, ingest.data_path(replay_input, ('.csv', '.parquet', '.pq')), replay_output,
+                    {k: v for k, v in problem_kwargs.items() if k != 'inlet_data'},
+                    algorithm_name=algorithm_name, pop_size=pop_size, n_gen=replay_gen,
+                    decision_method=decision_method, weights=manual_weights,
+                    baseline_controls=(baseline_r2, baseline_r5),
+                    time_col=replay_time_col or None,
+                    max_steps=replay_max_steps or None,
+                    model_version=loaded.tag,
+                    progress=_replay_progress
+                )
+            except (ValueError, KeyError) as e:
+                st.markdown(f'<div class="warning-box">❌ 回放失败: {e}</div>', unsafe_allow_html=True)
+            else:
+                replay_status.text(
+                    f"✅ 本次从第 {info['start_step']} 步开始回放 {info['n_steps']} 步，耗时 {info['elapsed']:.1f} 秒"
+                    + ("，已回放到文件末尾" if info['completed'] else "，可再次点击继续")
+                )
+
+    if replay_output is not None and replay.is_output(replay_output) and replay.last_completed_step(replay_output) >= 0:
+        summary = replay.summarize_replay(replay_output)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("已回放时刻", f"{summary['n_steps']}")
+        with col2:
+            st.metric("有可行设定值的时刻", f"{summary['n_feasible']}")
+        with col3:
+            st.metric("累计节能量", f"{summary['energy_saving']:.0f} kWh")
+        with col4:
+            st.metric("节能比例", f"{summary['saving_pct']:.1f}%")
+        if summary['model_versions']:
+            st.caption("回放所用模型版本: " + ", ".join(summary['model_versions']))
+
+        def build_replay_figure():
+            # 分块读取并按优化能耗做 LTTB 降采样，长历史也只向浏览器发送有限个点
+            replay_df = plotting.lttb_chunks(
+                ingest.iter_chunks(replay_output, 50000,
+                                   columns=['time', 'R2_NO2', 'R5_DO', 'total_energy', 'baseline_energy']),
+                'total_energy'
+            )
+            fig_replay = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                                       subplot_titles=("总能耗：优化设定值 vs 对照设定值", "推荐设定值"))
+            fig_replay.add_trace(plotting.scatter(replay_df['time'], replay_df['baseline_energy'], name='对照能耗',
+                                                  line=dict(color='#9E9E9E')), row=1, col=1)
+            fig_replay.add_trace(plotting.scatter(replay_df['time'], replay_df['total_energy'], name='优化能耗',
+                                                  line=dict(color='#1E88E5')), row=1, col=1)
+            fig_replay.add_trace(plotting.scatter(replay_df['time'], replay_df['R2_NO2'], name='R2_NO2',
+                                                  line=dict(color='#667eea')), row=2, col=1)
+            fig_replay.add_trace(plotting.scatter(replay_df['time'], replay_df['R5_DO'], name='R5_DO',
+                                                  line=dict(color='#f5576c')), row=2, col=1)
+            fig_replay.update_yaxes(title_text="kWh", row=1, col=1)
+            fig_replay.update_yaxes(title_text="mg/L", row=2, col=1)
+            fig_replay.update_layout(height=600, hovermode='x unified')
+            return fig_replay
+
+        # 结果文件有新写入时 mtime/大小变化，图表随之重建
+        replay_stat = os.stat(replay_output)
+        st.plotly_chart(
+            plotting.cached_figure(('replay', os.path.abspath(replay_output), replay_stat.st_mtime_ns,
+                                    replay_stat.st_size), build_replay_figure),
+            use_container_width=True
+        )
+
+        with open(replay_output, 'rb') as fh:
+            st.download_button("📥 下载回放结果", data=fh.read(), file_name=os.path.basename(replay_output),
+                               mime="text/csv", use_container_width=True)
+
+# ==================== 日前24小时设定值计划 ====================
+st.markdown("---")
+st.header("6️⃣ 日前24小时设定值计划（分时电价）")
+
+with st.expander("🕐 按进水预测和分时电价优化全天逐时设定值", expanded=False):
+    st.markdown("""
+    <div class="info-box">
+    🕐 决策变量为每小时的 R2_NO2 与 R5_DO（共48个），目标为最小化全天电费（逐时能耗 × 电价）与累计水质指数。
+    每个候选计划的24个小时与整代种群一起批量预测；上方设置的排放限值要求每个小时都满足。
+    </div>
+    """, unsafe_allow_html=True)
+
+    hours = np.arange(24)
+    col_f, col_t = st.columns([3, 1])
+    with col_f:
+        st.markdown("**📈 24小时进水预测（默认以当前进水为均值叠加日变化，可直接编辑或粘贴）**")
+        diurnal = 1 + 0.15 * np.sin(2 * np.pi * (hours - 8) / 24)
+        default_forecast = pd.DataFrame(
+            {name: np.round(inlet_data[name] * diurnal, 2) for name in predictor.INLET_FEATURES}
+        )
+        default_forecast.insert(0, '小时', hours)
+        forecast_df = st.data_editor(default_forecast, use_container_width=True, hide_index=True,
+                                     disabled=['小时'], key='schedule_forecast')
+    with col_t:
+        st.markdown("**💰 分时电价 (元/kWh)**")
+        tariff_df = st.data_editor(
+            pd.DataFrame({'小时': hours, '电价': optimization.DEFAULT_TARIFF}),
+            use_container_width=True, hide_index=True, disabled=['小时'], key='schedule_tariff'
+        )
+
+    col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+    with col_s1:
+        use_ramp = st.checkbox("启用爬坡限制", value=True, help="限制相邻小时设定值的变化幅度")
+    with col_s2:
+        ramp_r2 = st.number_input("R2_NO2 每小时最大变化 (mg/L)", value=1.0, min_value=0.05, step=0.1,
+                                  disabled=not use_ramp)
+    with col_s3:
+        ramp_r5 = st.number_input("R5_DO 每小时最大变化 (mg/L)", value=0.3, min_value=0.05, step=0.05,
+                                  disabled=not use_ramp)
+    with col_s4:
+        schedule_gen = st.number_input("调度迭代代数", value=200, step=50, min_value=20, max_value=1000,
+                                       help="48维问题需要比稳态优化更多的代数")
+
+    if st.button("🕐 优化全天计划", use_container_width=True, disabled=not can_optimize):
+        with st.spinner(f"🔄 正在优化24小时计划 (种群={pop_size}, 代数={schedule_gen})..."):
+            sched = optimization.run_schedule(
+                models,
+                forecast_df[predictor.INLET_FEATURES].to_numpy(dtype=float),
+                tariff_df['电价'].to_numpy(dtype=float),
+                (r2_min, r2_max), (r5_min, r5_max),
+                limits=limits,
+                ramp=(ramp_r2, ramp_r5) if use_ramp else None,
+                algorithm_name='nsga2', pop_size=pop_size, n_gen=schedule_gen
+            )
+        if sched['X'] is None:
+            results.pop('schedule')
+            st.markdown(f"""
+            <div class="warning-box">
+            ❌ <strong>没有在所有小时都满足排放限值的计划</strong>，最小超标量: {sched['min_cv']:.2f} mg/L。<br>
+            请放宽排放限值、爬坡限制或决策变量范围。
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            tariff = tariff_df['电价'].to_numpy(dtype=float)
+            forecast = forecast_df[predictor.INLET_FEATURES].to_numpy(dtype=float)
+            # 对照：全天固定设定值（与回放的对照设定值相同）
+            baseline_y = predictor.predict_batch(
+                models,
+                predictor.build_schedule_features(forecast, np.tile([baseline_r2, baseline_r5], (24, 1))),
+                ['total_energy', 'EQ_contrib']
+            )
+            results.put('schedule', dict(
+                sched, tariff=tariff, limits=dict(limits), model_version=loaded.tag,
+                baseline_cost=float(baseline_y[:, 0] @ tariff),
+                baseline_eq=float(baseline_y[:, 1].sum())
+            ))
+            st.success(f"✅ 日前计划优化完成！耗时 {sched['elapsed']:.1f} 秒，得到 {len(sched['X'])} 个非支配计划")
+
+    sched = results.get('schedule')
+    if sched is not None:
+        sched_f = sched['F']
+        # 默认目标对下沿用上方的手动权重（能耗权重对应电费），否则使用熵权
+        if manual_weights is not None and objectives == optimization.DEFAULT_OBJECTIVES:
+            sched_w = manual_weights
+        elif len(sched_f) > 1:
+            sched_w = decision.entropy_weights(sched_f)
+        else:
+            sched_w = np.full(2, 0.5)
+        sched_best, _ = decision.select(sched_f, sched_w, -np.ones(2), decision_method)
+        plan = sched['X'][sched_best]
+        plan_y = sched['Y'][sched_best]
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("全天电费", f"{sched_f[sched_best, 0]:.0f} 元",
+                      delta=f"{sched_f[sched_best, 0] - sched['baseline_cost']:.0f} 元 vs 对照",
+                      delta_color="inverse")
+        with col2:
+            st.metric("累计水质指数", f"{sched_f[sched_best, 1]:.1f}",
+                      delta=f"{sched_f[sched_best, 1] - sched['baseline_eq']:.1f} vs 对照",
+                      delta_color="inverse")
+        with col3:
+            st.metric("全天能耗", f"{plan_y[:, 0].sum():.0f} kWh")
+        with col4:
+            st.metric("非支配计划数", f"{len(sched_f)}")
+        st.caption(f"计划由模型版本 {sched.get('model_version', '未知')} 计算")
+
+        tab_plan, tab_front = st.tabs(["📅 逐时计划", "📈 电费-水质前沿"])
+        with tab_plan:
+            fig_plan = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1,
+                                     specs=[[{"secondary_y": True}], [{"secondary_y": True}]],
+                                     subplot_titles=("逐时设定值", "逐时能耗与电价"))
+            fig_plan.add_trace(go.Scatter(x=hours, y=plan[:, 0], name='R2_NO2', line=dict(shape='hv', color='#667eea')),
+                               row=1, col=1)
+            fig_plan.add_trace(go.Scatter(x=hours, y=plan[:, 1], name='R5_DO', line=dict(shape='hv', color='#f5576c')),
+                               row=1, col=1, secondary_y=True)
+            fig_plan.add_trace(go.Bar(x=hours, y=plan_y[:, 0], name='能耗 (kWh)', marker_color='#4facfe', opacity=0.7),
+                               row=2, col=1)
+            fig_plan.add_trace(go.Scatter(x=hours, y=sched['tariff'], name='电价 (元/kWh)',
+                                          line=dict(shape='hv', color='#FF9800', width=3)),
+                               row=2, col=1, secondary_y=True)
+            fig_plan.update_yaxes(title_text="R2_NO2 (mg/L)", row=1, col=1)
+            fig_plan.update_yaxes(title_text="R5_DO (mg/L)", row=1, col=1, secondary_y=True)
+            fig_plan.update_yaxes(title_text="kWh", row=2, col=1)
+            fig_plan.update_yaxes(title_text="元/kWh", row=2, col=1, secondary_y=True)
+            fig_plan.update_xaxes(title_text="小时", dtick=1, row=2, col=1)
+            fig_plan.update_layout(height=650, hovermode='x unified')
+            st.plotly_chart(fig_plan, use_container_width=True)
+
+            plan_df = pd.DataFrame({
+                '小时': hours,
+                'R2_NO2 (mg/L)': plan[:, 0],
+                'R5_DO (mg/L)': plan[:, 1],
+                '电价 (元/kWh)': sched['tariff'],
+                '能耗 (kWh)': plan_y[:, 0],
+                '电费 (元)': plan_y[:, 0] * sched['tariff'],
+                '水质指数': plan_y[:, 1],
+            })
+            for j, t in enumerate(sched['limits']):
+                plan_df[f'{predictor.TARGET_NAMES[t]} (mg/L)'] = plan_y[:, 2 + j]
+            st.dataframe(plan_df.round(3), use_container_width=True, hide_index=True)
+            st.download_button("📥 下载全天计划", data=plan_df.to_csv(index=False).encode('utf-8-sig'),
+                               file_name="day_ahead_schedule.csv", mime="text/csv", use_container_width=True)
+        with tab_front:
+            fig_sf = go.Figure()
+            fig_sf.add_trace(go.Scatter(x=sched_f[:, 0], y=sched_f[:, 1], mode='markers', name='非支配计划',
+                                        marker=dict(size=9, color='#667eea')))
+            fig_sf.add_trace(go.Scatter(x=[sched_f[sched_best, 0]], y=[sched_f[sched_best, 1]], mode='markers',
+                                        name='推荐计划', marker=dict(size=18, color='red', symbol='star')))
+            fig_sf.add_trace(go.Scatter(x=[sched['baseline_cost']], y=[sched['baseline_eq']], mode='markers',
+                                        name='对照（固定设定值）', marker=dict(size=14, color='#9E9E9E', symbol='x')))
+            fig_sf.update_layout(xaxis_title=optimization.SCHEDULE_OBJECTIVE_NAMES['energy_cost'],
+                                 yaxis_title=optimization.SCHEDULE_OBJECTIVE_NAMES['EQ_total'], height=500)
+            st.plotly_chart(fig_sf, use_container_width=True)
+
+# ==================== 会话内存 ====================
+with st.expander("💾 会话内存", expanded=False):
+    session_status = results.status()
+    server = session_store.server_status()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("本会话保存的结果", f"{session_status['n_results']}")
+    with col2:
+        st.metric("本会话占用 / 预算", f"{session_status['bytes'] / 1024 ** 2:.2f} / "
+                                    f"{session_status['budget_bytes'] / 1024 ** 2:.0f} MB")
+    with col3:
+        st.metric("服务器活动会话", f"{server['n_sessions']}")
+    with col4:
+        st.metric("全部会话占用", f"{server['bytes'] / 1024 ** 2:.2f} MB",
+                  delta=f"累计清理 {server['n_evicted']} 个结果", delta_color="off")
+    if session_status['entries']:
+        st.dataframe(pd.DataFrame({
+            '结果': [e['key'] for e in session_status['entries']],
+            '大小 (KB)': [e['bytes'] / 1024 for e in session_status['entries']],
+            '保存于 (分钟前)': [e['age_s'] / 60 for e in session_status['entries']],
+            '最近访问 (分钟前)': [e['idle_s'] / 60 for e in session_status['entries']],
+        }).round(1), use_container_width=True, hide_index=True)
+    st.caption("解集与预测值按原精度保存，逐代历史以 float32 保存；"
+               f"超过 {session_status['ttl'] / 60:.0f} 分钟未访问或超出预算时，最早访问的结果先被清理。")
+
 # ==================== 页脚信息 ====================
 st.markdown("---")
 st.markdown("""
 <div style='text-align: center; padding: 2rem; background-color: #F5F7FA; border-radius: 10px; margin-top: 2rem;'>
     <h3 style='color: #1E88E5; margin-bottom: 1rem;'>💧 污水处理多目标优化系统（手动权重版）</h3>
     <p style='color: #666; margin: 0.5rem 0;'><strong>优化算法:</strong> NSGA-II (非支配排序遗传算法-II)</p>
-    <p style='color: #666; margin: 0.5rem 0;'><strong>决策方法:</strong> TOPSIS (逼近理想解排序法)</p>
+    <p style='color: #666; margin: 0.5rem 0;'><strong>决策方法:</strong> TOPSIS / VIKOR / 加权和 / 膝点</p>
     <p style='color: #666; margin: 0.5rem 0;'><strong>权重模式:</strong> 🤖 自动（熵权法）| ✋ 手动（自定义）</p>
-    <p style='color: #666; margin: 0.5rem 0;'><strong>优化目标:</strong> 最小化能耗 & 最小化出水水质指数</p>
+    <p style='color: #666; margin: 0.5rem 0;'><strong>优化目标:</strong> 最小化能耗 & 最小化出水水质指数（可扩展至全部7项模型输出）</p>
     <p style='color: #666; margin: 0.5rem 0;'><strong>控制参数:</strong> R2_NO2 (缺氧区硝态氮) & R5_DO (好氧区溶解氧)</p>
     <hr style='margin: 1rem 0; border: none; border-top: 1px solid #ddd;'>
     <p style='color: #999; font-size: 0.9rem;'>© 2025 污水处理智能优化系统 | Powered by NSGA-II & TOPSIS</p>
@@ -0,0 +1,239 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+import os
+import sys
+# 获取当前文件所在目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+model_path = os.path.join(current_dir, 'energy_quality_models.pkl')
+# 共享模块位于上级目录（单独运行本页面时也能导入）
+if os.path.dirname(current_dir) not in sys.path:
+    sys.path.insert(0, os.path.dirname(current_dir))
+import optimization
+import model_store
+import plotting
+import predictor
+import response_surface
+# ==================== 页面配置 ====================
+st.set_page_config(
+    page_title="控制参数响应面分析",
+    page_icon="🗺️",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# ==================== 自定义CSS样式 ====================
+st.markdown("""
+<style>
+    [data-testid="stSidebar"] {display: none;}
+    .main-title {
+        font-size: 2.8rem;
+        font-weight: bold;
+        background: linear-gradient(120deg, #1E88E5 0%, #00BCD4 100%);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        text-align: center;
+        padding: 1.5rem 0 0.5rem 0;
+    }
+    .sub-title {
+        text-align: center;
+        color: #666;
+        font-size: 1.2rem;
+        margin-bottom: 2rem;
+    }
+    .info-box {
+        background-color: #E3F2FD;
+        border-left: 5px solid #2196F3;
+        padding: 1rem;
+        border-radius: 5px;
+        margin: 1rem 0;
+    }
+    .success-box {
+        background-color: #E8F5E9;
+        border-left: 5px solid #4CAF50;
+        padding: 1rem;
+        border-radius: 5px;
+        margin: 1rem 0;
+    }
+    .help-tip {
+        background-color: #F5F7FA;
+        border: 2px solid #E0E0E0;
+        border-radius: 10px;
+        padding: 1rem;
+        margin: 1rem 0;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+# ==================== 页面标题 ====================
+st.markdown('<h1 class="main-title">🗺️ 控制参数响应面分析</h1>', unsafe_allow_html=True)
+st.markdown('<p class="sub-title">在当前进水条件下查看各指标随 R2_NO2 × R5_DO 的变化</p>', unsafe_allow_html=True)
+
+# ==================== 加载模型 ====================
+# 共享模型仓库在后台监视模型文件；网格缓存按模型版本区分，热更新后自动重新计算
+try:
+    loaded = model_store.get_store(model_path).current()
+except Exception as e:
+    st.error(f"❌ 模型加载失败: {e}")
+    st.stop()
+
+models = loaded.models
+
+with st.expander("📖 使用说明", expanded=False):
+    st.markdown("""
+    - 设置进水水质后，选择要查看的指标，页面在 R2_NO2 × R5_DO 网格上批量预测并绘制热力图或等值线图
+    - 同一进水条件下的网格会被缓存，切换指标、图表类型或返回本页时直接复用
+    - 提高分辨率时会复用已计算的较粗网格，只预测新增的网格点
+    - 出水指标可叠加排放标准限值线，线的一侧为达标区域
+    """)
+
+st.markdown("---")
+
+# ==================== 进水参数 ====================
+st.header("1️⃣ 进水水质参数")
+inlet_data = {}
+cols = st.columns(len(predictor.INLET_FEATURES))
+for col, feature in zip(cols, predictor.INLET_FEATURES):
+    info = predictor.FEATURES_INFO[feature]
+    with col:
+        inlet_data[feature] = st.number_input(
+            f"{info['icon']} {info['name']} ({info['unit']})",
+            min_value=float(info['range'][0]),
+            max_value=float(info['range'][1]),
+            value=float(info['default']),
+            step=1.0,
+            format="%.1f",
+            key=f"rs_{feature}"
+        )
+
+st.markdown("---")
+
+# ==================== 响应面设置 ====================
+st.header("2️⃣ 响应面设置")
+col_left, col_right = st.columns(2)
+with col_left:
+    target = st.selectbox(
+        "查看指标",
+        predictor.TARGETS,
+        index=predictor.TARGETS.index('total_energy'),
+        format_func=lambda t: f"{predictor.TARGET_NAMES[t]} ({t})"
+    )
+    chart_type = st.radio("图表类型", ["热力图", "等值线图"], horizontal=True)
+    resolution = st.select_slider(
+        "网格分辨率（每边点数）",
+        options=response_surface.RESOLUTIONS,
+        value=101,
+        help="可选分辨率互相嵌套，提高分辨率时复用已计算的较粗网格"
+    )
+with col_right:
+    col1, col2 = st.columns(2)
+    with col1:
+        r2_min = st.number_input("R2_NO2 最小值 (mg/L)", value=0.5, min_value=0.0, max_value=50.0)
+        r5_min = st.number_input("R5_DO 最小值 (mg/L)", value=1.5, min_value=0.0, max_value=10.0)
+    with col2:
+        r2_max = st.number_input("R2_NO2 最大值 (mg/L)", value=10.0, min_value=0.0, max_value=50.0)
+        r5_max = st.number_input("R5_DO 最大值 (mg/L)", value=4.0, min_value=0.0, max_value=10.0)
+    standard = None
+    if target in predictor.OUTLET_TARGETS:
+        standard = st.selectbox(
+            "叠加排放标准限值线",
+            [None] + list(optimization.DISCHARGE_STANDARDS),
+            format_func=lambda s: "不叠加" if s is None else s
+        )
+
+if r2_min >= r2_max or r5_min >= r5_max:
+    st.markdown('<div class="info-box">ℹ️ 决策变量的最小值必须小于最大值</div>', unsafe_allow_html=True)
+    st.stop()
+
+# ==================== 计算网格 ====================
+r2_range, r5_range = (r2_min, r2_max), (r5_min, r5_max)
+r2_axis, r5_axis, Z, grid_info = response_surface.response_grid(
+    models, inlet_data, target, r2_range, r5_range, resolution, model_version=loaded.tag
+)
+limit = optimization.DISCHARGE_STANDARDS[standard][target] if standard else None
+best_r2, best_r5, best_value = response_surface.grid_minimum(r2_axis, r5_axis, Z)
+unit = predictor.TARGET_UNITS[target]
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("网格点数", f"{resolution} × {resolution}", delta=f"模型 {loaded.tag}", delta_color="off")
+with col2:
+    st.metric("计算耗时", f"{grid_info['elapsed'] * 1000:.0f} ms",
+              delta="命中缓存" if grid_info['cached'] else None, delta_color="off")
+with col3:
+    st.metric("复用 / 新预测点数", f"{grid_info['reused']} / {grid_info['predicted']}")
+with col4:
+    st.metric("网格最小值", f"{best_value:.2f} {unit}")
+
+
+def build_surface_figure():
+    name = predictor.TARGET_NAMES[target]
+    if chart_type == "热力图":
+        surface = go.Heatmap(
+            x=r2_axis, y=r5_axis, z=Z, colorscale='Viridis',
+            colorbar=dict(title=unit),
+            hovertemplate='R2_NO2: %{x:.2f}<br>R5_DO: %{y:.2f}<br>' + name + ': %{z:.3f}<extra></extra>'
+        )
+    else:
+        surface = go.Contour(
+            x=r2_axis, y=r5_axis, z=Z, colorscale='Viridis',
+            colorbar=dict(title=unit),
+            contours=dict(showlabels=True, labelfont=dict(size=11, color='white')),
+            hovertemplate='R2_NO2: %{x:.2f}<br>R5_DO: %{y:.2f}<br>' + name + ': %{z:.3f}<extra></extra>'
+        )
+    fig = go.Figure(surface)
+    if limit is not None and Z.min() < limit < Z.max():
+        fig.add_trace(go.Contour(
+            x=r2_axis, y=r5_axis, z=Z, showscale=False, hoverinfo='skip',
+            contours=dict(start=limit, end=limit, size=1, coloring='lines',
+                          showlabels=True, labelfont=dict(color='#F44336')),
+            line=dict(color='#F44336', width=3, dash='dash'),
+            name=f'{standard}限值 {limit:g} {unit}', showlegend=True
+        ))
+    fig.add_trace(go.Scatter(
+        x=[best_r2], y=[best_r5], mode='markers',
+        marker=dict(size=14, color='white', symbol='star', line=dict(width=2, color='black')),
+        name=f'网格最小值 {best_value:.2f}'
+    ))
+    fig.update_layout(
+        title=f'{name} 响应面（{resolution} × {resolution}）',
+        xaxis_title='R2_NO2 (mg/L)',
+        yaxis_title='R5_DO (mg/L)',
+        height=620,
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    )
+    return fig
+
+
+fig_key = plotting.result_hash(
+    response_surface.inlet_key(inlet_data, r2_range, r5_range, target, loaded.tag), resolution, chart_type, standard
+)
+st.plotly_chart(plotting.cached_figure(fig_key, build_surface_figure), use_container_width=True)
+
+if limit is not None:
+    share = float((Z <= limit).mean())
+    st.markdown(f"""
+    <div class="success-box">
+    ✅ 在当前范围内，{share * 100:.1f}% 的网格点满足 {standard} 标准（{predictor.TARGET_NAMES[target]} ≤ {limit:g} {unit}）
+    </div>
+    """, unsafe_allow_html=True)
+
+# ==================== 网格数据 ====================
+with st.expander("📋 查看 / 下载网格数据", expanded=False):
+    G2, G5 = np.meshgrid(r2_axis, r5_axis)
+    grid_df = pd.DataFrame({'R2_NO2': G2.ravel(), 'R5_DO': G5.ravel(), target: Z.ravel()})
+    st.dataframe(grid_df.head(1000).round(4), use_container_width=True, hide_index=True)
+    st.download_button(
+        label="📥 下载网格数据 (CSV)",
+        data=grid_df.to_csv(index=False, encoding='utf-8-sig'),
+        file_name=f"response_surface_{target}_{resolution}.csv",
+        mime="text/csv"
+    )
+
+st.markdown("""
+<div class="help-tip">
+💡 <strong>提示</strong>：响应面来自 XGBoost 模型，呈分段常数的阶梯状；等值线图便于读出达到某一数值所需的设定值组合，
+热力图更适合观察高分辨率下的细节。网格在服务器端缓存，相同进水条件下再次打开几乎不需要等待。
+</div>
+""", unsafe_allow_html=True)
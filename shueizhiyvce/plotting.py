@@ -0,0 +1,113 @@
+"""绘图辅助：WebGL 自动切换、LTTB 降采样与按结果哈希缓存图表
+
+- 点数超过 GL_THRESHOLD 时用 go.Scattergl 代替 go.Scatter，由浏览器 GPU 渲染
+- 长时间序列在服务端用 LTTB（Largest-Triangle-Three-Buckets）降到 MAX_POINTS 个点，
+  保留峰谷形状，同时大幅减小发送到浏览器的数据量
+- 构建好的图表按输入数据的哈希缓存，页面重跑时直接复用
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+GL_THRESHOLD = 2000
+MAX_POINTS = 2000
+FIGURE_CACHE_SIZE = 32
+
+
+# ==================== WebGL 自动切换 ====================
+def scatter(x, y, **kwargs):
+    """点数超过阈值时返回 Scattergl，参数与 go.Scatter 相同"""
+    trace = go.Scattergl if len(x) > GL_THRESHOLD else go.Scatter
+    if trace is go.Scattergl:
+        # Scattergl 不支持阶梯线形，退化为折线
+        line = kwargs.get('line')
+        if isinstance(line, dict) and 'shape' in line:
+            kwargs['line'] = {k: v for k, v in line.items() if k != 'shape'}
+        kwargs.pop('line_shape', None)
+    return trace(x=x, y=y, **kwargs)
+
+
+# ==================== LTTB 降采样 ====================
+def lttb(y, n_out=MAX_POINTS, x=None):
+    """LTTB 降采样，返回保留点的下标（升序，含首尾点）
+
+    x 缺省时按等间隔处理（适用于固定采样周期的时间序列）；y 中的 NaN 不会被选为代表点。
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    # 首尾点固定，其余 n-2 个点均分到 n_out-2 个桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        with np.errstate(invalid='ignore'):
+            avg_x = x[nlo:nhi].mean()
+            avg_y = np.nanmean(y[nlo:nhi]) if np.isfinite(y[nlo:nhi]).any() else y[a]
+        # 以上一个选中点、本桶候选点和下一桶均值为顶点的三角形面积
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        area = np.where(np.isfinite(area), area, -1.0)
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def lttb_chunks(chunks, column, n_out=MAX_POINTS, per_chunk=MAX_POINTS):
+    """对分块读取的数据流做两级 LTTB：每块先降到 per_chunk 行，最后整体降到 n_out 行
+
+    chunks 为 DataFrame 迭代器，按 column 列选点；内存只与块数 × per_chunk 有关。
+    """
+    kept = []
+    for chunk in chunks:
+        kept.append(chunk.iloc[lttb(chunk[column].to_numpy(dtype=float), per_chunk)])
+    if not kept:
+        return pd.DataFrame()
+    merged = pd.concat(kept, ignore_index=True)
+    return merged.iloc[lttb(merged[column].to_numpy(dtype=float), n_out)].reset_index(drop=True)
+
+
+# ==================== 图表缓存 ====================
+_figures = OrderedDict()
+_lock = threading.Lock()
+
+
+def result_hash(*parts):
+    """数组和普通参数的内容哈希，用作图表缓存键"""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            arr = np.ascontiguousarray(part)
+            h.update(f'{arr.dtype}{arr.shape}'.encode())
+            h.update(arr.tobytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+
+def cached_figure(key, build):
+    """按 key 返回缓存的图表，没有时调用 build() 构建；最多保留 FIGURE_CACHE_SIZE 个
+
+    返回的图表对象被多次复用，调用方不要再修改它。
+    """
+    with _lock:
+        if key in _figures:
+            _figures.move_to_end(key)
+            return _figures[key]
+    fig = build()
+    with _lock:
+        _figures[key] = fig
+        _figures.move_to_end(key)
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+    return fig
@@ -0,0 +1,271 @@
+"""批量预测工具
+
+模型文件有两种形式，都使用同样的 7 个输入特征：
+- {目标名: XGBRegressor} 的字典，每个目标一个模型；
+- MultiOutputModel：一个多输出树模型同时给出全部目标，一次遍历森林。
+这里把整批样本组装成一个 (n, 7) 数组，每个模型只调用一次 predict，
+避免逐行构造 DataFrame、逐目标调用。页面和优化器统一通过 predict_batch 预测，
+不必区分模型文件的形式。
+
+预测按推理配置选择线程数（INFERENCE_PROFILES）：单行 / 小批量用单线程原地预测，
+省去线程调度的开销；大批量按进程内的线程预算（THREAD_BUDGET）使用多线程。
+进程池的工作进程从预算中租用线程，保证各进程的线程数之和不超过 CPU 核数。
+"""
+import json
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+
+import numpy as np
+
+# ==================== 特征与目标定义（顺序与训练时一致） ====================
+INLET_FEATURES = ['SNH_in', 'TSS_in', 'TotalN_in', 'COD_in', 'BOD5_in']
+CONTROL_FEATURES = ['R2_NO2', 'R5_DO']
+FEATURES = INLET_FEATURES + CONTROL_FEATURES
+
+OUTLET_TARGETS = ['SNH', 'TSS', 'TotalN', 'COD', 'BOD5']
+TARGETS = OUTLET_TARGETS + ['total_energy', 'EQ_contrib']
+
+# 特征的中文名、单位、合理取值范围与界面默认值
+FEATURES_INFO = {
+    'SNH_in': {'name': '入水SNH浓度', 'unit': 'mg/L', 'range': (0, 100), 'default': 30, 'icon': '🔵'},
+    'TSS_in': {'name': '入水TSS浓度', 'unit': 'mg/L', 'range': (0, 500), 'default': 150, 'icon': '🟤'},
+    'TotalN_in': {'name': '入水总氮', 'unit': 'mg/L', 'range': (0, 100), 'default': 50, 'icon': '🟢'},
+    'COD_in': {'name': '入水COD浓度', 'unit': 'mg/L', 'range': (0, 1000), 'default': 300, 'icon': '🔴'},
+    'BOD5_in': {'name': '入水BOD5浓度', 'unit': 'mg/L', 'range': (0, 500), 'default': 150, 'icon': '🟡'},
+    'R2_NO2': {'name': '第2反应池硝态氮', 'unit': 'mg/L', 'range': (0, 50), 'default': 10, 'icon': '⚙️'},
+    'R5_DO': {'name': '第5反应池溶解氧', 'unit': 'mg/L', 'range': (0, 10), 'default': 3, 'icon': '⚙️'}
+}
+
+TARGET_NAMES = {
+    'SNH': '出水SNH', 'TSS': '出水TSS', 'TotalN': '出水总氮', 'COD': '出水COD', 'BOD5': '出水BOD5',
+    'total_energy': '总能耗', 'EQ_contrib': '出水水质指数'
+}
+
+TARGET_UNITS = {
+    'SNH': 'mg/L', 'TSS': 'mg/L', 'TotalN': 'mg/L', 'COD': 'mg/L', 'BOD5': 'mg/L',
+    'total_energy': 'kWh', 'EQ_contrib': '点'
+}
+
+
+def build_features(inlet_data, controls):
+    """进水参数 + 一批控制参数 (n, 2) -> 特征矩阵 (n, 7)"""
+    controls = np.atleast_2d(np.asarray(controls, dtype=float))
+    X = np.empty((controls.shape[0], len(FEATURES)))
+    for j, name in enumerate(INLET_FEATURES):
+        X[:, j] = inlet_data[name]
+    X[:, len(INLET_FEATURES):] = controls
+    return X
+
+
+def build_scenario_features(scenarios, controls):
+    """进水情景 (M, 5) × 控制参数 (n, 2) -> 特征矩阵 (n*M, 7)
+
+    按个体分块排列：第 i 个个体的 M 行连续存放，结果可直接 reshape 成 (n, M, ·)。
+    """
+    scenarios = np.atleast_2d(np.asarray(scenarios, dtype=float))
+    controls = np.atleast_2d(np.asarray(controls, dtype=float))
+    n, m = controls.shape[0], scenarios.shape[0]
+    X = np.empty((n, m, len(FEATURES)))
+    X[:, :, :len(INLET_FEATURES)] = scenarios[None, :, :]
+    X[:, :, len(INLET_FEATURES):] = controls[:, None, :]
+    return X.reshape(n * m, len(FEATURES))
+
+
+def build_schedule_features(forecast, schedules):
+    """逐时进水预测 (H, 5) × 一批逐时设定值 (n, H, 2) -> 特征矩阵 (n*H, 7)
+
+    第 h 小时的进水与第 h 小时的设定值配对；第 i 个计划的 H 行连续存放。
+    """
+    forecast = np.asarray(forecast, dtype=float)
+    schedules = np.asarray(schedules, dtype=float).reshape(-1, forecast.shape[0], len(CONTROL_FEATURES))
+    n, h = schedules.shape[0], forecast.shape[0]
+    X = np.empty((n, h, len(FEATURES)))
+    X[:, :, :len(INLET_FEATURES)] = forecast[None, :, :]
+    X[:, :, len(INLET_FEATURES):] = schedules
+    return X.reshape(n * h, len(FEATURES))
+
+
+# ==================== 多输出模型 ====================
+class MultiOutputModel:
+    """单个多输出 XGBRegressor（multi_strategy='multi_output_tree'）
+
+    各目标量纲差异很大（能耗数千、BOD5 个位数），训练时目标先标准化，
+    预测时再按 y_mean / y_std 还原。支持 keys() / len() / in，与模型字典的用法一致。
+    """
+
+    def __init__(self, model, targets, y_mean, y_std):
+        self.model = model
+        self.targets = list(targets)
+        self.y_mean = np.asarray(y_mean, dtype=float)
+        self.y_std = np.asarray(y_std, dtype=float)
+
+    def keys(self):
+        return list(self.targets)
+
+    def __iter__(self):
+        return iter(self.targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __contains__(self, target):
+        return target in self.targets
+
+    def predict_all(self, X, profile=None):
+        """(n, 7) 特征 -> (n, len(self.targets))"""
+        X = np.asarray(X, dtype=float)
+        Z = _inplace_predict(self.model, X, profile).reshape(-1, len(self.targets))
+        return Z * self.y_std + self.y_mean
+
+
+def is_multi_output(models):
+    return isinstance(models, MultiOutputModel)
+
+
+# ==================== 推理配置与线程预算 ====================
+INFERENCE_PROFILES = {
+    'latency': '单线程原地预测，适合单行 / 小批量（页面交互、逐代评估）',
+    'throughput': '按线程预算多线程预测，适合大批量（鲁棒评估、响应面、批量评分）',
+}
+# 未指定配置时，不超过该行数的批量按 latency 预测
+LATENCY_MAX_ROWS = 256
+
+
+class ThreadBudget:
+    """进程内的 CPU 线程预算
+
+    启动进程池前用 lease(n_workers) 租用线程，得到每个工作进程的线程数；租期内本进程
+    大批量预测只用剩余的线程。每个进程至少 1 个线程，因此只有工作进程数超过核数时总线程数
+    才会超过核数。工作进程启动时用 configure(n_threads) 把自己的预算设为租到的线程数。
+    """
+
+    def __init__(self, total=None):
+        self.total = max(1, int(total or os.cpu_count() or 1))
+        self._leased = 0
+        self._lock = threading.Lock()
+
+    def configure(self, total):
+        with self._lock:
+            self.total = max(1, int(total))
+
+    def available(self):
+        """本进程当前可用于预测的线程数"""
+        return max(1, self.total - self._leased)
+
+    @contextmanager
+    def lease(self, n_workers):
+        """为 n_workers 个工作进程租用线程，产出每个进程的线程数，退出时归还"""
+        n_workers = max(1, int(n_workers))
+        with self._lock:
+            per_worker = max(1, (self.total - self._leased) // n_workers)
+            used = per_worker * n_workers
+            self._leased += used
+        try:
+            yield per_worker
+        finally:
+            with self._lock:
+                self._leased -= used
+
+    def status(self):
+        return {'total': self.total, 'leased': self._leased, 'available': self.available()}
+
+
+THREAD_BUDGET = ThreadBudget()
+
+# 每个模型按线程数缓存一份 Booster 副本：同一 Booster 改 nthread 会触发重新配置，
+# 多个会话并发预测时也会互相干扰；模型被释放（热更新换版本）时副本随之释放
+_boosters = weakref.WeakKeyDictionary()
+_boosters_lock = threading.Lock()
+
+
+def _booster(model, n_threads):
+    with _boosters_lock:
+        copies = _boosters.setdefault(model, {})
+        booster = copies.get(n_threads)
+        if booster is None:
+            try:
+                # 带早停信息的模型只用到最优轮数（与 XGBRegressor.predict 一致）
+                booster = model.get_booster()[:model.best_iteration + 1]
+            except AttributeError:
+                booster = model.get_booster().copy()
+            booster.set_param({'nthread': n_threads})
+            copies[n_threads] = booster
+    return booster
+
+
+def prediction_booster(model, profile=None, n_rows=1):
+    """predict_batch 实际使用的 Booster（带早停信息时只含最优轮数的树），只读使用
+
+    解释、阈值解析等直接调用 Booster 的地方都应通过它取得，结果才与显示的预测值一致。
+    """
+    return _booster(model, profile_threads(profile, n_rows))
+
+
+def profile_threads(profile, n_rows):
+    """配置对应的线程数；profile 为 None 时按批大小自动选择"""
+    if profile is None:
+        profile = 'latency' if n_rows <= LATENCY_MAX_ROWS else 'throughput'
+    if profile not in INFERENCE_PROFILES:
+        raise ValueError(f'未知的推理配置: {profile}，可选: {list(INFERENCE_PROFILES)}')
+    return 1 if profile == 'latency' else THREAD_BUDGET.available()
+
+
+def _inplace_predict(model, X, profile=None):
+    return np.asarray(_booster(model, profile_threads(profile, X.shape[0])).inplace_predict(X), dtype=float)
+
+
+def predict_batch(models, X, targets=None, profile=None):
+    """整批预测，返回 (n, len(targets))，列顺序与 targets 一致
+
+    profile 为 'latency' / 'throughput'，None 时按批大小自动选择。
+    """
+    targets = TARGETS if targets is None else list(targets)
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    if is_multi_output(models):
+        return models.predict_all(X, profile)[:, [models.targets.index(t) for t in targets]]
+    Y = np.empty((X.shape[0], len(targets)))
+    for j, target in enumerate(targets):
+        Y[:, j] = _inplace_predict(models[target], X, profile)
+    return Y
+
+
+# ==================== 控制变量的分裂阈值 ====================
+# 每个模型的阈值只解析一次（优化问题每次构造都会用到，如逐时刻回放）
+_thresholds = weakref.WeakKeyDictionary()
+_thresholds_lock = threading.Lock()
+
+
+def _split_thresholds(model):
+    with _thresholds_lock:
+        cached = _thresholds.get(model)
+    if cached is not None:
+        return cached
+    columns = [FEATURES.index(name) for name in CONTROL_FEATURES]
+    found = [[np.empty(0, dtype=np.float32)] for _ in columns]
+    trees = json.loads(prediction_booster(model, 'latency').save_raw('json'))['learner']['gradient_booster']['model']['trees']
+    for tree in trees:
+        split = np.asarray(tree['left_children']) != -1
+        index = np.asarray(tree['split_indices'])
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        for k, col in enumerate(columns):
+            found[k].append(conditions[split & (index == col)])
+    cached = [np.unique(np.concatenate(parts)) for parts in found]
+    with _thresholds_lock:
+        _thresholds[model] = cached
+    return cached
+
+
+def control_thresholds(models, targets=None):
+    """各模型在 R2_NO2、R5_DO 上用到的全部分裂阈值，返回 [R2_NO2 阈值, R5_DO 阈值]（float32，升序去重）
+
+    树按 float32 比较 x < 阈值。进水固定时，两个控制变量都落在相邻阈值之间同一个格子里的设定值
+    在每棵树中走到同一个叶子，各目标的预测完全相同。
+    """
+    targets = TARGETS if targets is None else list(targets)
+    if is_multi_output(models):
+        per_model = [_split_thresholds(models.model)]
+    else:
+        per_model = [_split_thresholds(models[t]) for t in targets]
+    return [np.unique(np.concatenate([m[k] for m in per_model])) for k in range(len(CONTROL_FEATURES))]
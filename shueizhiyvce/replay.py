@@ -0,0 +1,266 @@
+"""历史进水滚动回放
+
+按时间顺序逐行读取带时间戳的进水记录（CSV 或 Parquet，分块流式读取），
+每个时刻求解一次多目标优化，并用上一时刻的 Pareto 前沿热启动初始种群。
+选出的设定值和预测指标逐行追加写入结果 CSV，内存占用与历史长度无关；
+中断后再次运行时从最后一个已完成的时刻继续。每行记录求解该时刻所用的模型版本，
+续跑期间模型更新时可以区分前后两段结果。
+
+结果文件旁的 <输出>.front.npy 保存最近一步的前沿，供续跑时热启动。
+只有表头与 OUTPUT_COLUMNS 一致的文件才被当作回放结果：续跑、覆盖和清除都不会动其他文件。
+"""
+import csv
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import decision
+from ingest import count_rows, iter_chunks
+from optimization import run_single
+from predictor import CONTROL_FEATURES, INLET_FEATURES, TARGETS, build_features, predict_batch
+
+OUTPUT_COLUMNS = (
+    ['step', 'time'] + INLET_FEATURES + CONTROL_FEATURES + TARGETS
+    + ['baseline_energy', 'energy_saving', 'n_front', 'feasible', 'model_version']
+)
+
+
+# ==================== 进水数据流式读取 ====================
+def iter_inlet(path, time_col=None, chunksize=10000):
+    """逐条产出 (step, time, inlet_data)；time_col 缺省时取第一个非进水特征列"""
+    step = 0
+    for chunk in iter_chunks(path, chunksize):
+        missing = [c for c in INLET_FEATURES if c not in chunk.columns]
+        if missing:
+            raise ValueError(f'进水文件缺少列: {missing}')
+        if time_col is None:
+            others = [c for c in chunk.columns if c not in INLET_FEATURES]
+            time_col = others[0] if others else ''
+        times = chunk[time_col].astype(str).to_numpy() if time_col else None
+        values = chunk[INLET_FEATURES].to_numpy(dtype=float)
+        for i in range(len(chunk)):
+            yield step, (times[i] if times is not None else str(step)), dict(zip(INLET_FEATURES, values[i]))
+            step += 1
+
+
+# ==================== 续跑支持 ====================
+def _read_tail(fh):
+    """从文件末尾向前读到至少包含 3 个换行符，返回 (起始偏移, 内容)"""
+    pos = fh.seek(0, os.SEEK_END)
+    tail = b''
+    while pos > 0 and tail.count(b'\n') < 3:
+        read = min(4096, pos)
+        pos -= read
+        fh.seek(pos)
+        tail = fh.read(read) + tail
+    return pos, tail
+
+
+def last_completed_step(output_path):
+    """结果文件最后一条完整记录的 step，文件不存在或只有表头时返回 -1
+
+    只读，不修改文件：只从末尾向前读取，另一个回放正在写入的残行被忽略。
+    """
+    if not os.path.exists(output_path):
+        return -1
+    with open(output_path, 'rb') as fh:
+        _, tail = _read_tail(fh)
+    tail = tail[:tail.rfind(b'\n') + 1]
+    lines = [ln for ln in tail.decode('utf-8').splitlines() if ln.strip()]
+    if not lines or lines[-1].startswith('step,'):
+        return -1
+    return int(lines[-1].split(',', 1)[0])
+
+
+def _truncate_partial(output_path):
+    """续跑追加前截掉上次中断时写到一半的残行"""
+    with open(output_path, 'rb+') as fh:
+        pos, tail = _read_tail(fh)
+        if tail and not tail.endswith(b'\n'):
+            fh.truncate(pos + tail.rfind(b'\n') + 1)
+
+
+def is_output(output_path):
+    """output_path 是否为本版本回放写出的结果文件（表头与 OUTPUT_COLUMNS 一致）"""
+    try:
+        with open(output_path, newline='', encoding='utf-8') as fh:
+            return next(csv.reader(fh), None) == OUTPUT_COLUMNS
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return False
+
+
+def _check_output(output_path):
+    """已有的输出文件必须是回放结果，避免覆盖其他文件或向列不同的文件追加错位的行"""
+    if os.path.exists(output_path) and not is_output(output_path):
+        raise ValueError(f'{output_path} 不是当前版本的回放结果文件（列不一致），请换一个输出文件')
+
+
+def clear_output(output_path):
+    """删除回放结果文件及其前沿文件，返回删除的路径；不是回放结果的文件不删除"""
+    removed = []
+    if is_output(output_path):
+        os.remove(output_path)
+        removed.append(output_path)
+    if os.path.exists(_front_path(output_path)):
+        os.remove(_front_path(output_path))
+        removed.append(_front_path(output_path))
+    return removed
+
+
+def _front_path(output_path):
+    return output_path + '.front.npy'
+
+
+def _save_front(output_path, X):
+    tmp = _front_path(output_path) + '.tmp'
+    with open(tmp, 'wb') as fh:
+        np.save(fh, X)
+    os.replace(tmp, _front_path(output_path))
+
+
+def _drop_front(output_path):
+    try:
+        os.remove(_front_path(output_path))
+    except FileNotFoundError:
+        pass
+
+
+def _load_front(output_path):
+    try:
+        return np.load(_front_path(output_path))
+    except (OSError, ValueError):
+        return None
+
+
+def warm_start_population(prev_front, r2_range, r5_range, pop_size, rng):
+    """上一时刻的前沿（裁剪到当前范围）+ 随机个体补足种群"""
+    xl = np.array([r2_range[0], r5_range[0]], dtype=float)
+    xu = np.array([r2_range[1], r5_range[1]], dtype=float)
+    n_keep = 0 if prev_front is None else min(len(prev_front), pop_size)
+    X = np.empty((pop_size, 2))
+    if n_keep:
+        X[:n_keep] = np.clip(prev_front[:n_keep], xl, xu)
+    X[n_keep:] = xl + rng.random((pop_size - n_keep, 2)) * (xu - xl)
+    return X
+
+
+# ==================== 滚动回放 ====================
+def _select(F, weights, method):
+    if len(F) == 1:
+        return 0
+    types = -np.ones(F.shape[1])
+    w = decision.entropy_weights(F) if weights is None else np.asarray(weights, dtype=float)
+    return decision.select(F, w, types, method)[0]
+
+
+def replay(models, inlet_path, output_path, problem_kwargs, algorithm_name='nsga2', pop_size=50, n_gen=30,
+           decision_method='topsis', weights=None, baseline_controls=None, time_col=None,
+           max_steps=None, warm_start=True, seed=0, model_version=None, progress=None):
+    """对历史进水逐时刻求解并追加写入 output_path，返回本次运行的统计
+
+    problem_kwargs 与 WastewaterOptimization 相同但不含 inlet_data；
+    weights 为 None 时每步使用熵权法；baseline_controls 为对照的固定设定值 (R2_NO2, R5_DO)；
+    max_steps 限制本次最多求解的步数，之后可再次调用续跑，结果与一次跑完相同；model_version 写入每一行。
+    progress(done_step, total_steps) 在每步完成后回调。
+    """
+    t0 = time.perf_counter()
+    _check_output(output_path)
+    start = last_completed_step(output_path) + 1
+    prev_front = _load_front(output_path) if (warm_start and start > 0) else None
+    total = count_rows(inlet_path)
+    energy_col = TARGETS.index('total_energy')
+
+    new_file = start == 0
+    if new_file:
+        _drop_front(output_path)
+    else:
+        _truncate_partial(output_path)
+    n_done = 0
+    with open(output_path, 'w' if new_file else 'a', newline='', encoding='utf-8') as fh:
+        writer = csv.writer(fh)
+        if new_file:
+            writer.writerow(OUTPUT_COLUMNS)
+        for step, stamp, inlet_data in iter_inlet(inlet_path, time_col):
+            if step < start:
+                continue
+            if max_steps is not None and n_done >= max_steps:
+                break
+
+            # 每步的随机数只由 (seed, step) 决定，续跑与不中断运行的结果相同
+            rng = np.random.default_rng([seed, step])
+            sampling = None
+            if warm_start and prev_front is not None:
+                sampling = warm_start_population(
+                    prev_front, problem_kwargs['r2_range'], problem_kwargs['r5_range'], int(pop_size), rng
+                )
+            run = run_single(models, dict(problem_kwargs, inlet_data=inlet_data), algorithm_name,
+                             pop_size, n_gen, seed=int(rng.integers(2 ** 31 - 1)), sampling=sampling)
+
+            baseline = np.nan
+            if baseline_controls is not None:
+                baseline = float(predict_batch(
+                    models, build_features(inlet_data, baseline_controls), ['total_energy'])[0, 0])
+
+            if run['X'] is None:
+                # 本时刻无可行设定值：记录空结果，下一步冷启动
+                controls = [np.nan, np.nan]
+                y = [np.nan] * len(TARGETS)
+                n_front, feasible = 0, False
+                prev_front = None
+            else:
+                best = _select(run['F'], weights, decision_method)
+                controls = run['X'][best].tolist()
+                y = predict_batch(models, build_features(inlet_data, run['X'][best])).ravel().tolist()
+                n_front, feasible = len(run['X']), True
+                prev_front = run['X']
+
+            writer.writerow(
+                [step, stamp] + [inlet_data[c] for c in INLET_FEATURES] + controls + y
+                + [baseline, baseline - y[energy_col], n_front, feasible, model_version or '']
+            )
+            fh.flush()
+            # 无可行解时删除旧前沿，续跑与不中断时一样从冷启动开始
+            if prev_front is None:
+                _drop_front(output_path)
+            else:
+                _save_front(output_path, prev_front)
+            n_done += 1
+            if progress is not None:
+                progress(step + 1, total)
+
+    return {
+        'start_step': start,
+        'n_steps': n_done,
+        'total_steps': total,
+        'completed': last_completed_step(output_path) + 1 >= total,
+        'elapsed': time.perf_counter() - t0,
+    }
+
+
+def summarize_replay(output_path, chunksize=50000):
+    """分块汇总回放结果：步数、可行步数、总能耗与对照能耗、节能量、用到的模型版本"""
+    n_steps = n_feasible = 0
+    energy = baseline = 0.0
+    versions = []
+    columns = ('total_energy', 'baseline_energy', 'feasible', 'model_version')
+    for chunk in pd.read_csv(output_path, chunksize=chunksize, dtype={'model_version': str},
+                             usecols=lambda c: c in columns):
+        ok = chunk['feasible'].astype(str) == 'True'
+        if 'model_version' in chunk:
+            versions += [v for v in chunk['model_version'].dropna().unique() if v not in versions]
+        n_steps += len(chunk)
+        n_feasible += int(ok.sum())
+        energy += float(chunk.loc[ok, 'total_energy'].sum())
+        baseline += float(chunk.loc[ok, 'baseline_energy'].sum())
+    saving = baseline - energy
+    return {
+        'n_steps': n_steps,
+        'n_feasible': n_feasible,
+        'total_energy': energy,
+        'baseline_energy': baseline,
+        'energy_saving': saving,
+        'saving_pct': saving / baseline * 100 if baseline > 0 else np.nan,
+        'model_versions': versions,
+    }
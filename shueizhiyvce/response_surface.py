@@ -0,0 +1,94 @@
+"""控制参数响应面：(R2_NO2, R5_DO) 平面上某个目标的预测网格
+
+整张网格组装成一个特征矩阵，一次批量预测得到；结果按
+(模型版本, 进水参数, 决策变量范围, 目标, 分辨率) 缓存在进程内，各会话共享。
+分辨率选用 RESOLUTIONS 中互相嵌套的取值（(n-1) 成倍数），切换到更高分辨率时
+直接复用已缓存的较粗网格上的点，只预测新增的点。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from predictor import build_features, predict_batch
+
+# 每边的网格点数；(n - 1) 两两成倍数关系的取值之间可以复用
+RESOLUTIONS = [26, 51, 101, 151, 201, 301]
+GRID_CACHE_SIZE = 48
+
+_grids = OrderedDict()
+_lock = threading.Lock()
+
+
+def inlet_key(inlet_data, r2_range, r5_range, target, model_version=None):
+    """缓存键中与分辨率无关的部分"""
+    return (
+        model_version,
+        tuple(round(float(inlet_data[name]), 6) for name in sorted(inlet_data)),
+        tuple(float(v) for v in r2_range),
+        tuple(float(v) for v in r5_range),
+        target,
+    )
+
+
+def grid_axes(r2_range, r5_range, resolution):
+    return np.linspace(*r2_range, resolution), np.linspace(*r5_range, resolution)
+
+
+def _coarser(key, resolution):
+    """已缓存的、能嵌入当前分辨率的最细网格，返回 (分辨率, 网格)"""
+    best = None
+    for (k, res), Z in _grids.items():
+        if k == key and res < resolution and (resolution - 1) % (res - 1) == 0:
+            if best is None or res > best[0]:
+                best = (res, Z)
+    return best
+
+
+def response_grid(models, inlet_data, target, r2_range, r5_range, resolution, model_version=None):
+    """target 在 resolution × resolution 网格上的预测值
+
+    返回 (r2_axis, r5_axis, Z, info)：Z 的形状为 (len(r5_axis), len(r2_axis))，
+    行对应 R5_DO、列对应 R2_NO2（与 plotly 热力图的 z 约定一致）；
+    info 记录是否命中缓存、复用的点数、实际预测的点数和耗时。
+    """
+    t0 = time.perf_counter()
+    resolution = int(resolution)
+    key = inlet_key(inlet_data, r2_range, r5_range, target, model_version)
+    r2_axis, r5_axis = grid_axes(r2_range, r5_range, resolution)
+
+    with _lock:
+        Z = _grids.get((key, resolution))
+        if Z is not None:
+            _grids.move_to_end((key, resolution))
+            return r2_axis, r5_axis, Z, {'cached': True, 'reused': Z.size, 'predicted': 0,
+                                         'elapsed': time.perf_counter() - t0}
+        coarse = _coarser(key, resolution)
+
+    G2, G5 = np.meshgrid(r2_axis, r5_axis)
+    Z = np.empty((resolution, resolution))
+    todo = np.ones((resolution, resolution), dtype=bool)
+    if coarse is not None:
+        # 较粗网格的点正好落在步长为 step 的位置上
+        step = (resolution - 1) // (coarse[0] - 1)
+        Z[::step, ::step] = coarse[1]
+        todo[::step, ::step] = False
+
+    controls = np.column_stack([G2[todo], G5[todo]])
+    Z[todo] = predict_batch(models, build_features(inlet_data, controls), [target])[:, 0]
+    Z.setflags(write=False)
+
+    with _lock:
+        _grids[(key, resolution)] = Z
+        _grids.move_to_end((key, resolution))
+        while len(_grids) > GRID_CACHE_SIZE:
+            _grids.popitem(last=False)
+    return r2_axis, r5_axis, Z, {'cached': False, 'reused': int((~todo).sum()), 'predicted': int(todo.sum()),
+                                 'elapsed': time.perf_counter() - t0}
+
+
+def grid_minimum(r2_axis, r5_axis, Z):
+    """网格上的最小值及其位置 (R2_NO2, R5_DO, 值)"""
+    i, j = np.unravel_index(np.argmin(Z), Z.shape)
+    return float(r2_axis[j]), float(r5_axis[i]), float(Z[i, j])
@@ -0,0 +1,138 @@
+"""结果的列式导出与载入（Parquet / Arrow IPC）
+
+直接由 numpy 结果数组构造带类型的 Arrow 表，数值保持 float64 全精度；
+运行参数以 JSON 写入 schema 元数据。载入时按文件头识别格式，返回 DataFrame
+与元数据，Pareto 解集可以不经重新计算恢复为页面上的优化结果。
+"""
+import io
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from predictor import CONTROL_FEATURES, FEATURES, TARGETS
+
+META_KEY = b'shueizhiyvce.meta'
+
+# 格式: (显示名, 扩展名, MIME)
+FORMATS = {
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('Arrow IPC', '.arrow', 'application/vnd.apache.arrow.file'),
+}
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, pd.Timestamp)):
+        return obj.isoformat()
+    raise TypeError(f'无法序列化为 JSON: {type(obj)}')
+
+
+def schema_metadata(meta):
+    """运行参数 -> schema 元数据字典（自动补充导出时间）"""
+    meta = dict(meta or {})
+    meta.setdefault('created_at', datetime.now().isoformat(timespec='seconds'))
+    return {META_KEY: json.dumps(meta, ensure_ascii=False, default=_json_default).encode('utf-8')}
+
+
+def with_meta(table, meta):
+    """把运行参数写入表的 schema 元数据"""
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), **schema_metadata(meta)})
+
+
+def read_meta(schema):
+    raw = (schema.metadata or {}).get(META_KEY)
+    return json.loads(raw.decode('utf-8')) if raw else {}
+
+
+# ==================== 构造结果表 ====================
+def front_table(x, y, f=None, objectives=None, scores=None, ranks=None, y_robust=None, meta=None):
+    """Pareto 解集 -> Arrow 表
+
+    列：R2_NO2、R5_DO、7 项预测指标；f 为优化时的目标值（鲁棒模式下与预测值不同），
+    写成 obj_<目标> 列；y_robust 写成 robust_<指标> 列；另有决策得分 score 与排名 rank。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    columns = {name: x[:, j] for j, name in enumerate(CONTROL_FEATURES)}
+    columns.update({t: y[:, j] for j, t in enumerate(TARGETS)})
+    if f is not None:
+        f = np.asarray(f, dtype=float)
+        columns.update({f'obj_{t}': f[:, j] for j, t in enumerate(objectives)})
+    if y_robust is not None:
+        columns.update({f'robust_{t}': np.asarray(y_robust, dtype=float)[:, j] for j, t in enumerate(TARGETS)})
+    if scores is not None:
+        columns['score'] = np.asarray(scores, dtype=float)
+    if ranks is not None:
+        columns['rank'] = np.asarray(ranks, dtype=np.int32)
+    table = pa.table(columns)
+    return with_meta(table, dict(meta or {}, kind='pareto_front', objectives=list(objectives or [])))
+
+
+def prediction_table(features, predictions, meta=None):
+    """单次预测（或多次预测组成的列表）-> Arrow 表，列为 7 个特征和 7 项预测指标"""
+    rows_f = features if isinstance(features, list) else [features]
+    rows_p = predictions if isinstance(predictions, list) else [predictions]
+    columns = {name: np.array([r[name] for r in rows_f], dtype=float) for name in FEATURES}
+    columns.update({t: np.array([r[t] for r in rows_p], dtype=float) for t in TARGETS})
+    return with_meta(pa.table(columns), dict(meta or {}, kind='prediction'))
+
+
+# ==================== 序列化 ====================
+def to_bytes(table, fmt='parquet'):
+    """Arrow 表 -> 文件内容（供 st.download_button 使用）"""
+    sink = pa.BufferOutputStream()
+    if fmt == 'parquet':
+        pq.write_table(table, sink, compression='zstd')
+    elif fmt == 'arrow':
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f'未知的导出格式: {fmt}，可选: {list(FORMATS)}')
+    return sink.getvalue().to_pybytes()
+
+
+def read_table(source):
+    """读取导出的 Parquet / Arrow 文件，返回 (DataFrame, 元数据)
+
+    source 可以是路径、bytes 或文件对象（如 st.file_uploader 的返回值）；按文件头识别格式。
+    """
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    elif hasattr(source, 'read'):
+        data = source.read()
+    else:
+        with open(source, 'rb') as fh:
+            data = fh.read()
+    if data[:4] == b'PAR1':
+        table = pq.read_table(io.BytesIO(data))
+    elif data[:6] == b'ARROW1':
+        table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+    else:
+        raise ValueError('不是 Parquet 或 Arrow IPC 文件')
+    return table.to_pandas(), read_meta(table.schema)
+
+
+def front_from_frame(df, meta):
+    """由载入的 Pareto 解集表恢复 x / f / y（以及 y_robust）"""
+    missing = [c for c in CONTROL_FEATURES + TARGETS if c not in df.columns]
+    if missing:
+        raise ValueError(f'文件缺少列: {missing}')
+    objectives = list(meta.get('objectives') or [])
+    if not objectives:
+        raise ValueError('文件元数据中没有优化目标')
+    obj_cols = [f'obj_{t}' if f'obj_{t}' in df.columns else t for t in objectives]
+    robust_cols = [f'robust_{t}' for t in TARGETS]
+    return {
+        'x': df[CONTROL_FEATURES].to_numpy(dtype=float),
+        'f': df[obj_cols].to_numpy(dtype=float),
+        'y': df[TARGETS].to_numpy(dtype=float),
+        'y_robust': df[robust_cols].to_numpy(dtype=float) if all(c in df.columns for c in robust_cols) else None,
+        'objectives': objectives,
+    }
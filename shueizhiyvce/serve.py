@@ -0,0 +1,34 @@
+"""服务启动入口：先加载并预热共享模型仓库，再在同一进程中启动 Streamlit
+
+直接 `streamlit run app.py` 时，第一个打开预测或优化页面的会话要承担模型反序列化、
+XGBoost 库加载和首次预测的开销。用本脚本启动时这些在服务开始接受连接之前完成，
+页面取到的是已预热的同一个模型仓库。
+
+命令行用法（其余参数原样传给 streamlit run）：
+    python serve.py --server.port 8501
+"""
+import os
+import sys
+
+import model_store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 与各页面加载的模型文件相同
+MODEL_PATHS = [os.path.join(BASE_DIR, 'pages', 'energy_quality_models.pkl')]
+
+
+def main():
+    state = model_store.boot(MODEL_PATHS)
+    for path, info in state['models'].items():
+        print(f"模型已预热: {path}（版本 {info['tag']}，试预测 {info['warmup_ms']:.0f} ms）", flush=True)
+    for path, error in state['errors'].items():
+        print(f"模型预热失败: {path}: {error}", file=sys.stderr, flush=True)
+    print(f"{'服务就绪' if state['ready'] else '服务未就绪'}，启动预热耗时 {state['elapsed_ms']:.0f} ms", flush=True)
+
+    from streamlit.web import cli as stcli
+    sys.argv = ['streamlit', 'run', os.path.join(BASE_DIR, 'app.py')] + sys.argv[1:]
+    sys.exit(stcli.main())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""会话结果存储：按字节预算、存活时间 (TTL) 和 LRU 管理各会话保存的运行结果
+
+每个会话一个 ResultStore，放在 st.session_state 中，随会话结束释放。结果保存时
+数组复制为只读；逐代历史等体积大的字段（COMPACT_FIELDS）转为 float32，解集、预测值等
+保持原精度，导出的列式文件与重新载入的解集和运行结果一致。
+图表不进会话，由 plotting 的进程级缓存负责。超过 TTL 未访问的结果被清理；
+总大小超过预算时按最近最少使用的顺序淘汰较早的运行，刚保存的结果总会保留。
+
+所有会话的存储登记在进程级的弱引用表中，server_status() 汇总整个服务的会话内存，
+sweep() 顺带清理长时间无人访问的会话中已过期的结果。
+预算和 TTL 可用环境变量 SHUEIZHIYVCE_SESSION_BUDGET_MB、SHUEIZHIYVCE_SESSION_TTL_MIN 配置。
+"""
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from itertools import count
+
+import numpy as np
+
+SESSION_BUDGET_BYTES = int(float(os.environ.get('SHUEIZHIYVCE_SESSION_BUDGET_MB', 64)) * 1024 ** 2)
+SESSION_TTL = float(os.environ.get('SHUEIZHIYVCE_SESSION_TTL_MIN', 240)) * 60
+STATE_KEY = '_result_store'
+# 保存时转为 float32 的顶层字段
+COMPACT_FIELDS = ('history',)
+
+
+# ==================== 紧凑存储 ====================
+def freeze(value, to_float32=False):
+    """数组复制为只读（to_float32 时浮点数组转为 float32），字典 / 列表 / 元组逐项处理，其余原样返回"""
+    if isinstance(value, np.ndarray):
+        if to_float32 and np.issubdtype(value.dtype, np.floating):
+            value = value.astype(np.float32)
+        else:
+            value = value.copy()
+        value.setflags(write=False)
+        return value
+    if isinstance(value, dict):
+        return {k: freeze(v, to_float32) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(freeze(v, to_float32) for v in value)
+    return value
+
+
+def compact(result):
+    """保存前的处理：COMPACT_FIELDS 中的数组转为 float32，其余数组只设为只读、保持原精度"""
+    if not isinstance(result, dict):
+        return freeze(result)
+    return {k: freeze(v, k in COMPACT_FIELDS) for k, v in result.items()}
+
+
+def nbytes(value):
+    """结果占用的近似字节数（数组按数据大小，容器逐项累加）"""
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(k) + nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# ==================== 单个会话的结果存储 ====================
+class ResultStore:
+    def __init__(self, budget_bytes=SESSION_BUDGET_BYTES, ttl=SESSION_TTL):
+        self.budget_bytes = int(budget_bytes)
+        self.ttl = float(ttl)
+        self._items = OrderedDict()  # key -> [结果, 字节数, 保存时间, 最近访问时间]
+        self._lock = threading.Lock()
+        self.n_evicted = 0
+
+    def put(self, key, result):
+        """保存（替换）一个结果，返回紧凑后的结果"""
+        result = compact(result)
+        now = time.time()
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = [result, nbytes(result), now, now]
+            self._evict(now, keep=key)
+        return result
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            if now - item[3] > self.ttl:
+                del self._items[key]
+                self.n_evicted += 1
+                return default
+            item[3] = now
+            self._items.move_to_end(key)
+            return item[0]
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._items.pop(key, None)
+        return default if item is None else item[0]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self, prefix=''):
+        """按保存先后排列的键（不更新访问时间）"""
+        with self._lock:
+            return sorted((k for k in self._items if k.startswith(prefix)), key=lambda k: self._items[k][2])
+
+    def saved_at(self, key):
+        with self._lock:
+            item = self._items.get(key)
+        return None if item is None else item[2]
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(item[1] for item in self._items.values())
+
+    def expire(self, now=None):
+        with self._lock:
+            self._evict(time.time() if now is None else now)
+
+    def _evict(self, now, keep=None):
+        # 先清理过期的，再按 LRU 淘汰到预算以内（调用方持有锁）
+        for key in [k for k, item in self._items.items() if now - item[3] > self.ttl and k != keep]:
+            del self._items[key]
+            self.n_evicted += 1
+        total = sum(item[1] for item in self._items.values())
+        for key in list(self._items):
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._items.pop(key)[1]
+            self.n_evicted += 1
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            entries = [{'key': k, 'bytes': item[1], 'age_s': now - item[2], 'idle_s': now - item[3]}
+                       for k, item in self._items.items()]
+        return {'n_results': len(entries), 'bytes': sum(e['bytes'] for e in entries),
+                'budget_bytes': self.budget_bytes, 'ttl': self.ttl, 'n_evicted': self.n_evicted,
+                'entries': entries}
+
+
+# ==================== 进程级登记与汇总 ====================
+_registry = weakref.WeakValueDictionary()
+_registry_lock = threading.Lock()
+_ids = count(1)
+
+
+def get_session_store(session_state):
+    """当前会话的 ResultStore（不存在时创建并登记），同时清理所有会话中过期的结果"""
+    store = session_state.get(STATE_KEY)
+    if store is None:
+        store = session_state[STATE_KEY] = ResultStore()
+        with _registry_lock:
+            _registry[next(_ids)] = store
+    sweep()
+    return store
+
+
+def sweep():
+    now = time.time()
+    with _registry_lock:
+        stores = list(_registry.values())
+    for store in stores:
+        store.expire(now)
+
+
+def server_status():
+    """整个服务的会话内存：会话数、结果数、总字节数与累计淘汰数"""
+    with _registry_lock:
+        stores = list(_registry.values())
+    per_session = [s.status() for s in stores]
+    return {
+        'n_sessions': len(per_session),
+        'n_results': sum(s['n_results'] for s in per_session),
+        'bytes': sum(s['bytes'] for s in per_session),
+        'max_session_bytes': max((s['bytes'] for s in per_session), default=0),
+        'n_evicted': sum(s['n_evicted'] for s in per_session),
+        'budget_bytes': SESSION_BUDGET_BYTES,
+        'ttl': SESSION_TTL,
+    }
@@ -0,0 +1,222 @@
+"""优化内循环的快速代理模型
+
+在 (R2_NO2, R5_DO) 平面的规则网格上做一次批量评估（鲁棒模式下即情景聚合后的值），
+拟合廉价的代理模型：网格双线性插值表、径向基函数 (RBF) 或多项式。进化算法在代理
+模型上运行，最终前沿再用真实模型重新评分：按真实约束剔除超标解、重新取非支配前沿，
+并报告代理模型在验证点和前沿上的误差。
+
+XGBoost 的响应面是分段常数，代理模型只能给出光滑近似，因此复核后再以代理前沿
+为初始种群，用真实模型精修少量代数，最终前沿全部来自真实模型的评估。
+单次模型调用很便宜时（名义进水、模型较小），进化算法本身的开销占主导，代理模型
+收益有限；鲁棒模式下每代需要 种群×情景数 行预测，代理模型的加速最明显。
+"""
+import time
+
+import numpy as np
+from scipy.interpolate import RBFInterpolator, RegularGridInterpolator
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
+
+from optimization import WastewaterOptimization, hypervolumes, run_single
+
+SURROGATE_KINDS = {
+    'grid': '网格双线性插值',
+    'rbf': 'RBF（薄板样条）',
+    'poly': '多项式回归',
+}
+
+
+# ==================== 代理模型 ====================
+class Surrogate:
+    """在规则网格上拟合；输入按决策变量范围归一化到 [0, 1]，RBF / 多项式的输出先标准化"""
+
+    def __init__(self, kind, targets, xl, xu, degree=3, smoothing=1e-3):
+        if kind not in SURROGATE_KINDS:
+            raise ValueError(f'未知的代理模型: {kind}，可选: {list(SURROGATE_KINDS)}')
+        self.kind = kind
+        self.targets = list(targets)
+        self.xl = np.asarray(xl, dtype=float)
+        self.xu = np.asarray(xu, dtype=float)
+        self.degree = int(degree)
+        self.smoothing = float(smoothing)
+        self._model = None
+        self._mean = self._std = None
+
+    def _unit(self, X):
+        span = np.where(self.xu > self.xl, self.xu - self.xl, 1.0)
+        return (np.atleast_2d(np.asarray(X, dtype=float)) - self.xl) / span
+
+    def _poly_terms(self, U):
+        # 二元多项式的全部单项式 u1^i * u2^j (i + j <= degree)
+        return np.column_stack([U[:, 0] ** i * U[:, 1] ** j
+                                for i in range(self.degree + 1) for j in range(self.degree + 1 - i)])
+
+    def fit(self, axes, Y):
+        """axes 为两个决策变量的网格坐标，Y 为 (len(axes[0]), len(axes[1]), len(targets))"""
+        if self.kind == 'grid':
+            self._model = RegularGridInterpolator(axes, Y)
+            return self
+        g1, g2 = np.meshgrid(*axes, indexing='ij')
+        U = self._unit(np.column_stack([g1.ravel(), g2.ravel()]))
+        Y = Y.reshape(-1, Y.shape[-1])
+        self._mean = Y.mean(axis=0)
+        self._std = np.where(Y.std(axis=0) > 0, Y.std(axis=0), 1.0)
+        Z = (Y - self._mean) / self._std
+        if self.kind == 'rbf':
+            self._model = RBFInterpolator(U, Z, kernel='thin_plate_spline', smoothing=self.smoothing)
+        else:
+            self._model, *_ = np.linalg.lstsq(self._poly_terms(U), Z, rcond=None)
+        return self
+
+    def predict(self, X):
+        """(n, 2) 控制参数 -> (n, len(targets))"""
+        if self.kind == 'grid':
+            return self._model(np.clip(np.atleast_2d(X), self.xl, self.xu))
+        U = self._unit(X)
+        Z = self._model(U) if self.kind == 'rbf' else self._poly_terms(U) @ self._model
+        return Z * self._std + self._mean
+
+
+def _error_stats(Y_true, Y_pred, targets):
+    err = Y_pred - Y_true
+    ss_tot = ((Y_true - Y_true.mean(axis=0)) ** 2).sum(axis=0)
+    r2 = 1 - (err ** 2).sum(axis=0) / np.where(ss_tot > 0, ss_tot, 1.0)
+    return {
+        t: {
+            'rmse': float(np.sqrt((err[:, j] ** 2).mean())),
+            'max_abs': float(np.abs(err[:, j]).max()),
+            'mape': float((np.abs(err[:, j]) / np.maximum(np.abs(Y_true[:, j]), 1e-9)).mean() * 100),
+            'r2': float(r2[j]),
+        }
+        for j, t in enumerate(targets)
+    }
+
+
+def fit_surrogate(problem, kind='grid', n_samples=1600, n_validation=200, degree=3, seed=0):
+    """在 problem 的决策变量范围内按规则网格批量评估并拟合代理模型，随机验证点评估精度
+
+    problem 为 WastewaterOptimization（不含代理模型），代理模型的输出即 problem.targets。
+    返回 (surrogate, report)；report 含采样数、拟合耗时和各指标的验证误差。
+    """
+    t0 = time.perf_counter()
+    xl, xu = problem.xl, problem.xu
+    n_side = max(3, int(np.ceil(np.sqrt(n_samples))))
+    axes = (np.linspace(xl[0], xu[0], n_side), np.linspace(xl[1], xu[1], n_side))
+    g1, g2 = np.meshgrid(*axes, indexing='ij')
+    X_train = np.column_stack([g1.ravel(), g2.ravel()])
+    X_val = xl + np.random.default_rng(seed).random((int(n_validation), 2)) * (xu - xl)
+
+    # 训练点与验证点合并成一次批量评估（经评估缓存，落在同一阈值格子的点只预测一次）
+    Y = problem.predict_cached(np.vstack([X_train, X_val]))
+    Y_train, Y_val = Y[:len(X_train)], Y[len(X_train):]
+
+    surrogate = Surrogate(kind, problem.targets, xl, xu, degree=degree)
+    surrogate.fit(axes, Y_train.reshape(n_side, n_side, -1))
+    report = {
+        'kind': kind,
+        'n_samples': len(X_train),
+        'n_validation': len(X_val),
+        'validation': _error_stats(Y_val, surrogate.predict(X_val), problem.targets),
+        'fit_time': time.perf_counter() - t0,
+    }
+    return surrogate, report
+
+
+# ==================== 真实模型复核 ====================
+def verify_front(problem, X, F_surrogate):
+    """用真实模型（problem 不含代理模型）重新评分代理模型给出的前沿
+
+    剔除按真实预测超出排放限值的解，在真实目标值上重新取非支配前沿。
+    返回字典：X / F（真实目标值，无可行解时为 None）、各目标在前沿上的代理误差、被剔除的数量，
+    以及复核解中最小的约束违反量 min_cv（与 run_single 相同，为各限值超出量之和）。
+    """
+    Y = problem.predict_cached(X)
+    F_true = Y[:, :problem.n_obj]
+    front_error = _error_stats(F_true, np.asarray(F_surrogate, dtype=float), problem.objectives)
+
+    cv = np.zeros(len(X))
+    if problem.limits:
+        cv = np.maximum(Y[:, problem.limit_cols] - problem.limit_values, 0).sum(axis=1)
+    feasible = cv <= 0
+
+    result = {'X': None, 'F': None, 'front_error': front_error,
+              'n_infeasible': int((~feasible).sum()), 'n_dominated': 0,
+              'min_cv': float(cv.min()) if len(cv) else 0.0}
+    if feasible.any():
+        Xf, Ff = X[feasible], F_true[feasible]
+        front = np.sort(NonDominatedSorting().do(Ff, only_non_dominated_front=True))
+        result['X'], result['F'] = Xf[front], Ff[front]
+        result['n_dominated'] = int(len(Xf) - len(front))
+    return result
+
+
+# ==================== 代理模型加速优化 ====================
+def run_surrogate(models, problem_kwargs, algorithm_name, pop_size, n_gen, kind='grid', n_samples=1600,
+                  refine_gen=None, seed=None):
+    """代理模型上进化 n_gen 代 -> 真实模型复核 -> 真实模型精修 refine_gen 代
+
+    refine_gen 缺省为 n_gen 的 1/5（至少 5 代），为 0 时只复核不精修。
+    返回值与 run_single 相同，另含 'surrogate' 报告：验证误差、前沿误差、复核剔除数和各阶段耗时。
+    """
+    t0 = time.perf_counter()
+    refine_gen = max(5, int(n_gen) // 5) if refine_gen is None else int(refine_gen)
+    exact_problem = WastewaterOptimization(models=models, **problem_kwargs)
+
+    surrogate, report = fit_surrogate(exact_problem, kind=kind, n_samples=n_samples,
+                                      seed=0 if seed is None else seed)
+    t1 = time.perf_counter()
+    approx = run_single(models, dict(problem_kwargs, surrogate=surrogate), algorithm_name, pop_size, n_gen,
+                        seed=seed)
+    t2 = time.perf_counter()
+    report.update(surrogate_time=t2 - t1, n_surrogate_evaluated=approx['n_evaluated'], refine_gen=refine_gen)
+    n_sampled = report['n_samples'] + report['n_validation']
+
+    if approx['X'] is None:
+        # 代理模型认为没有可行解时直接用真实模型从头优化
+        exact = run_single(models, problem_kwargs, algorithm_name, pop_size, n_gen, seed=seed)
+        report.update(front_error={}, n_front=0, n_rejected=0, refine_time=exact['elapsed'], fallback=True)
+        return dict(exact, n_evaluated=exact['n_evaluated'] + n_sampled,
+                    n_cache_hits=exact['n_cache_hits'] + exact_problem.n_cache_hits, surrogate=report,
+                    elapsed=time.perf_counter() - t0)
+
+    verified = verify_front(exact_problem, approx['X'], approx['F'])
+    report.update(front_error=verified['front_error'], n_front=len(approx['X']),
+                  n_rejected=verified['n_infeasible'], fallback=False)
+
+    if refine_gen == 0:
+        t3 = time.perf_counter()
+        result = {
+            'X': verified['X'], 'F': verified['F'],
+            'n_evaluated': n_sampled + len(approx['X']),
+            'n_infeasible': verified['n_infeasible'],
+            'n_cache_hits': exact_problem.n_cache_hits,
+            'min_cv': verified['min_cv'],
+        }
+    else:
+        # 代理前沿（含复核超标的解，由约束支配排序淘汰）+ 随机个体作为精修的初始种群
+        seeds = approx['X'][:int(pop_size)]
+        fill = exact_problem.xl + np.random.default_rng(seed).random((int(pop_size) - len(seeds), 2)) \
+            * (exact_problem.xu - exact_problem.xl)
+        result = run_single(models, problem_kwargs, algorithm_name, pop_size, refine_gen, seed=seed,
+                            sampling=np.vstack([seeds, fill]))
+        # 计数包含采样、复核（复核超标的解计入 n_infeasible），与只复核时一致
+        result['n_evaluated'] += n_sampled + len(approx['X'])
+        result['n_infeasible'] += report['n_rejected']
+        result['n_cache_hits'] += exact_problem.n_cache_hits
+        t3 = time.perf_counter()
+    report['refine_time'] = t3 - t2
+    return dict(result, surrogate=report, elapsed=t3 - t0)
+
+
+def benchmark_surrogate(models, problem_kwargs, algorithm_name, pop_size, n_gen, kind='grid', n_samples=1600,
+                        refine_gen=None, seed=1):
+    """代理模型加速与直接优化的耗时和前沿超体积对比（种群、代数相同）"""
+    direct = run_single(models, problem_kwargs, algorithm_name, pop_size, n_gen, seed=seed)
+    fast = run_surrogate(models, problem_kwargs, algorithm_name, pop_size, n_gen, kind=kind,
+                         n_samples=n_samples, refine_gen=refine_gen, seed=seed)
+    hv_direct, hv_fast = hypervolumes([direct['F'], fast['F']])
+    return {
+        'direct': dict(direct, hv=hv_direct),
+        'surrogate': dict(fast, hv=hv_fast),
+        'speedup': direct['elapsed'] / fast['elapsed'] if fast['elapsed'] > 0 else float('nan'),
+        'hv_ratio': hv_fast / hv_direct if hv_direct > 0 else float('nan'),
+    }
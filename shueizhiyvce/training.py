@@ -0,0 +1,660 @@
+"""模型训练：由历史运行数据重新训练 7 个目标模型，输出模型文件与清单
+
+数据文件（CSV / Parquet）需包含 predictor.FEATURES 的 7 个特征列和 predictor.TARGETS 的
+7 个目标列，按时间顺序排列；末尾 val_frac 比例的行作为验证集（时间顺序留出）。
+每个目标一个 XGBRegressor，使用 hist 算法并在验证集上早停，早停后只保留最优轮数的树。
+各目标在独立的子进程中并行训练（每个进程只训练一个目标），从而可以分别记录
+每个目标的训练耗时与进程峰值内存。
+
+输出与页面使用的 energy_quality_models.pkl 格式相同（{目标名: XGBRegressor}），
+旁边写一个同名的 .manifest.json，记录特征顺序、训练参数、各目标的验证指标、耗时与内存。
+也可以训练单个多输出模型（predictor.MultiOutputModel），并与逐目标模型对比精度和推理速度。
+
+命令行用法：
+    python training.py history.csv -o energy_quality_models.pkl --n-jobs 4
+    python training.py history.csv -o multi_output_models.pkl --multi-output
+    python training.py history.csv --compare energy_quality_models.pkl multi_output_models.pkl
+    python training.py new_window.csv --update energy_quality_models.pkl --rounds 100 --max-trees 300 --promote
+
+增量更新在新一段数据上从当前模型继续提升（XGBoost 训练续接），结果发布为带版本号的
+新模型文件（energy_quality_models.v0001.pkl ...），--promote 时再原子替换生产模型文件。
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import re
+import shutil
+import time
+import warnings
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from artifacts import file_digest, manifest_path, read_manifest, write_artifact, write_manifest
+from ingest import is_parquet
+from optimization import _detached_main
+from predictor import FEATURES, TARGETS, THREAD_BUDGET, MultiOutputModel, predict_batch
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不记录峰值内存
+    resource = None
+
+DEFAULT_PARAMS = {
+    'n_estimators': 1000,
+    'learning_rate': 0.05,
+    'max_depth': 6,
+    'subsample': 0.8,
+    'min_child_weight': 1,
+    'early_stopping_rounds': 50,
+    'tree_method': 'hist',
+}
+
+
+# ==================== 数据与文件 ====================
+def load_training_data(path, targets=None):
+    """读取训练数据，返回 (X DataFrame, Y DataFrame)；缺少列时抛出 ValueError"""
+    targets = TARGETS if targets is None else list(targets)
+    df = pd.read_parquet(path) if is_parquet(path) else pd.read_csv(path)
+    missing = [c for c in FEATURES + targets if c not in df.columns]
+    if missing:
+        raise ValueError(f'训练数据缺少列: {missing}')
+    df = df[FEATURES + targets].dropna()
+    return df[FEATURES].astype(float), df[targets].astype(float)
+
+
+def split_holdout(X, Y, val_frac=0.2):
+    """按时间顺序留出末尾 val_frac 比例的行作为验证集"""
+    n_val = max(1, int(round(len(X) * val_frac)))
+    return X.iloc[:-n_val], Y.iloc[:-n_val], X.iloc[-n_val:], Y.iloc[-n_val:]
+
+
+def regression_metrics(y_true, y_pred):
+    y_true, y_pred = np.asarray(y_true, dtype=float), np.asarray(y_pred, dtype=float)
+    err = y_pred - y_true
+    ss_tot = ((y_true - y_true.mean()) ** 2).sum()
+    return {
+        'rmse': float(np.sqrt((err ** 2).mean())),
+        'mae': float(np.abs(err).mean()),
+        'r2': float(1 - (err ** 2).sum() / ss_tot) if ss_tot > 0 else float('nan'),
+    }
+
+
+def truncate(model, n_trees):
+    """只保留前 n_trees 轮的树，返回新的 XGBRegressor（预测与 iteration_range=(0, n_trees) 相同）"""
+    sliced = model.get_booster()[:int(n_trees)]
+    out = xgb.XGBRegressor()
+    out.load_model(bytearray(sliced.save_raw('ubj')))
+    return out
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存 (MB)；平台不支持时为 None"""
+    if resource is None:
+        return None
+    # Linux 上单位为 KB，macOS 上为字节
+    scale = 1 / 1024 ** 2 if os.uname().sysname == 'Darwin' else 1 / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+# ==================== 单个目标的训练（在子进程中运行） ====================
+def _fit_target(target, X_train, y_train, X_val, y_val, params, n_threads, seed):
+    rss_before = peak_rss_mb()
+    t0 = time.perf_counter()
+    model = xgb.XGBRegressor(**params, n_jobs=n_threads, random_state=seed)
+    model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+    n_trees = model.best_iteration + 1
+    model = truncate(model, n_trees)
+    elapsed = time.perf_counter() - t0
+    rss_after = peak_rss_mb()
+
+    record = {
+        'n_trees': n_trees,
+        'train_time': elapsed,
+        'peak_rss_mb': rss_after,
+        'fit_rss_mb': None if rss_after is None else rss_after - rss_before,
+        'train': regression_metrics(y_train, model.predict(X_train)),
+        'validation': regression_metrics(y_val, model.predict(X_val)),
+    }
+    return target, model, record
+
+
+def _fit_target_packed(args):
+    return _fit_target(*args)
+
+
+def _fit_multi_output(X_train, Y_train, X_val, Y_val, params, n_threads, seed):
+    """一个多输出树模型拟合全部目标；目标按训练集均值、标准差标准化"""
+    rss_before = peak_rss_mb()
+    t0 = time.perf_counter()
+    y_mean = Y_train.mean().to_numpy()
+    y_std = Y_train.std().replace(0, 1.0).to_numpy()
+    model = xgb.XGBRegressor(**params, multi_strategy='multi_output_tree', n_jobs=n_threads, random_state=seed)
+    model.fit(X_train, (Y_train - y_mean) / y_std, eval_set=[(X_val, (Y_val - y_mean) / y_std)], verbose=False)
+    n_trees = model.best_iteration + 1
+    wrapped = MultiOutputModel(truncate(model, n_trees), Y_train.columns, y_mean, y_std)
+    elapsed = time.perf_counter() - t0
+    rss_after = peak_rss_mb()
+
+    P_train, P_val = wrapped.predict_all(X_train), wrapped.predict_all(X_val)
+    record = {
+        'n_trees': n_trees,
+        'train_time': elapsed,
+        'peak_rss_mb': rss_after,
+        'fit_rss_mb': None if rss_after is None else rss_after - rss_before,
+        'targets': {
+            t: {'train': regression_metrics(Y_train[t], P_train[:, j]),
+                'validation': regression_metrics(Y_val[t], P_val[:, j])}
+            for j, t in enumerate(Y_train.columns)
+        },
+    }
+    return wrapped, record
+
+
+def _spawn_pool(n_jobs):
+    # maxtasksperchild=1：每个任务使用新进程，峰值内存互不累加
+    with _detached_main():
+        return mp.get_context('spawn').Pool(processes=n_jobs, maxtasksperchild=1)
+
+
+def train_models(X, Y, params=None, val_frac=0.2, n_jobs=None, seed=0, progress=None):
+    """并行训练 Y 中每一列对应的目标模型
+
+    n_jobs 为并行进程数（缺省为 CPU 核数与目标数中的较小者），每个进程的 XGBoost 线程数
+    从线程预算中租用（空闲时为 CPU 核数 / n_jobs）。返回 (models, records, wall_time)。
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    targets = list(Y.columns)
+    n_jobs = max(1, min(n_jobs or THREAD_BUDGET.total, len(targets)))
+    X_train, Y_train, X_val, Y_val = split_holdout(X, Y, val_frac)
+
+    models, records = {}, {}
+    t0 = time.perf_counter()
+    with THREAD_BUDGET.lease(n_jobs) as n_threads:
+        tasks = [(t, X_train, Y_train[t], X_val, Y_val[t], params, n_threads, seed) for t in targets]
+        pool = _spawn_pool(n_jobs)
+        try:
+            for done, (target, model, record) in enumerate(pool.imap_unordered(_fit_target_packed, tasks), start=1):
+                models[target], records[target] = model, record
+                if progress is not None:
+                    progress(done / len(targets))
+        finally:
+            pool.close()
+            pool.join()
+    # 保持与 TARGETS 一致的顺序
+    models = {t: models[t] for t in targets}
+    records = {t: records[t] for t in targets}
+    return models, records, time.perf_counter() - t0
+
+
+def train_multi_output(X, Y, params=None, val_frac=0.2, seed=0):
+    """训练单个多输出模型（使用线程预算中全部空闲的核），返回 (MultiOutputModel, record, wall_time)"""
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    X_train, Y_train, X_val, Y_val = split_holdout(X, Y, val_frac)
+    t0 = time.perf_counter()
+    with THREAD_BUDGET.lease(1) as n_threads:
+        pool = _spawn_pool(1)
+        try:
+            model, record = pool.apply(_fit_multi_output,
+                                       (X_train, Y_train, X_val, Y_val, params, n_threads, seed))
+        finally:
+            pool.close()
+            pool.join()
+    return model, record, time.perf_counter() - t0
+
+
+# ==================== 逐目标模型与多输出模型的对比 ====================
+def benchmark_inference(models, X, batch_sizes=(1, 200, 10000), repeat=5, profile=None):
+    """各批大小下的预测耗时（取 repeat 次的中位数）与吞吐量；profile 为推理配置，None 时按批大小自动选择"""
+    X = np.asarray(X, dtype=float)
+    result = {}
+    for size in batch_sizes:
+        Xb = X[np.arange(size) % len(X)]
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            predict_batch(models, Xb, profile=profile)
+            times.append(time.perf_counter() - t0)
+        t = float(np.median(times))
+        result[int(size)] = {'latency_ms': t * 1000, 'rows_per_s': size / t if t > 0 else float('inf')}
+    return result
+
+
+def compare_artifacts(candidates, data_path, val_frac=0.2, batch_sizes=(1, 200, 10000), rmse_tolerance=0.05):
+    """在同一份数据的时间顺序验证集上对比多个模型文件的精度与推理速度
+
+    candidates 为 {名称: 模型}。推荐规则：每个目标的验证 RMSE 都不超过该目标最佳 RMSE 的
+    (1 + rmse_tolerance) 倍的候选中，选最大批量下吞吐量最高的；都不满足时选平均相对 RMSE 最小的。
+    """
+    X, Y = load_training_data(data_path)
+    _, _, X_val, Y_val = split_holdout(X, Y, val_frac)
+    report = {}
+    for name, models in candidates.items():
+        P = predict_batch(models, X_val.to_numpy(), list(Y_val.columns))
+        report[name] = {
+            'validation': {t: regression_metrics(Y_val[t], P[:, j]) for j, t in enumerate(Y_val.columns)},
+            'inference': benchmark_inference(models, X_val.to_numpy(), batch_sizes),
+        }
+
+    best_rmse = {t: min(r['validation'][t]['rmse'] for r in report.values()) for t in Y_val.columns}
+    for r in report.values():
+        rel = [r['validation'][t]['rmse'] / best_rmse[t] if best_rmse[t] > 0 else 1.0 for t in Y_val.columns]
+        r['rmse_ratio'] = float(np.max(rel))
+        r['mean_rmse_ratio'] = float(np.mean(rel))
+    largest = max(batch_sizes)
+    eligible = [n for n, r in report.items() if r['rmse_ratio'] <= 1 + rmse_tolerance]
+    if eligible:
+        recommended = max(eligible, key=lambda n: report[n]['inference'][largest]['rows_per_s'])
+    else:
+        recommended = min(report, key=lambda n: report[n]['mean_rmse_ratio'])
+    return {'candidates': report, 'recommended': recommended, 'rmse_tolerance': rmse_tolerance,
+            'n_validation': len(X_val)}
+
+
+def format_comparison(comparison):
+    """对比结果的文本摘要（命令行输出）"""
+    names = list(comparison['candidates'])
+    first = comparison['candidates'][names[0]]
+    width = max(22, max(len(n) for n in names) + 2)
+    lines = ['验证 RMSE（时间顺序留出 {} 行）'.format(comparison['n_validation'])]
+    lines.append(f"{'目标':<14}" + ''.join(f'{n:>{width}}' for n in names))
+    for t in first['validation']:
+        lines.append(f'{t:<14}' + ''.join(
+            f"{comparison['candidates'][n]['validation'][t]['rmse']:>{width}.4f}" for n in names))
+    lines.append('推理速度（中位耗时 ms / 吞吐量 行每秒）')
+    for size in first['inference']:
+        lines.append(f'批量 {size:<9}' + ''.join(
+            f"{comparison['candidates'][n]['inference'][size]['latency_ms']:>{width - 12}.2f} / "
+            f"{comparison['candidates'][n]['inference'][size]['rows_per_s']:>9.0f}" for n in names))
+    lines.append('最大相对 RMSE: ' + ', '.join(
+        f"{n}={comparison['candidates'][n]['rmse_ratio']:.3f}" for n in names))
+    lines.append(f"推荐用于生产: {comparison['recommended']}（RMSE 容差 {comparison['rmse_tolerance'] * 100:.0f}%）")
+    return '\n'.join(lines)
+
+
+# ==================== 增量更新（训练续接，在子进程中运行） ====================
+def _refresh_leaves(model, X_train, y_train, n_threads):
+    """不增加树，只用新数据重新拟合现有树的叶子值
+
+    新数据没有落到的节点刷新后覆盖度为 0、叶子值被清零，TreeSHAP 会因此得到 NaN；
+    这些节点保留原模型的覆盖度和叶子值。
+    """
+    original = json.loads(model.get_booster().save_raw('json'))
+    with warnings.catch_warnings():
+        # 手动指定 updater 时 XGBoost 会提示忽略 tree_method，这里正是预期用法
+        warnings.simplefilter('ignore', UserWarning)
+        booster = xgb.train(
+            {'process_type': 'update', 'updater': 'refresh', 'refresh_leaf': True, 'nthread': n_threads},
+            xgb.DMatrix(X_train, y_train),
+            num_boost_round=model.get_booster().num_boosted_rounds(),
+            xgb_model=model.get_booster()
+        )
+    refreshed = json.loads(booster.save_raw('json'))
+    old_trees = original['learner']['gradient_booster']['model']['trees']
+    for old, new in zip(old_trees, refreshed['learner']['gradient_booster']['model']['trees']):
+        for k, h in enumerate(new['sum_hessian']):
+            if h <= 0:
+                new['sum_hessian'][k] = old['sum_hessian'][k]
+                if new['left_children'][k] == -1:
+                    new['split_conditions'][k] = old['split_conditions'][k]
+                    new['base_weights'][k] = old['base_weights'][k]
+    out = xgb.XGBRegressor()
+    out.load_model(bytearray(json.dumps(refreshed), 'utf-8'))
+    return out
+
+
+def _update_target(target, model, X_train, y_train, X_val, y_val, params, n_rounds, max_trees, n_threads, seed):
+    """在新数据上续接训练一个目标模型
+
+    未达到树数上限时最多再提升 n_rounds 轮（早停）；已达到上限时改为刷新现有树的叶子值，
+    树数不变。原模型超过上限时先截断到上限。
+    """
+    rss_before = peak_rss_mb()
+    t0 = time.perf_counter()
+    n_before = model.get_booster().num_boosted_rounds()
+    validation_before = regression_metrics(y_val, model.predict(X_val))
+    if max_trees is not None and n_before > max_trees:
+        model = truncate(model, max_trees)
+    room = n_rounds if max_trees is None else min(n_rounds, max_trees - model.get_booster().num_boosted_rounds())
+
+    if room > 0:
+        cont = xgb.XGBRegressor(**dict(params, n_estimators=room), n_jobs=n_threads, random_state=seed)
+        cont.fit(X_train, y_train, eval_set=[(X_val, y_val)], xgb_model=model.get_booster(), verbose=False)
+        # 续接时 best_iteration 按总轮数计
+        model, mode = truncate(cont, cont.best_iteration + 1), 'continue'
+    else:
+        model, mode = _refresh_leaves(model, X_train, y_train, n_threads), 'refresh'
+    elapsed = time.perf_counter() - t0
+    rss_after = peak_rss_mb()
+
+    record = {
+        'mode': mode,
+        'n_trees_before': n_before,
+        'n_trees': model.get_booster().num_boosted_rounds(),
+        'update_time': elapsed,
+        'peak_rss_mb': rss_after,
+        'fit_rss_mb': None if rss_after is None else rss_after - rss_before,
+        'validation_before': validation_before,
+        'validation': regression_metrics(y_val, model.predict(X_val)),
+    }
+    return target, model, record
+
+
+def _update_target_packed(args):
+    return _update_target(*args)
+
+
+def _update_multi_output(model, X_train, Y_train, X_val, Y_val, params, n_rounds, max_trees, n_threads, seed):
+    """多输出模型的续接训练，沿用原模型的目标标准化参数；向量叶子不支持刷新叶子值"""
+    rss_before = peak_rss_mb()
+    t0 = time.perf_counter()
+    n_before = model.model.get_booster().num_boosted_rounds()
+    P_before = model.predict_all(X_val)
+    room = n_rounds if max_trees is None else min(n_rounds, max_trees - n_before)
+    if room <= 0:
+        raise ValueError(f'多输出模型已有 {n_before} 棵树，达到上限 {max_trees}，XGBoost 不支持刷新向量叶子')
+
+    scale = lambda Y: (Y[model.targets].to_numpy() - model.y_mean) / model.y_std
+    cont = xgb.XGBRegressor(**dict(params, n_estimators=room), multi_strategy='multi_output_tree',
+                            n_jobs=n_threads, random_state=seed)
+    cont.fit(X_train, scale(Y_train), eval_set=[(X_val, scale(Y_val))], xgb_model=model.model.get_booster(),
+             verbose=False)
+    updated = MultiOutputModel(truncate(cont, cont.best_iteration + 1), model.targets, model.y_mean, model.y_std)
+    elapsed = time.perf_counter() - t0
+    rss_after = peak_rss_mb()
+
+    P_after = updated.predict_all(X_val)
+    n_after = updated.model.get_booster().num_boosted_rounds()
+    record = {
+        'mode': 'continue',
+        'n_trees_before': n_before,
+        'n_trees': n_after,
+        'update_time': elapsed,
+        'peak_rss_mb': rss_after,
+        'fit_rss_mb': None if rss_after is None else rss_after - rss_before,
+        'targets': {
+            t: {'validation_before': regression_metrics(Y_val[t], P_before[:, j]),
+                'validation': regression_metrics(Y_val[t], P_after[:, j])}
+            for j, t in enumerate(model.targets)
+        },
+    }
+    return updated, record
+
+
+def update_models(models, X, Y, params, n_rounds=100, max_trees=None, val_frac=0.2, n_jobs=None, seed=0,
+                  progress=None):
+    """在新数据窗口上续接训练，返回 (更新后的模型, 各目标记录, 多输出模型记录或 None, wall_time)"""
+    X_train, Y_train, X_val, Y_val = split_holdout(X, Y, val_frac)
+    t0 = time.perf_counter()
+    if isinstance(models, MultiOutputModel):
+        with THREAD_BUDGET.lease(1) as n_threads:
+            pool = _spawn_pool(1)
+            try:
+                updated, info = pool.apply(_update_multi_output, (models, X_train, Y_train, X_val, Y_val, params,
+                                                                  n_rounds, max_trees, n_threads, seed))
+            finally:
+                pool.close()
+                pool.join()
+        records = info.pop('targets')
+        return updated, records, info, time.perf_counter() - t0
+
+    targets = list(models.keys())
+    n_jobs = max(1, min(n_jobs or THREAD_BUDGET.total, len(targets)))
+    updated, records = {}, {}
+    with THREAD_BUDGET.lease(n_jobs) as n_threads:
+        tasks = [(t, models[t], X_train, Y_train[t], X_val, Y_val[t], params, n_rounds, max_trees,
+                  n_threads, seed) for t in targets]
+        pool = _spawn_pool(n_jobs)
+        try:
+            for done, (target, model, record) in enumerate(pool.imap_unordered(_update_target_packed, tasks),
+                                                           start=1):
+                updated[target], records[target] = model, record
+                if progress is not None:
+                    progress(done / len(targets))
+        finally:
+            pool.close()
+            pool.join()
+    updated = {t: updated[t] for t in targets}
+    records = {t: records[t] for t in targets}
+    return updated, records, None, time.perf_counter() - t0
+
+
+# ==================== 版本化模型文件 ====================
+_VERSION_RE = re.compile(r'\.v(\d{4,})$')
+
+
+def production_path(artifact_path):
+    """去掉版本号后缀后的生产模型文件路径"""
+    stem, ext = os.path.splitext(artifact_path)
+    return _VERSION_RE.sub('', stem) + ext
+
+
+def versioned_path(artifact_path, version):
+    stem, ext = os.path.splitext(production_path(artifact_path))
+    return f'{stem}.v{int(version):04d}{ext}'
+
+
+def list_versions(artifact_path):
+    """生产模型文件旁已发布的版本，[(版本号, 路径)] 按版本号升序"""
+    stem, ext = os.path.splitext(production_path(artifact_path))
+    folder, name = os.path.split(stem)
+    pattern = re.compile(re.escape(name) + r'\.v(\d{4,})' + re.escape(ext) + '$')
+    found = []
+    for entry in os.listdir(folder or '.'):
+        m = pattern.match(entry)
+        if m:
+            found.append((int(m.group(1)), os.path.join(folder, entry)))
+    return sorted(found)
+
+
+def promote(version_path, target_path=None):
+    """把某个版本原子替换为生产模型文件（连同清单）；页面下次检查时即加载新模型"""
+    target_path = target_path or production_path(version_path)
+    for src, dst in ((manifest_path(version_path), manifest_path(target_path)), (version_path, target_path)):
+        if not os.path.exists(src):
+            continue
+        tmp = dst + '.tmp'
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    return target_path
+
+
+# ==================== 训练并输出模型文件与清单 ====================
+def train(data_path, output_path, params=None, val_frac=0.2, n_jobs=None, seed=0, progress=None,
+          multi_output=False):
+    """读取数据 -> 并行训练（或训练单个多输出模型） -> 写出模型文件与清单，返回清单"""
+    X, Y = load_training_data(data_path)
+    if multi_output:
+        models, model_info, wall_time = train_multi_output(X, Y, params, val_frac, seed)
+        records = model_info.pop('targets')
+    else:
+        models, records, wall_time = train_models(X, Y, params, val_frac, n_jobs, seed, progress)
+        model_info = None
+    manifest = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'kind': 'multi_output' if multi_output else 'per_target',
+        'features': FEATURES,
+        'targets': list(models.keys()),
+        'params': dict(DEFAULT_PARAMS, **(params or {})),
+        'seed': seed,
+        'val_frac': val_frac,
+        'n_jobs': n_jobs,
+        'xgboost_version': xgb.__version__,
+        'data': {
+            'path': os.path.abspath(data_path),
+            'sha256': file_digest(data_path),
+            'n_rows': len(X),
+        },
+        'wall_time': wall_time,
+        'model_info': model_info,
+        'targets_info': records,
+    }
+    return write_artifact(models, output_path, manifest)
+
+
+def update(artifact_path, data_path, n_rounds=100, max_trees=None, val_frac=0.2, n_jobs=None, seed=0,
+           publish=True, promote_to_production=False, full_data_path=None, progress=None):
+    """在新数据窗口上续接训练 artifact_path 的模型，发布为新版本，返回清单
+
+    训练参数沿用原模型清单中的记录。更新耗时与全量重训的耗时对比：给出 full_data_path 时
+    实际全量重训一次（不保存）计时，否则取原模型清单中记录的全量训练耗时。
+    """
+    models = joblib.load(artifact_path)
+    parent = read_manifest(artifact_path) or {}
+    params = dict(DEFAULT_PARAMS, **parent.get('params', {}))
+    X, Y = load_training_data(data_path, models.keys())
+    updated, records, model_info, wall_time = update_models(
+        models, X, Y, params, n_rounds, max_trees, val_frac, n_jobs, seed, progress
+    )
+
+    if full_data_path is not None:
+        X_full, Y_full = load_training_data(full_data_path, models.keys())
+        if isinstance(models, MultiOutputModel):
+            *_, full_time = train_multi_output(X_full, Y_full, params, val_frac, seed)
+        else:
+            *_, full_time = train_models(X_full, Y_full, params, val_frac, n_jobs, seed)
+        full_source = 'measured'
+    elif 'cost' in parent:
+        # 上一版本也是增量更新：沿用它记录的全量重训耗时
+        full_time = parent['cost']['full_retrain_time']
+        full_source = parent['cost']['full_retrain_source']
+    else:
+        full_time = parent.get('wall_time')
+        full_source = 'parent_manifest' if full_time is not None else None
+
+    versions = [v for v, _ in list_versions(artifact_path)]
+    version = max(versions + [parent.get('version', 0)]) + 1
+    manifest = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'kind': 'multi_output' if isinstance(models, MultiOutputModel) else 'per_target',
+        'version': version,
+        'parent': {
+            'version': parent.get('version', 0),
+            'artifact': os.path.basename(artifact_path),
+            'artifact_sha256': file_digest(artifact_path),
+        },
+        'features': FEATURES,
+        'targets': list(updated.keys()),
+        'params': params,
+        'seed': seed,
+        'val_frac': val_frac,
+        'n_jobs': n_jobs,
+        'xgboost_version': xgb.__version__,
+        'data': {
+            'path': os.path.abspath(data_path),
+            'sha256': file_digest(data_path),
+            'n_rows': len(X),
+        },
+        'update': {'n_rounds': n_rounds, 'max_trees': max_trees},
+        'wall_time': wall_time,
+        'cost': {
+            'update_time': wall_time,
+            'full_retrain_time': full_time,
+            'full_retrain_source': full_source,
+            'speedup': full_time / wall_time if full_time and wall_time > 0 else None,
+        },
+        'model_info': model_info,
+        'targets_info': records,
+    }
+    if not publish:
+        return manifest
+    path = versioned_path(artifact_path, version)
+    manifest = write_artifact(updated, path, manifest)
+    if promote_to_production:
+        promote(path, production_path(artifact_path))
+    return manifest
+
+
+def format_update_report(manifest):
+    """增量更新结果的文本摘要（命令行输出）"""
+    info = manifest.get('model_info')
+    lines = []
+    if info:
+        lines.append(f"多输出模型：{info['n_trees_before']} -> {info['n_trees']} 棵树，耗时 {info['update_time']:.2f} 秒")
+    lines.append(f"{'目标':<14}{'方式':>10}{'树数':>12}{'耗时(s)':>10}{'更新前RMSE':>14}{'更新后RMSE':>14}")
+    for target, rec in manifest['targets_info'].items():
+        src = info or rec
+        lines.append(f"{target:<14}{src['mode']:>10}{src['n_trees_before']:>6}->{src['n_trees']:<5}"
+                     f"{src['update_time']:>10.2f}{rec['validation_before']['rmse']:>14.4f}"
+                     f"{rec['validation']['rmse']:>14.4f}")
+    cost = manifest['cost']
+    line = f"版本 v{manifest['version']:04d}，更新总耗时 {cost['update_time']:.2f} 秒"
+    if cost['full_retrain_time'] is not None:
+        source = '实测' if cost['full_retrain_source'] == 'measured' else '原模型清单记录'
+        line += f"；全量重训 {cost['full_retrain_time']:.2f} 秒（{source}），加速 {cost['speedup']:.1f}×"
+    lines.append(line)
+    return '\n'.join(lines)
+
+
+def format_report(manifest):
+    """清单的文本摘要（命令行输出）"""
+    info = manifest.get('model_info')
+    if info:
+        # 多输出模型的树数、耗时和内存是全部目标共用的
+        peak = '-' if info['peak_rss_mb'] is None else f"{info['peak_rss_mb']:.0f}"
+        lines = [f"多输出模型：{info['n_trees']} 棵树，训练 {info['train_time']:.2f} 秒，峰值内存 {peak} MB",
+                 f"{'目标':<14}{'验证RMSE':>12}{'验证R²':>9}"]
+        for target, rec in manifest['targets_info'].items():
+            lines.append(f"{target:<14}{rec['validation']['rmse']:>12.4f}{rec['validation']['r2']:>9.4f}")
+    else:
+        lines = [f"{'目标':<14}{'树数':>6}{'耗时(s)':>10}{'峰值内存(MB)':>14}{'验证RMSE':>12}{'验证R²':>9}"]
+        for target, rec in manifest['targets_info'].items():
+            peak = '-' if rec['peak_rss_mb'] is None else f"{rec['peak_rss_mb']:.0f}"
+            lines.append(f"{target:<14}{rec['n_trees']:>6}{rec['train_time']:>10.2f}{peak:>14}"
+                         f"{rec['validation']['rmse']:>12.4f}{rec['validation']['r2']:>9.4f}")
+    lines.append(f"总耗时 {manifest['wall_time']:.2f} 秒，训练样本 {manifest['data']['n_rows']} 行")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='由历史运行数据训练出水水质与能耗预测模型')
+    parser.add_argument('data', help='训练数据 CSV / Parquet，含 7 个特征列和 7 个目标列')
+    parser.add_argument('-o', '--output', default='energy_quality_models.pkl', help='输出的模型文件')
+    parser.add_argument('--val-frac', type=float, default=0.2, help='按时间顺序留作验证集的比例')
+    parser.add_argument('--n-jobs', type=int, default=None, help='并行训练的进程数')
+    parser.add_argument('--n-estimators', type=int, default=DEFAULT_PARAMS['n_estimators'])
+    parser.add_argument('--learning-rate', type=float, default=DEFAULT_PARAMS['learning_rate'])
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_PARAMS['max_depth'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--multi-output', action='store_true', help='训练单个多输出模型代替 7 个逐目标模型')
+    parser.add_argument('--compare', nargs='+', metavar='MODEL_FILE',
+                        help='不训练，在数据的验证集上对比这些模型文件的精度与推理速度')
+    parser.add_argument('--update', metavar='MODEL_FILE',
+                        help='在数据（新的一段运行数据）上续接训练该模型文件，发布为新版本')
+    parser.add_argument('--rounds', type=int, default=100, help='增量更新时每个目标最多新增的提升轮数')
+    parser.add_argument('--max-trees', type=int, default=None, help='增量更新后每个模型的树数上限')
+    parser.add_argument('--promote', action='store_true', help='增量更新后把新版本替换为生产模型文件')
+    parser.add_argument('--full-data', default=None, help='同时在该全量数据上重训计时，对比更新与全量重训的耗时')
+    args = parser.parse_args()
+
+    if args.update:
+        result = update(args.update, args.data, n_rounds=args.rounds, max_trees=args.max_trees,
+                        val_frac=args.val_frac, n_jobs=args.n_jobs, seed=args.seed,
+                        promote_to_production=args.promote, full_data_path=args.full_data)
+        print(format_update_report(result))
+        print(f"新版本已写入 {result['artifact']}" + ('，并已替换生产模型文件' if args.promote else ''))
+        return
+
+    if args.compare:
+        comparison = compare_artifacts({os.path.basename(p): joblib.load(p) for p in args.compare},
+                                       args.data, args.val_frac)
+        print(format_comparison(comparison))
+        return
+
+    result = train(
+        args.data, args.output,
+        params={'n_estimators': args.n_estimators, 'learning_rate': args.learning_rate, 'max_depth': args.max_depth},
+        val_frac=args.val_frac, n_jobs=args.n_jobs, seed=args.seed, multi_output=args.multi_output
+    )
+    print(format_report(result))
+    print(f'模型已写入 {args.output}，清单 {manifest_path(args.output)}')
+
+
+if __name__ == '__main__':
+    # 以模块方式重新导入：子进程按 training._fit_target_packed 找到任务函数，而不是 __main__ 中的同名函数
+    import training
+    training.main()